@@ -0,0 +1,25 @@
+"""
+Performance benchmarks for the API.
+
+The application settings are read from the environment when
+`rest_fastapi.core.config` is imported, so throwaway values are provided
+here to let the benchmarks run without a secrets file.
+
+bcrypt runs at its minimum cost with a deep queue, so the login
+benchmarks measure request handling rather than the hash cost itself.
+Rate limiting is off, as every request comes from the same principal;
+`bench_ratelimit` measures it separately. Access logs are off and only
+warnings are logged, so the baselines do not measure the logger.
+"""
+import os
+
+os.environ.setdefault("SECRET_KEY", "benchmark-secret-key")
+os.environ.setdefault("SIMPLE_API_TOKEN", "benchmark-api-token")
+os.environ.setdefault(
+    "USER_LOGIN", '{"benchuser": {"password": "benchpassword"}}'
+)
+os.environ.setdefault("PASSWORD_BCRYPT_ROUNDS", "4")
+os.environ.setdefault("PASSWORD_HASH_QUEUE_LIMIT", "1024")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+os.environ.setdefault("ACCESS_LOG_SAMPLE_RATE", "0")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
@@ -0,0 +1,91 @@
+"""
+Benchmark API key lookups and reloads with many partner keys.
+
+`verify_api_token`, the blocking core of `auth_token`, is called
+directly with a known key, an unknown key and ``SIMPLE_API_TOKEN``, so
+the numbers isolate the authentication cost from routing and
+serialization. The time to parse the key file is reported too, since it
+is paid on every refresh after the file changes.
+
+Usage::
+
+    python -m benchmarks.bench_api_keys --keys 100000
+"""
+import argparse
+import json
+import os
+import secrets
+import tempfile
+import time
+
+from fastapi import HTTPException
+
+from rest_fastapi.core.config import Settings
+from rest_fastapi.security import auth
+from rest_fastapi.security.api_keys import (
+    FileKeySource,
+    api_key_store,
+    hash_api_key,
+)
+
+
+def write_key_file(path: str, count: int) -> list[str]:
+    """Write `count` random keys to a JSON Lines file; return the keys."""
+    keys = [secrets.token_urlsafe(32) for _ in range(count)]
+    with open(path, "w", encoding="utf-8") as file:
+        for index, key in enumerate(keys):
+            file.write(json.dumps({
+                "id": f"partner-{index}",
+                "sha256": hash_api_key(key).hex(),
+                "scopes": ["reports:read"],
+            }) + "\n")
+    return keys
+
+
+def time_calls(func, token: str, iterations: int) -> float:
+    """Return the mean cost of `func(token)`, in microseconds."""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func(token)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    """Run the benchmark and print a small report."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--keys", type=int, default=100_000)
+    parser.add_argument("--iterations", type=int, default=100_000)
+    args = parser.parse_args()
+
+    settings = Settings(
+        SECRET_KEY="benchmark-secret-key",
+        SIMPLE_API_TOKEN="benchmark-api-token",
+        USER_LOGIN={},
+    )
+
+    def verify(token: str):
+        try:
+            return auth.verify_api_token(token, settings)
+        except HTTPException:
+            return None
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "api_keys.jsonl")
+        keys = write_key_file(path, args.keys)
+        start = time.perf_counter()
+        api_key_store.replace_file_keys(FileKeySource(path).load())
+        load_ms = (time.perf_counter() - start) * 1e3
+
+    hit = time_calls(verify, keys[len(keys) // 2], args.iterations)
+    miss = time_calls(verify, secrets.token_urlsafe(32), args.iterations)
+    simple = time_calls(verify, settings.SIMPLE_API_TOKEN, args.iterations)
+    print(f"keys loaded:        {len(api_key_store):8d}")
+    print(f"file load:          {load_ms:8.1f} ms")
+    print(f"known key:          {hit:8.2f} us/request")
+    print(f"unknown key:        {miss:8.2f} us/request")
+    print(f"SIMPLE_API_TOKEN:   {simple:8.2f} us/request")
+    api_key_store.clear()
+
+
+if __name__ == "__main__":
+    main()
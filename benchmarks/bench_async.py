@@ -0,0 +1,121 @@
+"""
+Compare throughput of sync and async auth dependencies and controllers.
+
+The "async" app is the real one built by `create_app`. The "sync" app
+registers the same routes with plain `def` handlers and dependencies,
+as the API was originally written, so every dependency and handler is
+dispatched to Starlette's threadpool.
+
+Usage::
+
+    python -m benchmarks.bench_async --requests 2000 --concurrency 64
+"""
+import argparse
+import asyncio
+from datetime import timedelta
+from typing import Annotated
+
+from fastapi import Depends, FastAPI, HTTPException, status
+from fastapi.security import OAuth2PasswordRequestForm
+
+from benchmarks.bench_routes import build_scenarios
+from benchmarks.load import run_scenario, running
+from rest_fastapi.app import create_app
+from rest_fastapi.core import config
+from rest_fastapi.core.config import Settings
+from rest_fastapi.security import auth, passwords
+from rest_fastapi.security.api_keys import APIKey
+from rest_fastapi.security.schemas import Token, TokenData
+
+
+def sync_get_settings() -> Settings:
+    """Blocking variant of `get_settings`."""
+    return config.settings
+
+
+def sync_auth_jwt(
+    token: Annotated[str, Depends(auth.oauth2_scheme)],
+    settings: Annotated[Settings, Depends(sync_get_settings)],
+) -> TokenData:
+    """Blocking variant of `auth_jwt`."""
+    return auth.verify_jwt(token, settings)
+
+
+def sync_auth_token(
+    token: Annotated[str, Depends(auth.api_key_header_scheme)],
+    settings: Annotated[Settings, Depends(sync_get_settings)],
+) -> APIKey:
+    """Blocking variant of `auth_token`."""
+    return auth.verify_api_token(token, settings)
+
+
+def create_sync_app() -> FastAPI:
+    """Build an app exposing the API routes through sync handlers."""
+    app = FastAPI()
+
+    @app.post("/login/token", response_model=Token)
+    def login(
+        form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
+        settings: Annotated[Settings, Depends(sync_get_settings)],
+    ):
+        user = settings.USER_LOGIN.get(form_data.username)
+        verified, _ = passwords.verify_password(
+            form_data.password, user["password"], settings.PASSWORD_BCRYPT_ROUNDS
+        )
+        if not verified:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
+        access_token = auth.create_access_token(
+            data={"sub": form_data.username},
+            settings=settings,
+            expires_delta=timedelta(hours=1),
+        )
+        return {"access_token": access_token, "token_type": "bearer"}
+
+    @app.get("/examples/protected/jwt-only")
+    def jwt_only(current_user: Annotated[TokenData, Depends(sync_auth_jwt)]):
+        return {"message": f"Hello {current_user.username}"}
+
+    @app.get("/examples/protected/simple-token-only")
+    def simple_token_only(key: Annotated[APIKey, Depends(sync_auth_token)]):
+        return {"message": "You are authenticated via a simple API token."}
+
+    @app.get("/examples/public/unprotected")
+    def unprotected():
+        return {"message": "This endpoint is public."}
+
+    return app
+
+
+async def compare(requests: int, concurrency: int):
+    """Run every scenario against both apps and print a report."""
+    apps = {"sync": create_sync_app(), "async": create_app()}
+    scenarios = build_scenarios(config.settings)
+
+    print(
+        f"{'endpoint':<20} {'mode':<6} {'rps':>10} "
+        f"{'p50 ms':>8} {'p99 ms':>8}"
+    )
+    async with running(apps["async"]):
+        for scenario in scenarios:
+            for mode, app in apps.items():
+                result = await run_scenario(
+                    app, scenario, requests, concurrency
+                )
+                print(
+                    f"{scenario.name:<20} {mode:<6} {result.rps:>10.0f} "
+                    f"{result.percentile(50):>8.2f} "
+                    f"{result.percentile(99):>8.2f}"
+                )
+
+
+def main():
+    """Parse arguments and run the comparison."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    args = parser.parse_args()
+    asyncio.run(compare(args.requests, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
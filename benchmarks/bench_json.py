@@ -0,0 +1,108 @@
+"""
+Benchmark the cost of turning a handler's return value into a response.
+
+Each payload is rendered the way FastAPI's default path does it
+(`serialize_response`, i.e. `jsonable_encoder` or response-model
+validation, then `JSONResponse` and the stdlib `json`) and with the
+fast paths of `rest_fastapi.core.responses`. Routing, dependencies and
+the ASGI send are left out; `bench_routes` measures the full request.
+
+Usage::
+
+    python -m benchmarks.bench_json --iterations 50000
+"""
+import argparse
+import asyncio
+import time
+from typing import Any, Callable
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from rest_fastapi.core.responses import (
+    FastJSONResponse,
+    PreEncodedJSON,
+    model_response,
+)
+from rest_fastapi.security.schemas import Token
+
+MESSAGE = {"message": "This endpoint is public and requires no authentication."}
+TOKEN = {"access_token": "x" * 160, "token_type": "bearer"}
+TOKEN_FIELD = create_model_field("Response_Token", Token, mode="serialization")
+PRE_ENCODED_MESSAGE = PreEncodedJSON(MESSAGE)
+
+
+def _default_path(payload: Any, field=None) -> Callable[[], Any]:
+    """Render like FastAPI with the stock JSONResponse."""
+    async def render():
+        content = await serialize_response(
+            field=field, response_content=payload
+        )
+        return JSONResponse(content)
+    return render
+
+
+def _default_fast_class(payload: Any, field=None) -> Callable[[], Any]:
+    """Render like FastAPI with FastJSONResponse as the default class."""
+    async def render():
+        content = await serialize_response(
+            field=field, response_content=payload
+        )
+        return FastJSONResponse(content)
+    return render
+
+
+def cases() -> dict[str, Callable[[], Any]]:
+    """Return the rendering strategies to compare, by name."""
+    async def returned_fast():
+        return FastJSONResponse(MESSAGE)
+
+    async def pre_encoded():
+        return PRE_ENCODED_MESSAGE.response()
+
+    async def compiled_model():
+        return model_response(Token.model_construct(**TOKEN))
+
+    return {
+        "message: dict + JSONResponse (before)": _default_path(MESSAGE),
+        "message: dict + FastJSONResponse": _default_fast_class(MESSAGE),
+        "message: FastJSONResponse returned": returned_fast,
+        "message: PreEncodedJSON": pre_encoded,
+        "token: response_model + JSONResponse (before)":
+            _default_path(TOKEN, TOKEN_FIELD),
+        "token: model_response": compiled_model,
+    }
+
+
+def run(render: Callable[[], Any], iterations: int) -> float:
+    """
+    Time repeated renders of one payload.
+
+    Returns
+    -------
+    float
+        The mean cost of one render, in microseconds.
+    """
+    async def loop() -> float:
+        await render()  # Warm up
+        start = time.perf_counter()
+        for _ in range(iterations):
+            await render()
+        return time.perf_counter() - start
+
+    return asyncio.run(loop()) / iterations * 1e6
+
+
+def main():
+    """Run the benchmark and print a small report."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=20_000)
+    args = parser.parse_args()
+
+    for name, render in cases().items():
+        print(f"{name:48} {run(render, args.iterations):8.2f} us/response")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Benchmark the per-request overhead of the rate limiter.
+
+Three costs are measured: a bare `SharedBucketStore.take` (hash, record
+lock, slot update), the whole middleware in front of an ASGI app that
+does nothing, for an API-token principal, and a rejected request, which
+never reaches the app.
+
+Usage::
+
+    python -m benchmarks.bench_ratelimit --iterations 50000
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from rest_fastapi.core.config import Settings
+from rest_fastapi.middleware.ratelimit import (
+    RateLimit,
+    RateLimitMiddleware,
+    SharedBucketStore,
+)
+
+
+async def _noop_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def _discard(message):
+    pass
+
+
+def _scope(token: str) -> dict:
+    return {
+        "type": "http",
+        "method": "GET",
+        "path": "/examples/protected/simple-token-only",
+        "headers": [(b"authentication", token.encode())],
+        "client": ("127.0.0.1", 50000),
+    }
+
+
+def time_calls(func, iterations: int) -> float:
+    """Return the mean cost of `func()` in microseconds."""
+    func()
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def time_middleware(
+    middleware: RateLimitMiddleware, scope: dict, iterations: int
+) -> float:
+    """Return the mean cost of one request through `middleware`."""
+    async def loop() -> float:
+        await middleware(scope, None, _discard)
+        start = time.perf_counter()
+        for _ in range(iterations):
+            await middleware(scope, None, _discard)
+        return time.perf_counter() - start
+
+    return asyncio.run(loop()) / iterations * 1e6
+
+
+def main():
+    """Run the benchmark and print a small report."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=20_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        store = SharedBucketStore(os.path.join(directory, "store"), 65_536)
+        limit = RateLimit(rate=1e9, burst=10**9)
+        take = time_calls(lambda: store.take("key:simple|*", limit),
+                          args.iterations)
+
+        settings = Settings(
+            SECRET_KEY="benchmark-secret-key",
+            SIMPLE_API_TOKEN="benchmark-api-token",
+            USER_LOGIN={},
+            RATE_LIMIT_ENABLED=True,
+            RATE_LIMIT_RATE=1e9,
+            RATE_LIMIT_BURST=10**9,
+            RATE_LIMIT_STATE_FILE=os.path.join(directory, "middleware"),
+        )
+        scope = _scope(settings.SIMPLE_API_TOKEN)
+        baseline = time_middleware(_noop_app, scope, args.iterations)
+        allowed = time_middleware(
+            RateLimitMiddleware(_noop_app, settings), scope, args.iterations
+        )
+        blocked = time_middleware(
+            RateLimitMiddleware(_noop_app, settings.model_copy(update={
+                "RATE_LIMIT_RATE": 1e-9,
+                "RATE_LIMIT_BURST": 0,
+                "RATE_LIMIT_STATE_FILE": os.path.join(directory, "blocked"),
+            })),
+            scope,
+            args.iterations,
+        )
+
+    print(f"SharedBucketStore.take:       {take:8.2f} us")
+    print(f"no-op app without limiter:    {baseline:8.2f} us/request")
+    print(f"no-op app with limiter:       {allowed:8.2f} us/request")
+    print(f"limiter overhead:             {allowed - baseline:8.2f} us/request")
+    print(f"rejected request (429):       {blocked:8.2f} us/request")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""
+Latency and allocation benchmark for every API route.
+
+The app built by `create_app` is driven in-process at a configurable
+concurrency. For each route the suite reports requests per second,
+p50/p95/p99 latency and the memory allocated per request. Results can
+be saved to a JSON baseline and later runs compared against it, which
+flags any metric that got worse by more than a tolerance.
+
+Usage::
+
+    # Record a baseline
+    python -m benchmarks.bench_routes --output baseline.json
+
+    # Compare the current tree against it (exit code 1 on regression)
+    python -m benchmarks.bench_routes --compare baseline.json
+"""
+import argparse
+import asyncio
+import json
+import platform
+import sys
+import time
+from datetime import timedelta
+
+from benchmarks.load import (
+    Scenario,
+    measure_allocations,
+    run_scenario,
+    running,
+)
+from rest_fastapi.app import create_app
+from rest_fastapi.core import config
+from rest_fastapi.core.config import Settings
+from rest_fastapi.security import auth
+
+# Metrics compared against a baseline, and whether higher is better.
+COMPARED_METRICS = {
+    "rps": True,
+    "p50_ms": False,
+    "p95_ms": False,
+    "p99_ms": False,
+    "alloc_peak_kib": False,
+}
+
+
+def build_scenarios(settings: Settings) -> list[Scenario]:
+    """Return one scenario per endpoint, with valid credentials."""
+    username, user = next(iter(settings.USER_LOGIN.items()))
+    token = auth.create_access_token(
+        data={"sub": username},
+        settings=settings,
+        expires_delta=timedelta(hours=1),
+    )
+    return [
+        Scenario(
+            "login",
+            "POST",
+            "/login/token",
+            data={"username": username, "password": user["password"]},
+        ),
+        Scenario(
+            "jwt-only",
+            "GET",
+            "/examples/protected/jwt-only",
+            headers={"Authorization": f"Bearer {token}"},
+        ),
+        Scenario(
+            "simple-token-only",
+            "GET",
+            "/examples/protected/simple-token-only",
+            headers={"Authentication": settings.SIMPLE_API_TOKEN},
+        ),
+        Scenario("public", "GET", "/examples/public/unprotected"),
+    ]
+
+
+async def run_suite(
+    requests: int, concurrency: int, alloc_requests: int, only=None
+) -> dict:
+    """
+    Benchmark every route and collect the results.
+
+    Parameters
+    ----------
+    requests : int
+        Number of measured requests per route.
+    concurrency : int
+        Number of requests in flight at any time.
+    alloc_requests : int
+        Number of requests used for the allocation measurement.
+    only : list of str, optional
+        Restrict the run to these scenario names.
+
+    Returns
+    -------
+    dict
+        A baseline document with run metadata and per-route metrics.
+    """
+    app = create_app()
+    scenarios = build_scenarios(config.settings)
+    routes = {}
+    async with running(app):
+        for scenario in scenarios:
+            if only and scenario.name not in only:
+                continue
+            result = await run_scenario(app, scenario, requests, concurrency)
+            metrics = {
+                "rps": result.rps,
+                "p50_ms": result.percentile(50),
+                "p95_ms": result.percentile(95),
+                "p99_ms": result.percentile(99),
+            }
+            metrics.update(
+                await measure_allocations(app, scenario, alloc_requests)
+            )
+            routes[scenario.name] = metrics
+    return {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "requests": requests,
+            "concurrency": concurrency,
+        },
+        "routes": routes,
+    }
+
+
+def compare_results(
+    baseline: dict, current: dict, tolerance: float
+) -> list[str]:
+    """
+    Find metrics that regressed against a baseline.
+
+    Parameters
+    ----------
+    baseline : dict
+        A previously saved baseline document.
+    current : dict
+        The document produced by the current run.
+    tolerance : float
+        Allowed relative change before a metric is flagged, e.g. 0.15
+        for 15%.
+
+    Returns
+    -------
+    list of str
+        One message per regressed metric; empty if none regressed.
+    """
+    regressions = []
+    for route, metrics in current["routes"].items():
+        old_metrics = baseline["routes"].get(route)
+        if old_metrics is None:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            old, new = old_metrics.get(metric), metrics.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if (higher_is_better and change < -tolerance) or (
+                not higher_is_better and change > tolerance
+            ):
+                regressions.append(
+                    f"{route}: {metric} {old:.2f} -> {new:.2f} "
+                    f"({change:+.0%})"
+                )
+    return regressions
+
+
+def print_report(document: dict) -> None:
+    """Print per-route metrics as a table."""
+    print(
+        f"{'route':<20} {'rps':>9} {'p50 ms':>8} {'p95 ms':>8} "
+        f"{'p99 ms':>8} {'KiB/req':>8} {'B kept':>8}"
+    )
+    for route, m in document["routes"].items():
+        print(
+            f"{route:<20} {m['rps']:>9.0f} {m['p50_ms']:>8.2f} "
+            f"{m['p95_ms']:>8.2f} {m['p99_ms']:>8.2f} "
+            f"{m['alloc_peak_kib']:>8.1f} {m['retained_bytes']:>8.0f}"
+        )
+
+
+def main():
+    """Parse arguments, run the suite and save or compare the results."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--alloc-requests", type=int, default=200)
+    parser.add_argument(
+        "--route", action="append", help="Only run this route (repeatable)"
+    )
+    parser.add_argument("--output", help="Write the results to this file")
+    parser.add_argument("--compare", help="Baseline file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15)
+    args = parser.parse_args()
+
+    document = asyncio.run(
+        run_suite(
+            args.requests, args.concurrency, args.alloc_requests, args.route
+        )
+    )
+    print_report(document)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(document, f, indent=2)
+        print(f"\nResults written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_results(baseline, document, args.tolerance)
+        if regressions:
+            print(f"\nRegressions beyond {args.tolerance:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"\nNo regressions beyond {args.tolerance:.0%}.")
+
+
+if __name__ == "__main__":
+    main()
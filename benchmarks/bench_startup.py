@@ -0,0 +1,138 @@
+"""
+Profile the cold start of the application.
+
+A fresh interpreter imports `rest_fastapi.main` with ``-X importtime``,
+runs the lifespan startup and serves one request, so the numbers match
+what a newly forked (non-preloaded) worker goes through. The report
+lists the slowest modules by cumulative import time, the import time
+per top-level package, and the time from interpreter start to the
+first response.
+
+Usage::
+
+    python -m benchmarks.bench_startup --top 20
+    python -m benchmarks.bench_startup --route /examples/public/unprotected
+"""
+import argparse
+import json
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+
+# Runs in the child interpreter. httpx and the load helpers are
+# imported before the clock starts, since a worker does not need them.
+_CHILD = """
+import asyncio, json, sys, time
+import benchmarks.load as load
+
+async def main(route):
+    start = time.perf_counter()
+    import rest_fastapi.main
+    imported = time.perf_counter()
+    app = rest_fastapi.main.app
+    async with load.running(app):
+        started = time.perf_counter()
+        async with load._client(app) as client:
+            response = await client.get(route)
+        served = time.perf_counter()
+    print(json.dumps({
+        "import_ms": (imported - start) * 1e3,
+        "lifespan_ms": (started - imported) * 1e3,
+        "first_request_ms": (served - started) * 1e3,
+        "status": response.status_code,
+    }))
+
+asyncio.run(main(sys.argv[1]))
+"""
+
+_IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| \s*(\S+)")
+
+
+@dataclass
+class ImportRecord:
+    """One line of ``-X importtime`` output, in microseconds."""
+
+    module: str
+    self_us: int
+    cumulative_us: int
+
+
+def parse_importtime(stderr: str) -> list[ImportRecord]:
+    """Parse the ``-X importtime`` lines of a process's stderr."""
+    records = []
+    for line in stderr.splitlines():
+        match = _IMPORT_LINE.match(line)
+        if match:
+            self_us, cumulative_us, module = match.groups()
+            records.append(
+                ImportRecord(module, int(self_us), int(cumulative_us))
+            )
+    return records
+
+
+def by_package(records: list[ImportRecord]) -> dict[str, int]:
+    """Sum the self time of the modules of each top-level package."""
+    totals: dict[str, int] = defaultdict(int)
+    for record in records:
+        totals[record.module.split(".", 1)[0]] += record.self_us
+    return dict(sorted(totals.items(), key=lambda item: -item[1]))
+
+
+def profile(route: str) -> tuple[dict, list[ImportRecord], float]:
+    """
+    Start the application in a fresh interpreter.
+
+    Returns
+    -------
+    tuple[dict, list[ImportRecord], float]
+        The timings measured in the child, its import records and the
+        wall time of the whole child process in milliseconds.
+    """
+    start = time.perf_counter()
+    child = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _CHILD, route],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    wall_ms = (time.perf_counter() - start) * 1e3
+    timings = json.loads(child.stdout.strip().splitlines()[-1])
+    # Only the modules imported after the clock started
+    records = parse_importtime(child.stderr)
+    first = next(
+        (i for i, r in enumerate(records) if r.module == "rest_fastapi"), 0
+    )
+    return timings, records[first:], wall_ms
+
+
+def main():
+    """Profile the startup and print a report."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--route", default="/examples/public/unprotected")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    timings, records, wall_ms = profile(args.route)
+
+    print(f"Slowest imports (cumulative, top {args.top}):")
+    slowest = sorted(records, key=lambda r: -r.cumulative_us)[:args.top]
+    for record in slowest:
+        print(f"  {record.cumulative_us / 1e3:8.1f} ms  {record.module}")
+
+    print("\nImport time by package (self time):")
+    for package, total in list(by_package(records).items())[:args.top]:
+        print(f"  {total / 1e3:8.1f} ms  {package}")
+
+    print("\nStartup:")
+    print(f"  import rest_fastapi.main   {timings['import_ms']:8.1f} ms")
+    print(f"  lifespan startup           {timings['lifespan_ms']:8.1f} ms")
+    print(f"  first request ({timings['status']})       "
+          f"{timings['first_request_ms']:8.1f} ms")
+    print(f"  process wall time          {wall_ms:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Benchmark the overhead of request tracing.
+
+A minimal async route and a sync route are called in-process, through
+the ASGI interface, in three setups: as FastAPI serves them, with the
+route instrumentation installed but tracing off (the production
+default), and with every request traced. The report gives the time
+per request of each setup and the difference with the plain one; a
+bare `span` block outside a trace is timed too.
+
+Usage::
+
+    python -m benchmarks.bench_tracing --requests 20000
+"""
+import argparse
+import asyncio
+import time
+import timeit
+
+from fastapi import FastAPI
+
+from rest_fastapi.core.config import Settings
+from rest_fastapi.core.tracing import instrument_routes, span
+from rest_fastapi.middleware.tracing import TracingMiddleware
+
+
+def build_app(instrument: bool, traced: bool) -> FastAPI:
+    """Build an app with one async and one sync route."""
+    app = FastAPI()
+    if traced:
+        settings = Settings(
+            SECRET_KEY="bench", SIMPLE_API_TOKEN="bench", USER_LOGIN={},
+            TRACING_ENABLED=True, TRACING_LOG_MIN_SECONDS=60.0,
+        )
+        app.add_middleware(TracingMiddleware, settings=settings)
+
+    @app.get("/async")
+    async def async_route():
+        return {"ok": True}
+
+    @app.get("/sync")
+    def sync_route():
+        return {"ok": True}
+
+    if instrument:
+        instrument_routes(app.routes)
+    return app
+
+
+async def drive(app: FastAPI, path: str, requests: int) -> float:
+    """Send requests to an app; return the seconds per request."""
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "headers": [],
+        "http_version": "1.1",
+        "scheme": "http",
+        "server": ("bench", 80),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        pass
+
+    for _ in range(min(1000, requests)):  # Warm up
+        await app(dict(scope), receive, send)
+    start = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(scope), receive, send)
+    return (time.perf_counter() - start) / requests
+
+
+def main():
+    """Run the benchmark and print a small report."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=20_000)
+    args = parser.parse_args()
+
+    setups = {
+        "plain": build_app(instrument=False, traced=False),
+        "off": build_app(instrument=True, traced=False),
+        "traced": build_app(instrument=True, traced=True),
+    }
+    print(f"{'route':6} {'setup':7} {'us/req':>7} {'overhead':>8}")
+    for path in ("/async", "/sync"):
+        baseline = None
+        for name, app in setups.items():
+            seconds = asyncio.run(drive(app, path, args.requests))
+            baseline = baseline or seconds
+            print(
+                f"{path[1:]:6} {name:7} {seconds * 1e6:7.1f} "
+                f"{(seconds - baseline) * 1e6:+8.1f}"
+            )
+
+    def bare_span():
+        with span("bench"):
+            pass
+
+    number = 1_000_000
+    seconds = timeit.timeit(bare_span, number=number) / number
+    print(f"span outside a trace: {seconds * 1e9:.0f} ns")
+
+
+if __name__ == "__main__":
+    main()
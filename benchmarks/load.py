@@ -0,0 +1,242 @@
+"""
+In-process load driver for ASGI applications.
+
+Requests are sent through `httpx.ASGITransport`, so the application is
+exercised without a network stack. A fixed number of concurrent workers
+share a request budget, which approximates many clients hitting a single
+uvicorn worker.
+
+`httpx.ASGITransport` does not send lifespan events, so `running` is
+provided to start and stop the application around a run.
+"""
+import asyncio
+import statistics
+import time
+import tracemalloc
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Optional
+
+import httpx
+
+
+@dataclass
+class Scenario:
+    """
+    A single request shape to replay under load.
+
+    Attributes
+    ----------
+    name : str
+        Label used in reports.
+    method : str
+        The HTTP method.
+    path : str
+        The request path.
+    headers : dict
+        Request headers.
+    data : dict or None
+        Form fields, for form-encoded POST bodies.
+    expected_status : int
+        The status code every response must have.
+    """
+    name: str
+    method: str
+    path: str
+    headers: dict = field(default_factory=dict)
+    data: Optional[dict] = None
+    expected_status: int = 200
+
+
+@dataclass
+class Result:
+    """
+    Measurements for one scenario.
+
+    Attributes
+    ----------
+    name : str
+        The scenario label.
+    requests : int
+        Number of requests completed.
+    elapsed : float
+        Wall-clock duration of the run, in seconds.
+    latencies : list of float
+        Per-request latencies, in seconds.
+    """
+    name: str
+    requests: int
+    elapsed: float
+    latencies: list
+
+    @property
+    def rps(self) -> float:
+        """Requests completed per second."""
+        return self.requests / self.elapsed if self.elapsed else 0.0
+
+    def percentile(self, pct: float) -> float:
+        """Return a latency percentile, in milliseconds."""
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, int(round(pct / 100 * len(ordered))))
+        return ordered[index] * 1e3
+
+    @property
+    def mean_ms(self) -> float:
+        """Mean latency, in milliseconds."""
+        if not self.latencies:
+            return 0.0
+        return statistics.fmean(self.latencies) * 1e3
+
+
+@asynccontextmanager
+async def running(app):
+    """
+    Run an application's lifespan (startup and shutdown) around a block.
+
+    Parameters
+    ----------
+    app : Starlette or FastAPI application
+        The application under test.
+    """
+    async with app.router.lifespan_context(app):
+        yield app
+
+
+def _client(app) -> httpx.AsyncClient:
+    """Build an HTTP client bound to an in-process ASGI app."""
+    return httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=app), base_url="http://bench"
+    )
+
+
+async def _send(client: httpx.AsyncClient, scenario: Scenario) -> None:
+    """Send one scenario request and check its status code."""
+    response = await client.request(
+        scenario.method,
+        scenario.path,
+        headers=scenario.headers,
+        data=scenario.data,
+    )
+    if response.status_code != scenario.expected_status:
+        raise RuntimeError(
+            f"{scenario.name}: unexpected status "
+            f"{response.status_code}: {response.text}"
+        )
+
+
+async def run_scenario(
+    app,
+    scenario: Scenario,
+    requests: int,
+    concurrency: int,
+    warmup: int = 20,
+) -> Result:
+    """
+    Replay a scenario against an ASGI app at a given concurrency.
+
+    Parameters
+    ----------
+    app : ASGI application
+        The application under test.
+    scenario : Scenario
+        The request to send.
+    requests : int
+        Total number of measured requests.
+    concurrency : int
+        Number of requests in flight at any time.
+    warmup : int, optional
+        Number of unmeasured requests sent first. The default is 20.
+
+    Returns
+    -------
+    Result
+        The collected measurements.
+
+    Raises
+    ------
+    RuntimeError
+        If a response has an unexpected status code.
+    """
+    async with _client(app) as client:
+
+        async def send() -> float:
+            start = time.perf_counter()
+            await _send(client, scenario)
+            return time.perf_counter() - start
+
+        for _ in range(warmup):
+            await send()
+
+        remaining = requests
+        latencies: list[float] = []
+
+        async def worker():
+            nonlocal remaining
+            while remaining > 0:
+                remaining -= 1
+                latencies.append(await send())
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    return Result(
+        name=scenario.name,
+        requests=len(latencies),
+        elapsed=elapsed,
+        latencies=latencies,
+    )
+
+
+async def measure_allocations(
+    app, scenario: Scenario, requests: int, warmup: int = 20
+) -> dict:
+    """
+    Measure memory allocated while serving a scenario.
+
+    Requests are sent one at a time with `tracemalloc` enabled, which
+    slows them down considerably, so this runs separately from the
+    latency measurements.
+
+    Parameters
+    ----------
+    app : ASGI application
+        The application under test.
+    scenario : Scenario
+        The request to send.
+    requests : int
+        Number of measured requests.
+    warmup : int, optional
+        Number of unmeasured requests sent first. The default is 20.
+
+    Returns
+    -------
+    dict
+        ``alloc_peak_kib``, the mean peak of memory allocated while
+        serving one request, and ``retained_bytes``, the memory still
+        held per request once the run is over (a leak indicator).
+    """
+    async with _client(app) as client:
+        for _ in range(warmup):
+            await _send(client, scenario)
+
+        tracemalloc.start()
+        try:
+            start_current, _ = tracemalloc.get_traced_memory()
+            peak_total = 0
+            for _ in range(requests):
+                before, _ = tracemalloc.get_traced_memory()
+                tracemalloc.reset_peak()
+                await _send(client, scenario)
+                _, peak = tracemalloc.get_traced_memory()
+                peak_total += peak - before
+            end_current, _ = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    return {
+        "alloc_peak_kib": peak_total / requests / 1024,
+        "retained_bytes": (end_current - start_current) / requests,
+    }
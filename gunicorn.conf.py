@@ -0,0 +1,79 @@
+"""
+Gunicorn configuration for the production server.
+
+Runs the app with uvicorn workers and prepares the shared directory used
+by prometheus_client to merge metrics from every worker process.
+
+The app is preloaded: it is imported once in the master, along with the
+heavy backends the settings enable, and the workers are forked from it
+so they share those pages copy-on-write and start serving immediately.
+Set ``GUNICORN_PRELOAD=false`` to import the app in each worker instead,
+e.g. to pick up code changes with a graceful reload (HUP).
+
+Usage::
+
+    gunicorn -c gunicorn.conf.py rest_fastapi.main:app
+"""
+import gc
+import os
+import shutil
+
+bind = os.environ.get("GUNICORN_BIND", "0.0.0.0:8080")
+workers = int(os.environ.get("WEB_CONCURRENCY", "4"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = os.environ.get("GUNICORN_PRELOAD", "true").lower() in (
+    "1", "true", "yes",
+)
+# Addresses or networks of the reverse proxies whose X-Forwarded-For
+# and X-Forwarded-Proto are trusted. The client address they give is
+# what anonymous requests are rate limited by; only list the proxy, or
+# any client reaching the API directly could pick its own address.
+forwarded_allow_ips = os.environ.get("FORWARDED_ALLOW_IPS", "127.0.0.1")
+
+# prometheus_client reads this variable when it is first imported, so it
+# must be set here, in the master, before any worker loads the app.
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/prometheus-multiproc")
+
+
+def prepare_metrics_dir() -> None:
+    """
+    Start from an empty metrics directory on every server start.
+
+    This runs when the config is loaded, before the app is preloaded:
+    metrics without labels open their file in the directory as soon as
+    their module is imported, which happens before ``on_starting``. A
+    HUP reloads the config in the same master; the files of the live
+    workers are kept then.
+    """
+    if os.environ.get("_METRICS_DIR_PREPARED_BY") == str(os.getpid()):
+        return
+    path = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+    os.environ["_METRICS_DIR_PREPARED_BY"] = str(os.getpid())
+
+
+prepare_metrics_dir()
+
+
+def when_ready(server):
+    """Finish preparing the master before the first worker is forked."""
+    if not preload_app:
+        return
+    from rest_fastapi.core import config
+    from rest_fastapi.core.startup import preload_backends
+
+    modules = preload_backends(config.settings)
+    if modules:
+        server.log.info("Preloaded backends: %s", ", ".join(modules))
+    # Move everything loaded so far out of the garbage collector's
+    # reach, so collections in the workers do not write to (and copy)
+    # the shared pages.
+    gc.freeze()
+
+
+def child_exit(server, worker):
+    """Drop the live gauges of a worker that exited."""
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
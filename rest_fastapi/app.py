@@ -4,31 +4,141 @@ Main application factory.
 This module contains the `create_app` factory function, which
 initializes and configures the FastAPI application instance.
 """
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from starlette.middleware.cors import CORSMiddleware
 
+from rest_fastapi.core import config
+from rest_fastapi.core.config import Settings
+from rest_fastapi.core.logs import configure_logging, shutdown_logging
+from rest_fastapi.core.responses import FastJSONResponse
+from rest_fastapi.core.tracing import instrument_routes
+from rest_fastapi.db.cache import QueryCache
+from rest_fastapi.db.pool import ConnectionPool, odbc_connector
+from rest_fastapi.jobs.runner import JobRunner
+from rest_fastapi.middleware.access_log import AccessLogMiddleware
+from rest_fastapi.middleware.compression import CompressionMiddleware
+from rest_fastapi.middleware.metrics import MetricsMiddleware
+from rest_fastapi.middleware.ratelimit import RateLimitMiddleware
+from rest_fastapi.middleware.tracing import TracingMiddleware
 from rest_fastapi.routes.api import init_api_routes
+from rest_fastapi.security.api_keys import APIKeyLoader, api_key_store
+from rest_fastapi.security.passwords import shutdown_password_hasher
+
+
+def create_db_pool(settings: Settings) -> ConnectionPool | None:
+    """
+    Build the SQL Server connection pool described by the settings.
+
+    Parameters
+    ----------
+    settings : Settings
+        The application settings.
+
+    Returns
+    -------
+    ConnectionPool or None
+        The pool, or None if no connection string is configured.
+    """
+    if not settings.DB_CONNECTION_STRING:
+        return None
+    return ConnectionPool(
+        connect=odbc_connector(
+            settings.DB_CONNECTION_STRING,
+            timeout=settings.DB_CONNECT_TIMEOUT_SECONDS,
+        ),
+        min_size=settings.DB_POOL_MIN_SIZE,
+        max_size=settings.DB_POOL_MAX_SIZE,
+        acquire_timeout=settings.DB_POOL_ACQUIRE_TIMEOUT_SECONDS,
+        max_lifetime=settings.DB_POOL_MAX_LIFETIME_SECONDS,
+        health_check_after=settings.DB_POOL_HEALTH_CHECK_AFTER_SECONDS,
+        maintenance_interval=settings.DB_POOL_MAINTENANCE_INTERVAL_SECONDS,
+    )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Manage resources that live as long as the application.
+
+    The database pool is opened at startup, so each worker process owns
+    its connections, and closed at shutdown. Each worker also gets its
+    own query result cache. The API keys are loaded before the first
+    request and refreshed in the background until shutdown. Background
+    jobs, if enabled, run until shutdown, when the jobs still running
+    are queued again for the next start.
+
+    Parameters
+    ----------
+    app : FastAPI
+        The application being started.
+    """
+    pool = create_db_pool(config.settings)
+    if pool is not None:
+        await pool.open()
+    app.state.db_pool = pool
+    app.state.query_cache = QueryCache(
+        max_bytes=config.settings.QUERY_CACHE_MAX_BYTES,
+        ttl=config.settings.QUERY_CACHE_TTL_SECONDS,
+    )
+    api_keys = APIKeyLoader.from_settings(
+        config.settings, api_key_store, pool
+    )
+    await api_keys.refresh()
+    refresh_task = asyncio.create_task(api_keys.run())
+    jobs = None
+    if config.settings.JOBS_ENABLED:
+        jobs = JobRunner.from_settings(config.settings, pool)
+        await jobs.start()
+    app.state.jobs = jobs
+    try:
+        yield
+    finally:
+        refresh_task.cancel()
+        if jobs is not None:
+            await jobs.stop()
+        if pool is not None:
+            await pool.close()
+        shutdown_password_hasher()
+        shutdown_logging()
 
 
 def create_app() -> FastAPI:
     """
     Create and configure the FastAPI application.
 
-    This function initializes the application, sets up CORS middleware,
-    and calls the route initializer to include all API routes.
+    This function sets up structured logging, initializes the
+    application with the fast JSON response class, sets up the rate
+    limiting, compression, CORS, tracing, metrics and access log
+    middleware, and calls the route initializer to include all API
+    routes.
 
     Returns
     -------
     FastAPI
         The configured FastAPI application instance.
     """
+    configure_logging(config.settings)
+
     app = FastAPI(
         title="Multi-Auth API (Resource Pattern)",
         description="An API with JWT and Simple Token authentication "
         "using class-based resources.",
         version="2.0.0",
+        lifespan=lifespan,
+        default_response_class=FastJSONResponse,
     )
 
+    # Throttle each principal; inside CORS so 429s carry CORS headers
+    # and preflight requests are not charged
+    app.add_middleware(RateLimitMiddleware)
+
+    # Compress large responses; inside metrics, so response sizes are
+    # the bytes actually sent
+    app.add_middleware(CompressionMiddleware)
+
     # Configure CORS middleware
     app.add_middleware(
         CORSMiddleware,
@@ -38,7 +148,20 @@ def create_app() -> FastAPI:
         allow_headers=["*"],
     )
 
-    # Initialize all API routes from a central function
+    # Trace and profile requests on demand; outside the rate limiter,
+    # so its time is part of the trace
+    app.add_middleware(TracingMiddleware)
+
+    # Record Prometheus metrics, served at /metrics
+    app.add_middleware(MetricsMiddleware)
+
+    # Assign correlation ids and log requests; outermost, so every
+    # record of a request carries its id
+    app.add_middleware(AccessLogMiddleware)
+
+    # Initialize all API routes from a central function, then time the
+    # phases of the requests they handle
     init_api_routes(app)
+    instrument_routes(app.routes)
 
     return app
@@ -0,0 +1,43 @@
+"""
+Controller serving the profiles of requests sent with ``X-Profile``.
+"""
+import os
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, HTTPException, Path, status
+from fastapi.responses import FileResponse
+from fastapi_utils.cbv import cbv
+
+from rest_fastapi.core.config import Settings, get_settings
+from rest_fastapi.security import auth
+from rest_fastapi.security.schemas import TokenData
+
+router = APIRouter(tags=["Debugging"])
+
+
+@cbv(router)
+class ProfilesController:
+    """Resource for stored request profiles."""
+
+    current_user: TokenData = Depends(auth.auth_jwt_scopes("debug:profile"))
+
+    @router.get("/debug/profiles/{profile_id}")
+    async def get(
+        self,
+        profile_id: Annotated[str, Path(pattern="^[0-9a-f]{16}$")],
+        settings: Annotated[Settings, Depends(get_settings)],
+    ) -> FileResponse:
+        """
+        Return a profile as folded stacks, ready for a flame graph tool.
+        """
+        path = os.path.join(settings.PROFILING_DIR, f"{profile_id}.folded")
+        if not os.path.isfile(path):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Profile not found",
+            )
+        return FileResponse(
+            path,
+            media_type="text/plain",
+            filename=f"{profile_id}.folded",
+        )
@@ -0,0 +1,110 @@
+"""
+Controllers for exporting BigQuery tables.
+"""
+
+from typing import Annotated, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi_utils.cbv import cbv
+
+from rest_fastapi.core.conditional import Validators, conditional_get
+from rest_fastapi.core.config import Settings, get_settings
+from rest_fastapi.db import bigquery
+from rest_fastapi.db.streaming import negotiate_format
+from rest_fastapi.security import auth
+from rest_fastapi.security.api_keys import APIKey
+
+router = APIRouter(tags=["Data Exports"])
+
+
+async def export_version(
+    name: str,
+    request: Request,
+    settings: Annotated[Settings, Depends(get_settings)],
+    load_version: Annotated[
+        bigquery.TableVersionLoader,
+        Depends(bigquery.get_table_version_loader),
+    ],
+    fields: Optional[str] = None,
+) -> Optional[tuple]:
+    """
+    The version of an export: the table's version, and the format and
+    columns requested, which shape the body.
+    """
+    table = settings.BIGQUERY_EXPORT_TABLES.get(name)
+    if table is None:
+        return None  # The handler answers 404
+    version = await run_in_threadpool(load_version, table)
+    if version is None:
+        return None
+    fmt = negotiate_format(
+        request, default="json", media_types=bigquery.MEDIA_TYPES
+    )
+    return version, fmt, fields
+
+
+@cbv(router)
+class TableExportController:
+    """
+    Resource streaming a configured BigQuery table.
+    """
+
+    api_key: APIKey = Depends(auth.auth_token_scopes("exports:read"))
+
+    @router.get(
+        "/exports/tables/{name}",
+        responses={
+            200: {
+                "content": {
+                    media_type: {}
+                    for media_type in bigquery.MEDIA_TYPES.values()
+                },
+                "description": "The table as an Arrow IPC stream, "
+                               "NDJSON or a JSON array.",
+            },
+        },
+    )
+    async def get(
+        self,
+        name: str,
+        request: Request,
+        settings: Annotated[Settings, Depends(get_settings)],
+        # Streams are read in parallel, so rows may come in another
+        # order: the same content, not the same bytes
+        validators: Annotated[
+            Validators, Depends(conditional_get(export_version, weak=True))
+        ],
+        open_session: Annotated[
+            bigquery.ReadSessionOpener,
+            Depends(bigquery.get_read_session_opener),
+        ],
+        fields: Optional[str] = None,
+    ):
+        """
+        Handle GET request for a table export.
+
+        The format is negotiated from the ``Accept`` header or the
+        ``format`` query parameter and defaults to JSON. ``fields`` is
+        an optional comma-separated list of columns. Clients can
+        revalidate an export with its ETag, which changes with the table.
+        """
+        table = settings.BIGQUERY_EXPORT_TABLES.get(name)
+        if table is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Unknown export {name!r}",
+            )
+        fmt = negotiate_format(
+            request, default="json", media_types=bigquery.MEDIA_TYPES
+        )
+        selected_fields = (
+            [field.strip() for field in fields.split(",") if field.strip()]
+            if fields else None
+        )
+        session = await run_in_threadpool(open_session, table, selected_fields)
+        response = bigquery.session_response(
+            session, fmt, settings.BIGQUERY_BUFFERED_BATCHES
+        )
+        response.headers.update(validators.headers)
+        return response
@@ -0,0 +1,182 @@
+"""
+Controllers for background jobs: submit, poll, download and cancel.
+"""
+import os
+from typing import Annotated
+
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Path,
+    Request,
+    Response,
+    status,
+)
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse
+from fastapi_utils.cbv import cbv
+
+from rest_fastapi.core.config import Settings, get_settings
+from rest_fastapi.jobs.runner import (
+    KIND_FORMATS,
+    MEDIA_TYPES,
+    JobRunner,
+    get_job_runner,
+    job_names,
+)
+from rest_fastapi.jobs.schemas import JobRequest, JobStatus
+from rest_fastapi.jobs.store import Job
+from rest_fastapi.security import auth
+from rest_fastapi.security.api_keys import APIKey
+
+router = APIRouter(tags=["Background Jobs"])
+
+JobId = Annotated[str, Path(pattern="^[0-9a-f]{24}$")]
+
+
+def _not_found() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND, detail="Job not found"
+    )
+
+
+@cbv(router)
+class JobsController:
+    """
+    Resource for the jobs of the API key making the request.
+
+    Jobs are only visible to the key that submitted them; the jobs of
+    other keys are reported as not found.
+    """
+
+    api_key: APIKey = Depends(auth.auth_token_scopes("jobs:run"))
+    runner: JobRunner = Depends(get_job_runner)
+
+    @property
+    def principal(self) -> str:
+        return f"key:{self.api_key.id}"
+
+    def _status(self, request: Request, job: Job) -> JobStatus:
+        return JobStatus.from_job(
+            job, str(request.url_for(
+                "JobsController.get_result", job_id=job.id
+            ))
+        )
+
+    async def _get_own(self, job_id: str) -> Job:
+        job = await run_in_threadpool(self.runner.store.get, job_id)
+        if job is None or job.principal != self.principal:
+            raise _not_found()
+        return job
+
+    @router.post(
+        "/jobs",
+        status_code=status.HTTP_202_ACCEPTED,
+        response_model=JobStatus,
+    )
+    async def post(
+        self,
+        body: JobRequest,
+        request: Request,
+        response: Response,
+        settings: Annotated[Settings, Depends(get_settings)],
+    ) -> JobStatus:
+        """
+        Handle POST request submitting a job.
+
+        The job is queued and runs in the background; poll the URL of
+        the ``Location`` header until its state is ``succeeded``.
+        """
+        if body.name not in job_names(settings, body.kind):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Unknown {body.kind} {body.name!r}",
+            )
+        if body.format not in KIND_FORMATS[body.kind]:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"Format of a {body.kind} job must be one of "
+                       f"{', '.join(KIND_FORMATS[body.kind])}",
+            )
+        if body.fields is not None and body.kind != "table":
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="Only table jobs select fields",
+            )
+        job = await run_in_threadpool(
+            self.runner.store.submit,
+            self.principal, body.kind, body.name, body.format,
+            body.fields, settings.JOBS_MAX_PENDING,
+        )
+        if job is None:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail=f"At most {settings.JOBS_MAX_PENDING} jobs may be "
+                       "queued or running",
+            )
+        self.runner.wake()
+        response.headers["Location"] = str(
+            request.url_for("JobsController.get", job_id=job.id)
+        )
+        return self._status(request, job)
+
+    @router.get("/jobs/{job_id}", response_model=JobStatus)
+    async def get(self, job_id: JobId, request: Request) -> JobStatus:
+        """Handle GET request for the state of a job."""
+        return self._status(request, await self._get_own(job_id))
+
+    @router.get(
+        "/jobs/{job_id}/result",
+        responses={
+            200: {
+                "content": {
+                    media_type: {} for media_type in MEDIA_TYPES.values()
+                },
+                "description": "The result, in the format of the job.",
+            },
+        },
+    )
+    async def get_result(self, job_id: JobId) -> FileResponse:
+        """
+        Handle GET request for the result of a succeeded job.
+
+        The file supports ``Range`` requests, so large results can be
+        downloaded in parts or resumed. It is sent as stored, with
+        ``no-transform``, so the ranges of every download match.
+        """
+        job = await self._get_own(job_id)
+        if job.state != "succeeded":
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=f"The job is {job.state}",
+            )
+        path = self.runner.result_path(job)
+        if not os.path.isfile(path):
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="The result has expired",
+            )
+        return FileResponse(
+            path,
+            media_type=MEDIA_TYPES[job.format],
+            filename=f"{job.name}-{job.id}.{job.format}",
+            headers={"Cache-Control": "private, no-transform"},
+        )
+
+    @router.delete(
+        "/jobs/{job_id}", status_code=status.HTTP_204_NO_CONTENT
+    )
+    async def delete(self, job_id: JobId) -> Response:
+        """
+        Handle DELETE request cancelling a job.
+
+        A running job stops within a third of its lease. Cancelling a
+        job that already ended does nothing.
+        """
+        job = await run_in_threadpool(
+            self.runner.store.cancel, job_id, self.principal
+        )
+        if job is None:
+            raise _not_found()
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,59 @@
+"""
+Controller publishing the public JWT keys.
+"""
+from typing import Annotated, Optional
+
+from fastapi import APIRouter, Depends
+from fastapi_utils.cbv import cbv
+
+from rest_fastapi.core.conditional import Validators, conditional_get
+from rest_fastapi.core.config import Settings, get_settings
+from rest_fastapi.core.responses import PreEncodedJSON
+from rest_fastapi.security.keys import KeyRing, get_key_ring
+
+router = APIRouter(tags=["Authentication"])
+
+# The encoded JWK Set of the last key ring
+_document: Optional[tuple[KeyRing, PreEncodedJSON]] = None
+
+
+def jwks_document(ring: KeyRing) -> PreEncodedJSON:
+    """Return the encoded JWK Set of a key ring."""
+    global _document
+    cached = _document
+    if cached is None or cached[0] is not ring:
+        cached = _document = (ring, PreEncodedJSON(ring.jwks))
+    return cached[1]
+
+
+async def jwks_version(
+    settings: Annotated[Settings, Depends(get_settings)],
+) -> str:
+    """The version of the JWK Set: the fingerprint of the key ring."""
+    return get_key_ring(settings).fingerprint
+
+
+@cbv(router)
+class JWKSController:
+    """Resource serving the JWK Set of the asymmetric signing keys."""
+
+    @router.get("/.well-known/jwks.json")
+    async def get(
+        self,
+        settings: Annotated[Settings, Depends(get_settings)],
+        validators: Annotated[Validators, Depends(conditional_get(
+            jwks_version,
+            max_age=lambda settings: settings.JWKS_CACHE_SECONDS,
+            public=True,
+        ))],
+    ):
+        """
+        Handle GET request for the JWK Set.
+
+        Only public keys are listed; HMAC secrets never are. Clients
+        may cache the set for JWKS_CACHE_SECONDS and revalidate it with
+        its ETag.
+        """
+        return jwks_document(get_key_ring(settings)).response(
+            validators.headers
+        )
@@ -2,49 +2,175 @@
 Controller for handling authentication requests.
 """
 from datetime import timedelta
-from typing import Annotated
+from typing import Annotated, Optional
 
-from fastapi import Depends, HTTPException, status, APIRouter
+from fastapi import Depends, Form, HTTPException, Response, status, APIRouter
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi_utils.cbv import cbv
+from loguru import logger
 
 from rest_fastapi.core.config import Settings, get_settings
+from rest_fastapi.core.responses import model_response
 from rest_fastapi.security import auth
+from rest_fastapi.security.keys import get_key_ring
+from rest_fastapi.security.passwords import get_password_hasher
+from rest_fastapi.security.refresh import get_refresh_store
 from rest_fastapi.security.schemas import Token
+from rest_fastapi.security.scopes import scope_mask
 
 router = APIRouter()
 
 
+async def token_response(
+    username: str, settings: Settings, refresh_token: Optional[str]
+) -> Response:
+    """
+    Issue an access token and build the token response.
+
+    The token grants the user's current ``scopes`` from USER_LOGIN, so
+    a refresh picks up scopes changed since the login.
+
+    Parameters
+    ----------
+    username : str
+        The subject of the access token.
+    settings : Settings
+        The application settings.
+    refresh_token : str or None
+        The refresh token returned alongside, if any.
+
+    Returns
+    -------
+    Response
+        The serialized `Token`.
+    """
+    expires_in = settings.ACCESS_TOKEN_EXPIRE_SECONDS
+    user = settings.USER_LOGIN.get(username) or {}
+    scopes = scope_mask(user.get("scopes", ()), strict=False)
+    # Signing is offloaded to the threadpool for asymmetric keys
+    access_token = await auth.run_crypto(
+        get_key_ring(settings).active.algorithm,
+        auth.create_access_token,
+        data={"sub": username, "scp": scopes},
+        settings=settings,
+        expires_delta=timedelta(seconds=expires_in),
+    )
+    # Values are known, so skip validation and go straight to the
+    # serializer compiled for Token
+    return model_response(
+        Token.model_construct(
+            access_token=access_token,
+            token_type="bearer",
+            expires_in=int(expires_in),
+            refresh_token=refresh_token,
+        )
+    )
+
+
 @cbv(router)
 class LoginController:
     """Resource for handling the token generation endpoint."""
 
     @router.post("/login/token", response_model=Token, tags=["Authentication"])
-    def post(
+    async def post(
         self,
         form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
         settings: Annotated[Settings, Depends(get_settings)],
     ):
         """Provide an access token for a valid user."""
+        hasher = get_password_hasher(settings)
         user = settings.USER_LOGIN.get(form_data.username)
-        if not user or user["password"] != form_data.password:
+        if not user:
+            # Spend the same time as a real check to hide unknown users
+            await hasher.dummy_verify()
+            verified = False
+        else:
+            verified, outdated = await hasher.verify(
+                form_data.password, user["password"]
+            )
+            if outdated:
+                logger.warning(
+                    "Password of user {username!r} is plaintext or has an "
+                    "outdated bcrypt cost; replace it in USER_LOGIN",
+                    username=form_data.username,
+                )
+        if not verified:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect username or password",
                 headers={"WWW-Authenticate": "Bearer"},
             )
-        
-        access_token_expires = timedelta(
-            minutes=settings.ACCESS_TOKEN_EXPIRE_SECONDS
-        )
-        
-        # Pass the injected settings object to the create function
-        access_token = auth.create_access_token(
-            data={"sub": form_data.username},
-            settings=settings,  # Pass the settings object
-            expires_delta=access_token_expires
+
+        # Start a refresh session, so the client does not have to send
+        # its password again when the access token expires
+        store = get_refresh_store(settings)
+        refresh_token = None
+        if store is not None:
+            grant = await run_in_threadpool(store.issue, form_data.username)
+            refresh_token = grant.token
+        return await token_response(
+            form_data.username, settings, refresh_token
         )
-        return {"access_token": access_token, "token_type": "bearer"}
+
+
+@cbv(router)
+class RefreshController:
+    """Resource exchanging a refresh token for a new access token."""
+
+    @router.post(
+        "/login/refresh", response_model=Token, tags=["Authentication"]
+    )
+    async def post(
+        self,
+        refresh_token: Annotated[str, Form()],
+        settings: Annotated[Settings, Depends(get_settings)],
+    ):
+        """
+        Provide a new access token and refresh token.
+
+        The refresh token is rotated: the one presented stops working,
+        and presenting it again ends the whole session.
+        """
+        store = get_refresh_store(settings)
+        if store is None:
+            raise HTTPException(
+                status_code=status.HTTP_501_NOT_IMPLEMENTED,
+                detail="Refresh tokens are disabled",
+            )
+        grant = await run_in_threadpool(store.rotate, refresh_token)
+        # Users removed from the settings lose their sessions
+        if grant is None or grant.subject not in settings.USER_LOGIN:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid refresh token",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+        return await token_response(grant.subject, settings, grant.token)
+
+
+@cbv(router)
+class TokenRevocationController:
+    """Resource for revoking tokens (RFC 7009)."""
+
+    @router.post("/auth/revoke", tags=["Authentication"])
+    async def post(
+        self,
+        token: Annotated[str, Form()],
+        settings: Annotated[Settings, Depends(get_settings)],
+    ):
+        """
+        Revoke an access token until it expires, or end the session of
+        a refresh token.
+
+        Holding a token is enough to revoke it, e.g. to log out. As in
+        RFC 7009, the response is 200 whether or not the token was
+        valid, so it reveals nothing about it.
+        """
+        store = get_refresh_store(settings)
+        if store is None or not await run_in_threadpool(store.revoke, token):
+            await auth.revoke_jwt(token, settings)
+        return Response(status_code=status.HTTP_200_OK)
 
 
 
@@ -0,0 +1,20 @@
+"""
+Controller exposing Prometheus metrics.
+"""
+from fastapi import APIRouter, Response
+from fastapi_utils.cbv import cbv
+
+from rest_fastapi.middleware.metrics import render_metrics
+
+router = APIRouter(tags=["Monitoring"])
+
+
+@cbv(router)
+class MetricsController:
+    """Resource serving metrics for Prometheus to scrape."""
+
+    @router.get("/metrics", include_in_schema=False)
+    async def get(self) -> Response:
+        """Return all metrics, merged across workers when configured."""
+        body, content_type = render_metrics()
+        return Response(content=body, media_type=content_type)
@@ -7,11 +7,21 @@ from typing import Annotated
 from fastapi import Depends, APIRouter
 from fastapi_utils.cbv import cbv
 
+from rest_fastapi.core.conditional import Validators, conditional_get
+from rest_fastapi.core.responses import FastJSONResponse, PreEncodedJSON
 from rest_fastapi.security import auth
+from rest_fastapi.security.api_keys import APIKey
 from rest_fastapi.security.schemas import TokenData
 
 router = APIRouter(tags=["Protected Routes"])
 
+SIMPLE_TOKEN_MESSAGE = PreEncodedJSON(
+    {"message": "You are authenticated via a simple API token."}
+)
+UNPROTECTED_MESSAGE = PreEncodedJSON({
+    "message": "This endpoint is public and requires no authentication."
+})
+
 
 @cbv(router)
 class ProtectedRoutesController:
@@ -20,23 +30,23 @@ class ProtectedRoutesController:
     """
 
     @router.get("/examples/protected/jwt-only")
-    def get_jwt_only(
+    async def get_jwt_only(
         self,
         current_user: Annotated[TokenData, Depends(auth.auth_jwt)],
     ):
         """Handle GET request protected exclusively by JWT."""
-        return {
+        return FastJSONResponse({
             "message": f"Hello {current_user.username}, you are "
                        "authenticated via JWT."
-        }
+        })
 
     @router.get("/examples/protected/simple-token-only")
-    def get_simple_token_only(
+    async def get_simple_token_only(
         self,
-        token: Annotated[str, Depends(auth.auth_token)],
+        api_key: Annotated[APIKey, Depends(auth.auth_token)],
     ):
         """Handle GET request protected by a simple API token."""
-        return {"message": "You are authenticated via a simple API token."}
+        return SIMPLE_TOKEN_MESSAGE.response()
 
     # @router.get("/examples/protected/any-auth")
     # def get_any_auth(
@@ -58,13 +68,33 @@ class ProtectedRoutesController:
     #     }
 
 
+@cbv(router)
+class AdminRoutesController:
+    """
+    Resource whose endpoints all require the ``examples:admin`` scope.
+    """
+
+    current_user: TokenData = Depends(auth.auth_jwt_scopes("examples:admin"))
+
+    @router.get("/examples/protected/admin")
+    async def get(self):
+        """Handle GET request protected by a JWT scope."""
+        return FastJSONResponse({
+            "message": f"Hello {self.current_user.username}, you are an "
+                       "admin."
+        })
+
+
 @cbv(router)
 class UnprotectedController:
     """Resource for an unprotected endpoint."""
 
     @router.get("/examples/public/unprotected")
-    def get(self):
-        """Handle GET request."""
-        return {
-            "message": "This endpoint is public and requires no authentication."
-        }
+    async def get(
+        self,
+        validators: Annotated[Validators, Depends(conditional_get(
+            lambda: UNPROTECTED_MESSAGE.version, max_age=300, public=True
+        ))],
+    ):
+        """Handle GET request; clients and nginx may cache it."""
+        return UNPROTECTED_MESSAGE.response(validators.headers)
@@ -0,0 +1,116 @@
+"""
+Controller answering nginx ``auth_request`` subrequests.
+
+nginx can protect any upstream service by asking this endpoint whether
+a request's credentials are valid before proxying it. The answer is an
+empty 200 with identity and scope headers, which nginx copies onto the
+proxied request, or a 401, which nginx returns to the client. Successful
+decisions carry caching headers bounded by the token's expiry, so
+nginx can cache them (see ``proxy/Configfile``) and most requests never
+reach Python.
+"""
+import time
+from typing import Annotated
+
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Request,
+    Response,
+    status,
+)
+from fastapi_utils.cbv import cbv
+
+from rest_fastapi.core.config import Settings, get_settings
+from rest_fastapi.security import auth
+from rest_fastapi.security.scopes import scope_names
+
+router = APIRouter(tags=["Authentication"])
+
+
+def decision_headers(
+    method: str, subject: str, scopes: list[str], max_age: int
+) -> dict[str, str]:
+    """
+    Build the headers of a successful auth decision.
+
+    Parameters
+    ----------
+    method : str
+        The scheme that authenticated the request, ``jwt`` or
+        ``api_key``.
+    subject : str
+        Who the request is from.
+    scopes : list[str]
+        The scopes granted to the credentials, sent space-separated in
+        ``X-Auth-Scopes`` for both methods.
+    max_age : int
+        Seconds the decision may be cached. 0 disables caching.
+
+    Returns
+    -------
+    dict[str, str]
+        The response headers.
+    """
+    return {
+        "X-Auth-Method": method,
+        "X-Auth-User": subject,
+        "X-Auth-Scopes": " ".join(scopes),
+        # nginx caches by X-Accel-Expires, which other caches ignore
+        "X-Accel-Expires": str(max_age),
+        "Cache-Control": f"private, max-age={max_age}",
+        "Vary": "Authorization, Authentication",
+    }
+
+
+@cbv(router)
+class AuthVerifyController:
+    """Resource validating credentials for a reverse proxy."""
+
+    @router.get(
+        "/auth/verify",
+        responses={401: {"description": "Missing or invalid credentials"}},
+    )
+    async def get(
+        self,
+        request: Request,
+        settings: Annotated[Settings, Depends(get_settings)],
+    ):
+        """
+        Check the credentials of a request.
+
+        A Bearer JWT in ``Authorization`` is checked like `auth_jwt`
+        does, including revocation; otherwise the ``Authentication``
+        API token is checked like `auth_token` does. A decision is
+        cached for at most AUTH_VERIFY_CACHE_SECONDS and never past the
+        token's expiry.
+        """
+        max_age = settings.AUTH_VERIFY_CACHE_SECONDS
+        authorization = request.headers.get("authorization", "")
+        scheme, _, token = authorization.partition(" ")
+        if scheme.lower() == "bearer" and token.strip():
+            token_data = await auth.auth_jwt(token.strip(), settings)
+            if token_data.exp is not None:
+                max_age = min(max_age, int(token_data.exp - time.time()))
+            headers = decision_headers(
+                "jwt",
+                token_data.username,
+                scope_names(token_data.scopes),
+                max(0, max_age),
+            )
+            return Response(status_code=status.HTTP_200_OK, headers=headers)
+
+        token = request.headers.get("authentication")
+        if token:
+            api_key = await auth.auth_token(token, settings)
+            headers = decision_headers(
+                "api_key", api_key.id, sorted(api_key.scopes), max_age
+            )
+            return Response(status_code=status.HTTP_200_OK, headers=headers)
+
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
@@ -0,0 +1,171 @@
+"""
+Conditional GET for read routes.
+
+Clients polling a read route mostly get back the body they already
+have. With `conditional_get`, a route declares a *version* of what it
+serves: a value the data layer already knows, such as a table's
+modification time or a key ring's fingerprint, never a hash of the
+rendered body. The version becomes an ETag before the handler runs, so
+a request whose ``If-None-Match`` matches gets a ``304 Not Modified``
+without the handler doing any work. Other requests run the handler,
+and the response carries the ETag and a ``Cache-Control`` header that
+lets browsers and the nginx proxy cache it (``public``) or only
+revalidate it (``private``).
+
+Usage in a controller::
+
+    async def report_version(name: str) -> str:
+        return await reports.last_modified(name)
+
+    @cbv(router)
+    class ReportController:
+        @router.get("/reports/{name}")
+        async def get(
+            self,
+            name: str,
+            validators: Annotated[
+                Validators, Depends(conditional_get(report_version))
+            ],
+        ):
+            report = await reports.load(name)
+            return FastJSONResponse(report, headers=validators.headers)
+
+Handlers returning a model or a dict get the headers automatically;
+handlers returning a `Response` pass ``validators.headers`` to it.
+"""
+import hashlib
+from typing import Annotated, Any, Callable, NamedTuple, Optional, Union
+
+from fastapi import Depends, HTTPException, Request, Response, status
+
+from rest_fastapi.core.config import Settings, get_settings
+
+
+class Validators(NamedTuple):
+    """The caching headers of a representation."""
+
+    etag: Optional[str]
+    cache_control: str
+
+    @property
+    def headers(self) -> dict[str, str]:
+        """The headers to send with the representation."""
+        if self.etag is None:
+            return {"Cache-Control": self.cache_control}
+        return {"ETag": self.etag, "Cache-Control": self.cache_control}
+
+
+def make_etag(version: Any, weak: bool = False) -> str:
+    """
+    Build an entity tag from a version.
+
+    The ``repr`` of the version is hashed, so it can be any value with
+    a stable ``repr``, e.g. a tuple of a timestamp and the query
+    parameters that shape the response.
+
+    Parameters
+    ----------
+    version : Any
+        Identifies the content of the representation.
+    weak : bool, optional
+        Whether the tag is weak: same content, but possibly not the
+        same bytes (e.g. rows in a different order).
+
+    Returns
+    -------
+    str
+        The quoted entity tag.
+    """
+    digest = hashlib.blake2b(
+        repr(version).encode("utf-8"), digest_size=12
+    ).hexdigest()
+    return f'W/"{digest}"' if weak else f'"{digest}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    Check an ``If-None-Match`` header against an entity tag.
+
+    The comparison is weak, as RFC 9110 requires for ``If-None-Match``:
+    ``W/"x"`` matches ``"x"``. That also matches tags that the
+    compression middleware weakened.
+    """
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque
+        for candidate in if_none_match.split(",")
+    )
+
+
+def cache_control(max_age: int, public: bool = False) -> str:
+    """
+    Build a ``Cache-Control`` value for a validated representation.
+
+    With ``max_age=0`` caches may store the response but must
+    revalidate it on every use, which costs a 304 at most.
+    """
+    scope = "public" if public else "private"
+    if max_age <= 0:
+        return f"{scope}, no-cache"
+    return f"{scope}, max-age={max_age}"
+
+
+def conditional_get(
+    version: Callable[..., Any],
+    max_age: Union[int, Callable[[Settings], int]] = 0,
+    public: bool = False,
+    weak: bool = False,
+) -> Callable:
+    """
+    Build a dependency answering conditional GET requests.
+
+    Parameters
+    ----------
+    version : Callable
+        A dependency returning the current version of the
+        representation, or None if it is unknown (no ETag is sent
+        then). It can take path and query parameters and other
+        dependencies, like any dependency.
+    max_age : int or Callable[[Settings], int], optional
+        Seconds the response may be used without revalidation, or a
+        function reading them from the settings.
+    public : bool, optional
+        Whether shared caches (nginx) may store the response. Only for
+        responses that are the same for every client.
+    weak : bool, optional
+        Whether the ETag is weak, see `make_etag`.
+
+    Returns
+    -------
+    Callable
+        The dependency. It raises a 304 `HTTPException` when the
+        client's copy is current, so the handler never runs, and
+        returns the `Validators` otherwise.
+    """
+    async def dependency(
+        request: Request,
+        response: Response,
+        settings: Annotated[Settings, Depends(get_settings)],
+        current: Annotated[Any, Depends(version)],
+    ) -> Validators:
+        seconds = max_age(settings) if callable(max_age) else max_age
+        validators = Validators(
+            make_etag(current, weak) if current is not None else None,
+            cache_control(seconds, public),
+        )
+        if_none_match = request.headers.get("if-none-match")
+        if (
+            if_none_match
+            and validators.etag is not None
+            and etag_matches(if_none_match, validators.etag)
+        ):
+            raise HTTPException(
+                status_code=status.HTTP_304_NOT_MODIFIED,
+                headers=validators.headers,
+            )
+        response.headers.update(validators.headers)
+        return validators
+
+    return dependency
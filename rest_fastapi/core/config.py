@@ -5,13 +5,22 @@ This module uses Pydantic's BaseSettings for type-safe configuration
 management. It includes logic to dynamically locate the .env file in
 predefined production or local development paths, providing both
 flexibility and robustness.
+
+The settings are reloaded when the .env file changes, so secrets can be
+rotated without restarting the workers (see `current_settings`).
 """
 import os
 import pathlib
-from typing import Literal
+import threading
+import time
+from typing import Literal, Optional, Union
 
+from loguru import logger
+from pydantic import BaseModel, ValidationError, model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+from rest_fastapi.core.tracing import span
+
 # --- Helper function to find the .env file ---
 
 def find_env_file() -> str | None:
@@ -39,9 +48,44 @@ def find_env_file() -> str | None:
         return str(local_env_path)
 
     # 3. Fallback if no file is found
-    print("WARNING: .env file not found in specified paths.")
+    logger.warning(".env file not found in specified paths.")
     return None
 
+ENV_FILE = find_env_file()
+
+# --- JWT signing keys ---
+
+class JWTKeyConfig(BaseModel):
+    """
+    A JWT key with its own algorithm, as a value of ``JWT_KEYS``.
+
+    Attributes
+    ----------
+    algorithm : str
+        The JWS algorithm: HS256/384/512, RS256/384/512, ES256/384/512
+        or EdDSA (Ed25519).
+    key : str or None
+        The HMAC secret, or a PEM encoded key. A private key signs and
+        verifies; a public key only verifies.
+    key_file : str or None
+        A file holding the key instead, e.g. a mounted secret.
+    """
+    algorithm: str
+    key: Optional[str] = None
+    key_file: Optional[str] = None
+
+    @model_validator(mode="after")
+    def _check_key(self) -> "JWTKeyConfig":
+        if (self.key is None) == (self.key_file is None):
+            raise ValueError("Set exactly one of key and key_file")
+        return self
+
+    def load(self) -> str:
+        """Return the key, reading it from `key_file` if needed."""
+        if self.key is not None:
+            return self.key
+        return pathlib.Path(self.key_file).read_text(encoding="utf-8")
+
 # --- Pydantic Settings Class ---
 
 class Settings(BaseSettings):
@@ -59,11 +103,219 @@ class Settings(BaseSettings):
     SECRET_KEY : str
         The secret key for signing JWTs.
     ALGORITHM : str
-        The algorithm to use for signing JWTs.
-    ACCESS_TOKEN_EXPIRE_MINUTES : int
-        The lifetime of an access token in minutes.
+        The HMAC algorithm used with SECRET_KEY and with the secrets
+        given as plain strings in JWT_KEYS.
+    JWT_KEYS : dict
+        Additional JWT keys, mapping each key id (``kid``) to an HMAC
+        secret or to a `JWTKeyConfig` (e.g. an RS256, ES256 or EdDSA
+        key pair). Tokens signed with any of them, or with SECRET_KEY,
+        are accepted.
+    JWT_ACTIVE_KID : str or None
+        Key id from JWT_KEYS used to sign new tokens. SECRET_KEY is used
+        if unset.
+    ACCESS_TOKEN_EXPIRE_SECONDS : float
+        The lifetime of an access token in seconds.
+    REFRESH_TOKEN_ENABLED : bool
+        Whether logins also return a refresh token.
+    REFRESH_TOKEN_EXPIRE_SECONDS : float
+        Lifetime of a refresh token. Every refresh issues a new one, so
+        a session stays alive as long as it is used this often.
+    REFRESH_SESSION_MAX_SECONDS : float
+        Time after a login when its refresh tokens stop working,
+        however often they were used.
+    REFRESH_TOKEN_DB_PATH : str
+        SQLite database holding the refresh tokens, shared by all
+        worker processes.
     SIMPLE_API_TOKEN : str
-        A simple, static token for basic API authentication.
+        A simple, static token for basic API authentication. It is
+        accepted as the API key ``simple``, with every scope.
+    API_KEYS_FILE : str or None
+        JSON Lines file of partner API keys (id, SHA-256 digest, scopes
+        and metadata).
+    API_KEYS_TABLE : str or None
+        Database table of partner API keys, read through the pool.
+    API_KEYS_REFRESH_SECONDS : float
+        Interval at which the file and the table are checked for
+        changes.
+    JWT_CACHE_ENABLED : bool
+        Whether verified JWTs are cached to skip repeated verification.
+    JWT_CACHE_MAX_SIZE : int
+        Maximum number of verified tokens kept in the cache.
+    JWT_CACHE_TTL_SECONDS : float
+        Upper bound on how long a verified token stays cached. Entries
+        never outlive the token's own expiry.
+    USER_LOGIN : dict
+        Users allowed to log in, mapping each username to a record whose
+        "password" is a bcrypt hash (legacy plaintext values are accepted
+        but logged as outdated on each login) and whose optional
+        "scopes" lists the scopes granted to the user's tokens.
+    PASSWORD_BCRYPT_ROUNDS : int
+        The bcrypt cost factor. Stored hashes with a different cost are
+        accepted but logged as outdated on each login.
+    PASSWORD_HASH_WORKERS : int
+        Number of workers verifying passwords concurrently.
+    PASSWORD_HASH_QUEUE_LIMIT : int
+        Number of logins allowed to wait for a free worker before new
+        ones are rejected with 503.
+    PASSWORD_HASH_TIMEOUT_SECONDS : float
+        Maximum time a login waits for its password verification.
+    PASSWORD_HASH_USE_PROCESSES : bool
+        Verify passwords in a process pool instead of a thread pool.
+    DB_CONNECTION_STRING : str or None
+        ODBC connection string for SQL Server. No pool is created if unset.
+    DB_CONNECT_TIMEOUT_SECONDS : int
+        Login timeout when opening a connection.
+    DB_POOL_MIN_SIZE : int
+        Connections opened at startup and kept open.
+    DB_POOL_MAX_SIZE : int
+        Maximum number of open connections per worker.
+    DB_POOL_ACQUIRE_TIMEOUT_SECONDS : float
+        Time a request waits for a free connection.
+    DB_POOL_MAX_LIFETIME_SECONDS : float
+        Age after which a connection is closed and replaced.
+    DB_POOL_HEALTH_CHECK_AFTER_SECONDS : float
+        Idle time after which a connection is pinged before reuse.
+    DB_POOL_MAINTENANCE_INTERVAL_SECONDS : float
+        Interval of the background pass that recycles and refills.
+    DB_STREAM_BATCH_SIZE : int
+        Rows fetched and encoded per chunk when streaming query results.
+    PAGINATION_DEFAULT_LIMIT : int
+        Rows per page of keyset-paginated routes when the client does
+        not ask for a ``limit``.
+    PAGINATION_MAX_LIMIT : int
+        Largest ``limit`` granted; larger ones are capped.
+    QUERY_CACHE_MAX_BYTES : int
+        Upper bound on the estimated size of cached query results per
+        worker. 0 disables caching, but identical concurrent queries
+        are still coalesced.
+    QUERY_CACHE_TTL_SECONDS : float
+        Default time a query result stays cached.
+    JWKS_CACHE_SECONDS : int
+        How long clients may cache /.well-known/jwks.json. Publish a new
+        key at least this long before making it the active one.
+    AUTH_VERIFY_CACHE_SECONDS : int
+        How long a reverse proxy may cache a successful decision of
+        /auth/verify. JWT decisions never outlive the token.
+    REVOCATION_ENABLED : bool
+        Whether tokens are checked against the denylist of revoked
+        ``jti`` claims.
+    REVOCATION_DB_PATH : str
+        SQLite database holding the revoked token ids, shared by all
+        worker processes.
+    REVOCATION_BLOOM_CAPACITY : int
+        Revoked ids the in-memory Bloom filter is sized for. It grows
+        when rebuilt with more live entries.
+    REVOCATION_BLOOM_ERROR_RATE : float
+        False positive rate of the filter at capacity. False positives
+        only cost a lookup in the database.
+    REVOCATION_SYNC_INTERVAL_SECONDS : float
+        Interval at which a worker fetches the ids revoked by the
+        others, i.e. how long a revoked token may still be accepted by
+        another worker.
+    REVOCATION_REBUILD_INTERVAL_SECONDS : float
+        Interval at which expired ids are purged and the filter is
+        rebuilt.
+    RATE_LIMIT_ENABLED : bool
+        Whether requests are rate limited per principal.
+    RATE_LIMIT_RATE : float
+        Default refill rate of a principal's bucket, in requests per
+        second. Must be above 0, as must the rates of the limits below.
+    RATE_LIMIT_BURST : int
+        Default bucket size: requests allowed in a burst. At least 1,
+        as must be the bursts of the limits below.
+    RATE_LIMIT_ROUTES : dict
+        Route templates with their own bucket, mapped to
+        ``[rate, burst]``.
+    RATE_LIMIT_PRINCIPALS : dict
+        Limits for specific principals (``user:<sub>``, ``key:<id>``
+        or ``ip:<address>``), mapped to ``[rate, burst]``.
+    RATE_LIMIT_STATE_FILE : str
+        File holding the buckets shared by all worker processes.
+    RATE_LIMIT_SLOTS : int
+        Number of buckets the state file can hold.
+    COMPRESSION_ENABLED : bool
+        Whether responses are compressed for clients that accept it.
+    COMPRESSION_MINIMUM_SIZE : int
+        Responses with a smaller body are sent uncompressed.
+    COMPRESSION_LEVELS : dict
+        Codecs offered (``zstd``, ``br``, ``gzip``), mapped to their
+        level, in order of preference when the client accepts several
+        equally. Codecs whose library is not installed are skipped.
+    COMPRESSION_ROUTE_LEVELS : dict
+        Route templates with their own codecs and levels, in the form
+        of ``COMPRESSION_LEVELS``. ``{}`` disables compression for a
+        route.
+    TRACING_ENABLED : bool
+        Whether requests are traced, with their phases reported in a
+        ``Server-Timing`` header and logged.
+    TRACING_SAMPLE_RATE : float
+        Fraction of the requests traced, between 0 and 1.
+    TRACING_LOG_MIN_SECONDS : float
+        Traced requests faster than this are not logged.
+    PROFILING_ENABLED : bool
+        Whether requests with an ``X-Profile`` header and a token
+        granting the ``debug:profile`` scope are profiled.
+    PROFILING_INTERVAL_SECONDS : float
+        Interval between two stack samples of a profiled request.
+    PROFILING_MAX_SECONDS : float
+        Sampling of a request stops after this long.
+    PROFILING_DIR : str
+        Directory the profiles are stored in, as folded stacks.
+    LOG_LEVEL : str
+        Minimum level of the records logged.
+    LOG_FORMAT : {"json", "text"}
+        Records are written as JSON lines, or as human-readable text.
+    LOG_QUEUE_SIZE : int
+        Records waiting to be written at most; more are dropped rather
+        than blocking requests.
+    ACCESS_LOG_ENABLED : bool
+        Whether requests are logged.
+    ACCESS_LOG_SAMPLE_RATE : float
+        Fraction of the successful requests logged, between 0 and 1.
+        Errors and slow requests are always logged.
+    ACCESS_LOG_SLOW_SECONDS : float
+        Requests taking at least this long are always logged.
+    BIGQUERY_PROJECT : str or None
+        Project billed for Storage Read API sessions. Defaults to the
+        project of the table being read.
+    BIGQUERY_EXPORT_TABLES : dict
+        Tables available for export, mapping each export name to a
+        fully qualified ``project.dataset.table``.
+    BIGQUERY_MAX_READ_STREAMS : int
+        Maximum number of streams read in parallel per export.
+    BIGQUERY_BUFFERED_BATCHES : int
+        Record batches read ahead of a slow client, per export.
+    BIGQUERY_TABLE_VERSION_TTL_SECONDS : float
+        How long a worker reuses a table's version (its modification
+        time) for conditional export requests.
+    JOBS_ENABLED : bool
+        Whether long reads can be submitted as background jobs.
+    JOBS_DB_PATH : str
+        SQLite database holding the jobs, shared by all worker
+        processes and kept across restarts.
+    JOBS_SPOOL_DIR : str
+        Directory the results of the jobs are written to.
+    JOBS_WORKERS : int
+        Jobs run at once per worker process.
+    JOBS_PER_PRINCIPAL : int
+        Jobs of an API key run at once, over all worker processes.
+    JOBS_MAX_PENDING : int
+        Jobs an API key may have queued or running; more are rejected
+        with 429.
+    JOBS_LEASE_SECONDS : float
+        Time after which the job of a worker that stopped renewing it,
+        e.g. because it died, is run by another worker.
+    JOBS_POLL_INTERVAL_SECONDS : float
+        Interval at which idle workers look for jobs submitted to other
+        worker processes.
+    JOBS_RESULT_TTL_SECONDS : float
+        How long a job and its result are kept after it ended.
+    JOBS_MAX_ATTEMPTS : int
+        Times a job is started before it is failed, when its workers
+        keep dying.
+    JOBS_QUERIES : dict
+        SQL queries available to ``query`` jobs, mapping each job name
+        to the query run on the database pool.
     """
     # --- Project Specific ---
     ENV_STATE: Literal["dev", "prod"] = "dev"
@@ -72,33 +324,237 @@ class Settings(BaseSettings):
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_SECONDS: float = 30 * 60  # Default to 30 minutes
+    JWT_KEYS: dict[str, Union[str, JWTKeyConfig]] = {}
+    JWT_ACTIVE_KID: Optional[str] = None
+
+    # --- Refresh tokens ---
+    REFRESH_TOKEN_ENABLED: bool = True
+    REFRESH_TOKEN_EXPIRE_SECONDS: float = 14 * 24 * 60 * 60
+    REFRESH_SESSION_MAX_SECONDS: float = 30 * 24 * 60 * 60
+    REFRESH_TOKEN_DB_PATH: str = "/tmp/rest-fastapi-refresh-tokens.sqlite3"
+
+    # --- Verified JWT cache ---
+    JWT_CACHE_ENABLED: bool = True
+    JWT_CACHE_MAX_SIZE: int = 10_000
+    JWT_CACHE_TTL_SECONDS: float = 5 * 60
 
     # --- Simple Token Authentication ---
     SIMPLE_API_TOKEN: str
 
+    # --- API keys ---
+    API_KEYS_FILE: Optional[str] = None
+    API_KEYS_TABLE: Optional[str] = None
+    API_KEYS_REFRESH_SECONDS: float = 30.0
+
     # --- Optional: Database settings can be added here if needed ---
     USER_LOGIN: dict
 
+    # --- Password hashing ---
+    PASSWORD_BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_QUEUE_LIMIT: int = 16
+    PASSWORD_HASH_TIMEOUT_SECONDS: float = 5.0
+    PASSWORD_HASH_USE_PROCESSES: bool = False
+
+    # --- Database connection pool ---
+    DB_CONNECTION_STRING: Optional[str] = None
+    DB_CONNECT_TIMEOUT_SECONDS: int = 5
+    DB_POOL_MIN_SIZE: int = 1
+    DB_POOL_MAX_SIZE: int = 10
+    DB_POOL_ACQUIRE_TIMEOUT_SECONDS: float = 5.0
+    DB_POOL_MAX_LIFETIME_SECONDS: float = 30 * 60
+    DB_POOL_HEALTH_CHECK_AFTER_SECONDS: float = 30.0
+    DB_POOL_MAINTENANCE_INTERVAL_SECONDS: float = 60.0
+    DB_STREAM_BATCH_SIZE: int = 1000
+
+    # --- Keyset pagination ---
+    PAGINATION_DEFAULT_LIMIT: int = 100
+    PAGINATION_MAX_LIMIT: int = 1000
+
+    # --- Query result cache ---
+    QUERY_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    QUERY_CACHE_TTL_SECONDS: float = 30.0
+
+    # --- Public keys ---
+    JWKS_CACHE_SECONDS: int = 5 * 60
+
+    # --- Reverse proxy auth ---
+    AUTH_VERIFY_CACHE_SECONDS: int = 30
+
+    # --- Token revocation ---
+    REVOCATION_ENABLED: bool = True
+    REVOCATION_DB_PATH: str = "/tmp/rest-fastapi-revocations.sqlite3"
+    REVOCATION_BLOOM_CAPACITY: int = 100_000
+    REVOCATION_BLOOM_ERROR_RATE: float = 0.001
+    REVOCATION_SYNC_INTERVAL_SECONDS: float = 1.0
+    REVOCATION_REBUILD_INTERVAL_SECONDS: float = 5 * 60
+
+    # --- Rate limiting ---
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_RATE: float = 20.0
+    RATE_LIMIT_BURST: int = 40
+    RATE_LIMIT_ROUTES: dict[str, tuple[float, int]] = {}
+    RATE_LIMIT_PRINCIPALS: dict[str, tuple[float, int]] = {}
+    RATE_LIMIT_STATE_FILE: str = "/tmp/rest-fastapi-ratelimit"
+    RATE_LIMIT_SLOTS: int = 65_536
+
+    # --- Response compression ---
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MINIMUM_SIZE: int = 1024
+    COMPRESSION_LEVELS: dict[str, int] = {"zstd": 3, "br": 4, "gzip": 6}
+    COMPRESSION_ROUTE_LEVELS: dict[str, dict[str, int]] = {}
+
+    # --- Logging ---
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: Literal["json", "text"] = "json"
+    LOG_QUEUE_SIZE: int = 10_000
+    ACCESS_LOG_ENABLED: bool = True
+    ACCESS_LOG_SAMPLE_RATE: float = 1.0
+    ACCESS_LOG_SLOW_SECONDS: float = 1.0
+
+    # --- Tracing and profiling ---
+    TRACING_ENABLED: bool = False
+    TRACING_SAMPLE_RATE: float = 1.0
+    TRACING_LOG_MIN_SECONDS: float = 0.0
+    PROFILING_ENABLED: bool = False
+    PROFILING_INTERVAL_SECONDS: float = 0.001
+    PROFILING_MAX_SECONDS: float = 30.0
+    PROFILING_DIR: str = "/tmp/rest-fastapi-profiles"
+
+    # --- Hot reloading ---
+    SETTINGS_RELOAD_INTERVAL_SECONDS: float = 1.0
+
+    # --- BigQuery exports ---
+    BIGQUERY_PROJECT: Optional[str] = None
+    BIGQUERY_EXPORT_TABLES: dict[str, str] = {}
+    BIGQUERY_MAX_READ_STREAMS: int = 4
+    BIGQUERY_BUFFERED_BATCHES: int = 8
+    BIGQUERY_TABLE_VERSION_TTL_SECONDS: float = 5.0
+
+    # --- Background jobs ---
+    JOBS_ENABLED: bool = False
+    JOBS_DB_PATH: str = "/tmp/rest-fastapi-jobs.sqlite3"
+    JOBS_SPOOL_DIR: str = "/tmp/rest-fastapi-jobs"
+    JOBS_WORKERS: int = 2
+    JOBS_PER_PRINCIPAL: int = 1
+    JOBS_MAX_PENDING: int = 10
+    JOBS_LEASE_SECONDS: float = 30.0
+    JOBS_POLL_INTERVAL_SECONDS: float = 1.0
+    JOBS_RESULT_TTL_SECONDS: float = 24 * 60 * 60
+    JOBS_MAX_ATTEMPTS: int = 3
+    JOBS_QUERIES: dict[str, str] = {}
+
     # Pydantic model configuration
     model_config = SettingsConfigDict(
-        env_file=find_env_file(),  # Dynamically find the .env file
+        env_file=ENV_FILE,  # Dynamically found at import
         env_file_encoding='utf-8',
         extra='ignore'  # Ignore extra variables in the .env file
     )
 
+    @model_validator(mode="after")
+    def _check_active_kid(self) -> "Settings":
+        if self.JWT_ACTIVE_KID and self.JWT_ACTIVE_KID not in self.JWT_KEYS:
+            raise ValueError(
+                f"JWT_ACTIVE_KID {self.JWT_ACTIVE_KID!r} is not in JWT_KEYS"
+            )
+        return self
+
+    @model_validator(mode="after")
+    def _check_rate_limits(self) -> "Settings":
+        limits = {
+            "RATE_LIMIT_RATE/RATE_LIMIT_BURST": (
+                self.RATE_LIMIT_RATE, self.RATE_LIMIT_BURST
+            ),
+            **{f"RATE_LIMIT_ROUTES[{name!r}]": limit
+               for name, limit in self.RATE_LIMIT_ROUTES.items()},
+            **{f"RATE_LIMIT_PRINCIPALS[{name!r}]": limit
+               for name, limit in self.RATE_LIMIT_PRINCIPALS.items()},
+        }
+        for name, (rate, burst) in limits.items():
+            if rate <= 0 or burst < 1:
+                raise ValueError(
+                    f"{name} needs a rate above 0 and a burst of at least 1"
+                )
+        return self
+
 
 # --- Instantiate settings ---
 # This single instance will be imported by other parts of the application.
 settings = Settings()
 
 
-def get_settings() -> Settings:
+# --- Hot reloading ---
+
+def _env_file_mtime() -> Optional[int]:
+    if ENV_FILE is None:
+        return None
+    try:
+        return os.stat(ENV_FILE).st_mtime_ns
+    except OSError:
+        return None
+
+
+_reload_lock = threading.Lock()
+_env_mtime = _env_file_mtime()
+_next_check = 0.0
+
+
+def current_settings() -> Settings:
     """
-    Dependency function to get the application settings.
+    Return the current settings, reloading them if the .env file changed.
+
+    The file's modification time is checked at most once every
+    SETTINGS_RELOAD_INTERVAL_SECONDS, so most calls only compare two
+    floats. When it changed, a new `Settings` object replaces the
+    module-level `settings`; objects already handed out are left
+    untouched, so a request in flight keeps a consistent view. If the
+    new file is invalid (e.g. caught mid-write), the previous settings
+    stay in use and the file is read again at the next check.
+
+    Environment variables still take precedence over the file, and
+    resources built at startup (such as the database pool) keep the
+    values they were created with.
 
     Returns
     -------
     Settings
         The application settings instance.
     """
+    global settings, _env_mtime, _next_check
+    now = time.monotonic()
+    if now < _next_check:
+        return settings
+    with span("settings"), _reload_lock:
+        if now < _next_check:
+            return settings
+        interval = settings.SETTINGS_RELOAD_INTERVAL_SECONDS
+        _next_check = now + interval if interval > 0 else float("inf")
+        mtime = _env_file_mtime()
+        if mtime != _env_mtime:
+            try:
+                settings = Settings(_env_file=ENV_FILE)
+            except ValidationError as exc:
+                logger.warning(
+                    ".env file changed but is invalid; keeping the "
+                    "previous settings.\n{}", exc
+                )
+            else:
+                # Only once read, so an invalid file is read again
+                _env_mtime = mtime
     return settings
+
+
+async def get_settings() -> Settings:
+    """
+    Dependency function to get the application settings.
+
+    It is a coroutine so FastAPI resolves it on the event loop instead
+    of dispatching it to the threadpool. The settings are reloaded when
+    the .env file changes.
+
+    Returns
+    -------
+    Settings
+        The application settings instance.
+    """
+    return current_settings()
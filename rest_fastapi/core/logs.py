@@ -0,0 +1,235 @@
+"""
+Structured, non-blocking logging with loguru.
+
+`configure_logging` sends every log record, from loguru and from the
+standard `logging` module (uvicorn, gunicorn workers, libraries), to a
+single `QueueSink`. Logging a record only formats its message and puts
+it in a bounded in-memory queue; a writer thread encodes it, as one
+JSON object per line by default, and writes it out. A stalled stdout
+or disk therefore never blocks a request: when the queue is full new
+records are dropped and counted in ``log_records_dropped_total``.
+
+loguru's own ``enqueue=True`` is not used: it hands records to a pipe
+whose writes block once the pipe is full, which is exactly the stall
+to avoid.
+
+Records logged while a request is handled carry its correlation id,
+``request_id`` (see `rest_fastapi.middleware.access_log`), without it
+being passed around.
+
+Under gunicorn every worker is a separate process. The writer thread
+of a process does not survive a fork, so each worker starts its own on
+its first record, with a fresh queue; records are written with one
+``write`` per line, so the lines of different workers never mix, and
+carry the ``pid`` of the worker that logged them.
+"""
+import contextvars
+import logging
+import os
+import queue
+import sys
+import threading
+import traceback
+from typing import Any, Optional, TextIO
+
+from loguru import logger
+from prometheus_client import Counter
+from pydantic_core import to_json
+
+from rest_fastapi.core.config import Settings
+
+LOG_RECORDS_DROPPED = Counter(
+    "log_records_dropped_total",
+    "Log records dropped because the log queue was full.",
+)
+
+# Correlation id of the request being handled
+request_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(
+    "request_id", default=None
+)
+
+TEXT_FORMAT = (
+    "{time:YYYY-MM-DD HH:mm:ss.SSS} | {level: <8} | "
+    "{extra[request_id]} | {name}:{function}:{line} - {message}"
+)
+
+
+def record_to_json(record: dict) -> bytes:
+    """
+    Encode a loguru record as one line of JSON.
+
+    The extra fields, such as ``request_id`` and the keyword arguments
+    of the logging call, are top-level keys.
+    """
+    document: dict[str, Any] = {
+        "time": record["time"].isoformat(),
+        "level": record["level"].name,
+        "message": record["message"],
+        "logger": record["name"],
+        "function": record["function"],
+        "line": record["line"],
+        "pid": record["process"].id,
+    }
+    document.update(record["extra"])
+    exception = record["exception"]
+    if exception is not None:
+        document["exception"] = "".join(traceback.format_exception(
+            exception.type, exception.value, exception.traceback
+        ))
+    return to_json(document, fallback=repr) + b"\n"
+
+
+class QueueSink:
+    """
+    A loguru sink handing records to a writer thread.
+
+    Parameters
+    ----------
+    stream : TextIO
+        Where the records are written, e.g. `sys.stdout`.
+    serialize : bool
+        Whether records are written as JSON lines, or as the message
+        formatted by loguru.
+    max_size : int
+        Records held in the queue at most; more are dropped.
+    """
+
+    def __init__(self, stream: TextIO, serialize: bool, max_size: int):
+        self.stream = stream
+        self.serialize = serialize
+        self.max_size = max_size
+        self._queue: Optional[queue.Queue] = None
+        self._thread: Optional[threading.Thread] = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def write(self, message) -> None:
+        """Queue a record; called by loguru on the logging thread."""
+        if self._pid != os.getpid():
+            self._start()
+        item = message.record if self.serialize else str(message)
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+    def _start(self) -> None:
+        """Start the writer thread of the current process."""
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = queue.Queue(self.max_size)
+            self._thread = threading.Thread(
+                target=self._run, args=(self._queue,),
+                name="log-writer", daemon=True,
+            )
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def _run(self, records: queue.Queue) -> None:
+        while True:
+            item = records.get()
+            if item is None:
+                break
+            try:
+                if self.serialize:
+                    item = record_to_json(item).decode("utf-8")
+                # One write per record, so lines of workers never mix
+                self.stream.write(item)
+                self.stream.flush()
+            except Exception:
+                # A broken record or stream must not kill the writer
+                pass
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Write out the queued records and stop the writer thread."""
+        if self._pid != os.getpid() or self._thread is None:
+            return
+        try:
+            self._queue.put(None, timeout=timeout)
+        except queue.Full:
+            return
+        self._thread.join(timeout)
+        self._pid = None
+
+
+class InterceptHandler(logging.Handler):
+    """Forward standard `logging` records to loguru."""
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            level = logger.level(record.levelname).name
+        except ValueError:
+            level = record.levelno
+        # Report the caller of the logging call, not this handler
+        frame, depth = logging.currentframe(), 0
+        while frame is not None and (
+            depth == 0 or frame.f_code.co_filename == logging.__file__
+        ):
+            frame = frame.f_back
+            depth += 1
+        logger.opt(depth=depth, exception=record.exc_info).log(
+            level, record.getMessage()
+        )
+
+
+def _message_only(record: dict) -> str:
+    """loguru format for JSON records, encoded by the writer thread."""
+    return "{message}"
+
+
+def _add_request_id(record: dict) -> None:
+    """loguru patcher adding the correlation id of the request."""
+    record["extra"].setdefault("request_id", request_id.get())
+
+
+# Every record gets the id, whichever sink writes it
+logger.configure(patcher=_add_request_id)
+
+_sink: Optional[QueueSink] = None
+
+
+def configure_logging(settings: Settings) -> None:
+    """
+    Send all logs through a `QueueSink` writing to stdout.
+
+    Replaces loguru's default handler and the handlers of the standard
+    `logging` root logger and of uvicorn's loggers. uvicorn's access
+    log is turned off: `AccessLogMiddleware` logs requests instead.
+    Calling it again replaces the sink, after writing out its records.
+
+    Parameters
+    ----------
+    settings : Settings
+        Level, format and queue size of the logs.
+    """
+    global _sink
+    logger.remove()
+    if _sink is not None:
+        _sink.close()
+    serialize = settings.LOG_FORMAT == "json"
+    _sink = QueueSink(sys.stdout, serialize, settings.LOG_QUEUE_SIZE)
+    logger.add(
+        _sink.write,
+        level=settings.LOG_LEVEL,
+        format=_message_only if serialize else TEXT_FORMAT,
+        colorize=False,
+        backtrace=False,
+        diagnose=False,
+    )
+
+    logging.basicConfig(
+        handlers=[InterceptHandler()],
+        level=logger.level(settings.LOG_LEVEL).no,
+        force=True,
+    )
+    for name in ("uvicorn", "uvicorn.error", "gunicorn.error"):
+        logging.getLogger(name).handlers = []
+        logging.getLogger(name).propagate = True
+    logging.getLogger("uvicorn.access").disabled = True
+
+
+def shutdown_logging() -> None:
+    """Write out the queued records; call it when the process stops."""
+    if _sink is not None:
+        _sink.close()
@@ -0,0 +1,121 @@
+"""
+A sampling profiler for single requests.
+
+`SamplingProfiler` runs a thread that looks at the stacks of a set of
+threads at a fixed interval, with `sys._current_frames`, and counts how
+often each stack is seen. The profiled code is not instrumented, so it
+runs at full speed apart from the sampling thread taking the GIL once
+per interval.
+
+The result is written in the *folded stacks* format, one line per
+distinct stack, frames from the root down separated by ``;``, followed
+by its sample count::
+
+    run (base_events.py:601);_run_once (base_events.py:1845);... 12
+
+It is the input of Brendan Gregg's ``flamegraph.pl``, ``inferno`` and
+speedscope (https://www.speedscope.app), which draw the flame graph.
+"""
+import collections
+import os
+import sys
+import threading
+import time
+from typing import Optional
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    filename = os.path.basename(code.co_filename)
+    return f"{code.co_qualname} ({filename}:{code.co_firstlineno})"
+
+
+def fold_stack(frame) -> str:
+    """Render the stack ending at a frame as a ``;``-separated line."""
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    names.reverse()
+    return ";".join(names)
+
+
+class SamplingProfiler:
+    """
+    Sample the stacks of some threads until stopped.
+
+    Parameters
+    ----------
+    threads : set[int]
+        Ids of the threads to sample. The set is read at every sample,
+        so threads can be added and removed while the profiler runs.
+    interval : float
+        Seconds between two samples.
+    max_seconds : float
+        Sampling stops by itself after this long, should the profiler
+        never be stopped.
+    """
+
+    def __init__(
+        self, threads: set[int], interval: float, max_seconds: float
+    ):
+        self.threads = threads
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.samples: collections.Counter[str] = collections.Counter()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "SamplingProfiler":
+        """Start sampling in a daemon thread."""
+        self._thread = threading.Thread(
+            target=self._run, name="request-profiler", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> collections.Counter:
+        """Stop sampling and return the number of samples per stack."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        return self.samples
+
+    def _run(self) -> None:
+        deadline = time.monotonic() + self.max_seconds
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for thread in tuple(self.threads):
+                frame = frames.get(thread)
+                if frame is not None:
+                    self.samples[fold_stack(frame)] += 1
+            if time.monotonic() > deadline:
+                break
+
+
+def folded_stacks(samples: collections.Counter) -> str:
+    """Render sample counts in the folded stacks format."""
+    return "".join(
+        f"{stack} {count}\n" for stack, count in samples.most_common()
+    )
+
+
+def write_profile(directory: str, name: str, folded: str) -> str:
+    """
+    Store folded stacks as ``<directory>/<name>.folded``.
+
+    The file is written under a temporary name and renamed, so a
+    partially written profile is never served.
+
+    Returns
+    -------
+    str
+        The path of the profile.
+    """
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{name}.folded")
+    partial = f"{path}.partial"
+    with open(partial, "w", encoding="utf-8") as file:
+        file.write(folded)
+    os.replace(partial, path)
+    return path
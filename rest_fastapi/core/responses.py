@@ -0,0 +1,107 @@
+"""
+Fast JSON responses.
+
+FastAPI's default `JSONResponse` encodes with the stdlib `json` module,
+after `jsonable_encoder` has walked the whole payload in Python to turn
+it into plain types. This module provides cheaper alternatives, all
+built on pydantic-core's Rust serializer:
+
+- `FastJSONResponse`, the application's default response class. It
+  accepts datetimes, UUIDs, decimals and pydantic models directly, so
+  a handler returning it skips `jsonable_encoder` altogether.
+- `PreEncodedJSON`, for payloads that never change: the body is encoded
+  once and every response reuses the same bytes.
+- `model_response`, which serializes a response model with the
+  serializer pydantic compiled for its class, instead of validating the
+  returned value against ``response_model`` and re-encoding it.
+
+Handlers returning a plain dict keep working; the dict then goes
+through `jsonable_encoder` and `FastJSONResponse`.
+"""
+import functools
+import hashlib
+from typing import Any, Mapping, Optional
+
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel
+from pydantic_core import to_json
+
+
+class FastJSONResponse(JSONResponse):
+    """`JSONResponse` rendered by pydantic-core instead of `json`."""
+
+    def render(self, content: Any) -> bytes:
+        return to_json(content)
+
+
+class PreEncodedJSON:
+    """
+    A constant JSON payload, encoded once.
+
+    Parameters
+    ----------
+    content : Any
+        The payload. It is encoded immediately and not kept.
+    status_code : int, optional
+        Status code of the responses.
+
+    Examples
+    --------
+    >>> HELLO = PreEncodedJSON({"message": "hello"})
+    >>> HELLO.body
+    b'{"message":"hello"}'
+    """
+
+    def __init__(self, content: Any, status_code: int = 200):
+        self.body: bytes = to_json(content)
+        self.status_code = status_code
+
+    @functools.cached_property
+    def version(self) -> str:
+        """Digest of the body, computed once, for conditional GETs."""
+        return hashlib.blake2b(self.body, digest_size=12).hexdigest()
+
+    def response(
+        self, headers: Optional[Mapping[str, str]] = None
+    ) -> Response:
+        """Return a new response carrying the encoded body."""
+        return Response(
+            self.body,
+            status_code=self.status_code,
+            headers=headers,
+            media_type="application/json",
+        )
+
+
+def model_response(
+    model: BaseModel,
+    status_code: int = 200,
+    headers: Optional[Mapping[str, str]] = None,
+) -> Response:
+    """
+    Serialize a pydantic model with its compiled serializer.
+
+    The route should still declare ``response_model`` so the schema
+    appears in the OpenAPI document; FastAPI leaves returned responses
+    untouched.
+
+    Parameters
+    ----------
+    model : BaseModel
+        The response body.
+    status_code : int, optional
+        Status code of the response.
+    headers : Mapping[str, str], optional
+        Extra response headers.
+
+    Returns
+    -------
+    Response
+        A JSON response with the serialized model.
+    """
+    return Response(
+        type(model).__pydantic_serializer__.to_json(model),
+        status_code=status_code,
+        headers=headers,
+        media_type="application/json",
+    )
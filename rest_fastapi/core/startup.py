@@ -0,0 +1,67 @@
+"""
+Heavy optional backends and their loading.
+
+The SQL Server and BigQuery backends pull in large native libraries
+(pyodbc, gRPC, the Google clients, pyarrow) that take far longer to
+import than the rest of the application. They are only imported inside
+the functions that use them, so a worker that never touches a backend
+never pays for it, and the application starts quickly.
+
+Under gunicorn's preload mode the application is imported once in the
+master process and the workers are forked from it, sharing its memory
+copy-on-write. `preload_backends` lets the master also import the
+backends the settings enable, so the workers inherit them instead of
+each importing them on its first request. Only modules are imported:
+clients, connections and threads are still created in the workers.
+"""
+import importlib
+
+from rest_fastapi.core.config import Settings
+
+# Modules behind each backend, in import order
+HEAVY_BACKENDS: dict[str, tuple[str, ...]] = {
+    "sqlserver": ("pyodbc",),
+    "bigquery": (
+        "google.api_core.exceptions",
+        "google.cloud.bigquery_storage_v1",
+        "pyarrow",
+    ),
+}
+
+
+def enabled_backends(settings: Settings) -> list[str]:
+    """Return the heavy backends the settings make use of."""
+    backends = []
+    if settings.DB_CONNECTION_STRING:
+        backends.append("sqlserver")
+    if settings.BIGQUERY_EXPORT_TABLES:
+        backends.append("bigquery")
+    return backends
+
+
+def preload_backends(settings: Settings) -> list[str]:
+    """
+    Import the modules of the backends the settings enable.
+
+    Backends whose packages are not installed are skipped; they fail
+    later, with the usual error, when first used.
+
+    Parameters
+    ----------
+    settings : Settings
+        The application settings.
+
+    Returns
+    -------
+    list[str]
+        The modules that were imported.
+    """
+    imported = []
+    for backend in enabled_backends(settings):
+        for module in HEAVY_BACKENDS[backend]:
+            try:
+                importlib.import_module(module)
+            except ImportError:
+                break
+            imported.append(module)
+    return imported
@@ -0,0 +1,284 @@
+"""
+Per-request tracing spans.
+
+A *trace* collects the time a request spends in each phase of its
+handling, as named *spans*. `TracingMiddleware` starts a trace for the
+requests it samples and reports the spans in a ``Server-Timing`` header
+and a log record; the phases are recorded where they happen:
+
+- ``ratelimit``: identifying the principal and charging its bucket;
+- ``settings``: checking the .env file for changes and reloading it;
+- ``auth``: verifying a JWT or an API key;
+- ``pool``: waiting for a database connection;
+- ``deps``: resolving the route's dependencies, ``auth`` included;
+- ``queue``: waiting for a threadpool worker, for sync handlers;
+- ``handler``: running the handler;
+- ``serialize``: validating and rendering the handler's return value.
+
+The trace lives in a context variable, so code at any depth can add to
+it without it being passed around, and threadpool calls see the trace
+of the request that made them. When the request is not traced,
+recording a span costs a context variable lookup.
+
+Routes are instrumented once, after they are registered, with
+`instrument_routes`; other code records spans with `span` or `record`::
+
+    with span("render"):
+        body = render(report)
+"""
+import contextvars
+import inspect
+import threading
+import time
+from typing import Any, Callable, Iterable, Optional, Union
+
+from fastapi.routing import APIRoute, request_response
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import Request
+from starlette.responses import Response
+
+
+class Trace:
+    """
+    The spans recorded for one request.
+
+    Attributes
+    ----------
+    start : float
+        When the trace started, from `time.perf_counter`.
+    spans : list[tuple[str, float, float]]
+        The name, start and end of every span, in the order they ended.
+    threads : set[int]
+        Ids of the threads working on the request: the event loop's,
+        and threadpool workers running its handler. The profiler
+        samples these.
+    """
+
+    __slots__ = ("start", "spans", "threads")
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.spans: list[tuple[str, float, float]] = []
+        self.threads = {threading.get_ident()}
+
+    def add(self, name: str, start: float, end: float) -> None:
+        """Record a span; `start` and `end` come from `perf_counter`."""
+        self.spans.append((name, start, end))
+
+    def durations(self) -> dict[str, float]:
+        """
+        Return the time spent in each phase, in milliseconds.
+
+        Spans of the same name are added up. Phases are listed in the
+        order they started.
+        """
+        durations: dict[str, float] = {}
+        for name, start, end in sorted(self.spans, key=lambda s: s[1]):
+            durations[name] = durations.get(name, 0.0) + (end - start) * 1e3
+        return durations
+
+    def server_timing(self, total: Optional[float] = None) -> str:
+        """
+        Render the spans as a ``Server-Timing`` header value.
+
+        Parameters
+        ----------
+        total : float, optional
+            The time the request has taken so far, from `perf_counter`;
+            added as the ``app`` metric.
+        """
+        metrics = [
+            f"{name};dur={duration:.3f}"
+            for name, duration in self.durations().items()
+        ]
+        if total is not None:
+            metrics.append(f"app;dur={(total - self.start) * 1e3:.3f}")
+        return ", ".join(metrics)
+
+
+_current_trace: contextvars.ContextVar[Optional[Trace]] = (
+    contextvars.ContextVar("trace", default=None)
+)
+
+
+def current_trace() -> Optional[Trace]:
+    """Return the trace of the current request, if it is traced."""
+    return _current_trace.get()
+
+
+def start_trace() -> tuple[Trace, contextvars.Token]:
+    """
+    Start tracing the current request.
+
+    Returns
+    -------
+    tuple[Trace, contextvars.Token]
+        The new trace, and the token to pass to `end_trace`.
+    """
+    trace = Trace()
+    return trace, _current_trace.set(trace)
+
+
+def end_trace(token: contextvars.Token) -> None:
+    """Stop tracing, restoring the context `start_trace` changed."""
+    _current_trace.reset(token)
+
+
+def record(name: str, start: float) -> None:
+    """Record a span that started at `start` and ends now."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(name, start, time.perf_counter())
+
+
+class _Span:
+    """Context manager adding the block it wraps to a trace."""
+
+    __slots__ = ("trace", "name", "start")
+
+    def __init__(self, trace: Trace, name: str):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self) -> "_Span":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.trace.add(self.name, self.start, time.perf_counter())
+
+
+class _NoSpan:
+    """Context manager doing nothing, for requests not traced."""
+
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoSpan":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        return None
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name: str) -> Union[_Span, _NoSpan]:
+    """
+    Return a context manager recording the block it wraps as a span.
+
+    Outside a trace a shared no-op context manager is returned, so
+    nothing is allocated or timed.
+
+    Parameters
+    ----------
+    name : str
+        The span name, a ``Server-Timing`` metric name: letters,
+        digits and ``-``.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        return _NO_SPAN
+    return _Span(trace, name)
+
+
+# --- Route instrumentation ---
+
+def _timed_endpoint(call: Callable, is_coroutine: bool) -> Callable:
+    """
+    Wrap a route's endpoint to record the ``handler`` span.
+
+    Sync endpoints are run in the threadpool by the wrapper itself, as
+    FastAPI would, so the wait for a worker is recorded as ``queue``.
+    """
+    if is_coroutine:
+        async def endpoint(**values: Any) -> Any:
+            trace = _current_trace.get()
+            if trace is None:
+                return await call(**values)
+            start = time.perf_counter()
+            try:
+                return await call(**values)
+            finally:
+                trace.add("handler", start, time.perf_counter())
+    else:
+        def run(trace: Trace, queued: float, values: dict) -> Any:
+            start = time.perf_counter()
+            trace.add("queue", queued, start)
+            thread = threading.get_ident()
+            trace.threads.add(thread)
+            try:
+                return call(**values)
+            finally:
+                trace.threads.discard(thread)
+                trace.add("handler", start, time.perf_counter())
+
+        async def endpoint(**values: Any) -> Any:
+            trace = _current_trace.get()
+            if trace is None:
+                return await run_in_threadpool(call, **values)
+            return await run_in_threadpool(
+                run, trace, time.perf_counter(), values
+            )
+
+    endpoint.__wrapped__ = call
+    return endpoint
+
+
+def _timed_handler(handler: Callable) -> Callable:
+    """
+    Wrap a route's request handler to record ``deps`` and ``serialize``.
+
+    The handler parses the body, resolves the dependencies, calls the
+    endpoint and renders its return value; the endpoint spans split it
+    in those phases.
+    """
+    async def timed(request: Request) -> Response:
+        trace = _current_trace.get()
+        if trace is None:
+            return await handler(request)
+        start = time.perf_counter()
+        count = len(trace.spans)
+        try:
+            return await handler(request)
+        finally:
+            end = time.perf_counter()
+            phases = {
+                name: (span_start, span_end)
+                for name, span_start, span_end in trace.spans[count:]
+                if name in ("queue", "handler")
+            }
+            if "handler" not in phases:
+                # A dependency raised, e.g. a 401 or a 304
+                trace.add("deps", start, end)
+            else:
+                called = phases.get("queue", phases["handler"])[0]
+                trace.add("deps", start, called)
+                trace.add("serialize", phases["handler"][1], end)
+
+    return timed
+
+
+def instrument_routes(routes: Iterable[Any]) -> None:
+    """
+    Record the phases of the requests handled by API routes.
+
+    Call it once all routes are registered. Each `APIRoute` gets its
+    endpoint and request handler wrapped; the wrappers only check the
+    context variable when the request is not traced.
+
+    Parameters
+    ----------
+    routes : Iterable
+        The application's routes; other kinds of routes are skipped.
+    """
+    for route in routes:
+        if not isinstance(route, APIRoute):
+            continue
+        dependant = route.dependant
+        if hasattr(dependant.call, "__wrapped__"):
+            continue  # Already instrumented
+        dependant.call = _timed_endpoint(
+            dependant.call, inspect.iscoroutinefunction(dependant.call)
+        )
+        route.app = request_response(_timed_handler(route.get_route_handler()))
@@ -0,0 +1,486 @@
+"""
+Arrow exports through the BigQuery Storage Read API.
+
+The Storage Read API serves a table as a read session split into
+several streams. Each stream returns record batches that BigQuery has
+already serialized as Arrow IPC messages, and the session carries the
+serialized schema. The session schema followed by every batch and the
+end-of-stream marker is a valid Arrow IPC stream, so `stream_session`
+forwards those bytes to the client unchanged and no row is ever decoded
+in Python on that path.
+
+The streams are read in parallel, one thread each, because the gRPC
+reads are blocking. Batches are handed to the event loop through a
+bounded buffer: when the client reads slowly the reader threads stop
+pulling from BigQuery instead of piling batches up in memory. When the
+client disconnects the readers are stopped at their next batch.
+
+Clients that do not accept Arrow get newline-delimited JSON or a JSON
+array instead. Only then are batches decoded, with pyarrow, in the
+reader threads.
+
+The Google client is imported lazily, and everything but
+`open_read_session` works with any object implementing
+`ArrowReadSession`, which is how the tests run without BigQuery.
+"""
+import asyncio
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing
+from typing import (
+    AsyncIterator,
+    Callable,
+    Iterator,
+    Literal,
+    Optional,
+    Protocol,
+)
+
+from fastapi import Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
+from pydantic_core import to_json
+
+from rest_fastapi.core.config import Settings, get_settings
+
+ArrowExportFormat = Literal["arrow", "ndjson", "json"]
+
+# Checked in this order against the Accept header
+MEDIA_TYPES: dict[str, str] = {
+    "arrow": "application/vnd.apache.arrow.stream",
+    "ndjson": "application/x-ndjson",
+    "json": "application/json",
+}
+
+# Continuation marker and zero length: the end of an Arrow IPC stream
+ARROW_EOS = b"\xff\xff\xff\xff\x00\x00\x00\x00"
+
+
+class ArrowReadSession(Protocol):
+    """
+    A table read split into streams of serialized Arrow batches.
+
+    Attributes
+    ----------
+    serialized_schema : bytes
+        The schema as an encapsulated Arrow IPC message.
+    stream_names : list[str]
+        The streams to read. Every row of the read is in exactly one.
+    """
+
+    serialized_schema: bytes
+    stream_names: list[str]
+
+    def read_stream(self, name: str) -> Iterator[bytes]:
+        """Yield the record batches of a stream as IPC messages."""
+        ...
+
+
+ReadSessionOpener = Callable[[str, Optional[list[str]]], ArrowReadSession]
+
+# Returns the version of a table, or None if it cannot be read
+TableVersionLoader = Callable[[str], Optional[str]]
+
+
+# --- BigQuery implementation ---
+
+class BigQueryReadSession:
+    """
+    An `ArrowReadSession` over a Storage Read API session.
+
+    Parameters
+    ----------
+    client : BigQueryReadClient
+        The client that created the session.
+    session : ReadSession
+        The session returned by `create_read_session`.
+    """
+
+    def __init__(self, client, session):
+        self._client = client
+        self.serialized_schema: bytes = session.arrow_schema.serialized_schema
+        self.stream_names: list[str] = [s.name for s in session.streams]
+
+    def read_stream(self, name: str) -> Iterator[bytes]:
+        # The client resumes from the last offset on transient errors
+        for response in self._client.read_rows(name):
+            yield response.arrow_record_batch.serialized_record_batch
+
+
+@functools.lru_cache(maxsize=1)
+def get_read_client():
+    """
+    Return the process-wide Storage Read API client.
+
+    The client is thread-safe and holds a gRPC channel, so it is built
+    once, on first use, with the default application credentials.
+    """
+    from google.cloud.bigquery_storage_v1 import BigQueryReadClient
+
+    return BigQueryReadClient()
+
+
+def _table_path(table: str) -> str:
+    """Turn ``project.dataset.table`` into a Storage API table path."""
+    project, dataset, table_id = table.split(".", 2)
+    return f"projects/{project}/datasets/{dataset}/tables/{table_id}"
+
+
+def open_read_session(
+    client,
+    table: str,
+    selected_fields: Optional[list[str]] = None,
+    project: Optional[str] = None,
+    max_streams: int = 4,
+) -> BigQueryReadSession:
+    """
+    Create an Arrow read session for a table. This call blocks.
+
+    Parameters
+    ----------
+    client : BigQueryReadClient
+        The Storage Read API client.
+    table : str
+        The table, as ``project.dataset.table``.
+    selected_fields : list[str], optional
+        Columns to read. All columns are read if omitted.
+    project : str, optional
+        Project billed for the read. Defaults to the table's project.
+    max_streams : int, optional
+        Upper bound on the number of streams. BigQuery may return
+        fewer, e.g. for small tables.
+
+    Returns
+    -------
+    BigQueryReadSession
+        The session, ready to be streamed.
+
+    Raises
+    ------
+    HTTPException
+        With status 400 if BigQuery rejects the request (e.g. an
+        unknown column), or 502 if the session cannot be created.
+    """
+    from google.api_core import exceptions
+    from google.cloud.bigquery_storage_v1 import types
+
+    requested = types.ReadSession(
+        table=_table_path(table),
+        data_format=types.DataFormat.ARROW,
+        read_options=types.ReadSession.TableReadOptions(
+            selected_fields=selected_fields or [],
+        ),
+    )
+    billing_project = project or table.split(".", 1)[0]
+    try:
+        session = client.create_read_session(
+            parent=f"projects/{billing_project}",
+            read_session=requested,
+            max_stream_count=max_streams,
+        )
+    except exceptions.InvalidArgument as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=exc.message
+        )
+    except exceptions.GoogleAPICallError:
+        raise HTTPException(
+            status_code=status.HTTP_502_BAD_GATEWAY,
+            detail="Could not start a BigQuery read session",
+        )
+    return BigQueryReadSession(client, session)
+
+
+async def get_read_session_opener(
+    settings: Settings = Depends(get_settings),
+) -> ReadSessionOpener:
+    """
+    Dependency returning a function that opens table read sessions.
+
+    Tests override this dependency to serve a local fake session.
+    """
+    def opener(
+        table: str, selected_fields: Optional[list[str]]
+    ) -> ArrowReadSession:
+        return open_read_session(
+            get_read_client(),
+            table,
+            selected_fields,
+            project=settings.BIGQUERY_PROJECT,
+            max_streams=settings.BIGQUERY_MAX_READ_STREAMS,
+        )
+
+    return opener
+
+
+@functools.lru_cache(maxsize=1)
+def get_metadata_client():
+    """
+    Return the process-wide BigQuery API client, for table metadata.
+
+    Built once, on first use, with the default application credentials.
+    """
+    from google.cloud import bigquery
+
+    return bigquery.Client()
+
+
+def read_table_version(client, table: str) -> Optional[str]:
+    """
+    Read the version of a table from its metadata. This call blocks.
+
+    The version changes whenever the table's data or schema does, so
+    exports can be revalidated without reading a single row.
+
+    Parameters
+    ----------
+    client : google.cloud.bigquery.Client
+        The BigQuery API client.
+    table : str
+        The table, as ``project.dataset.table``.
+
+    Returns
+    -------
+    str or None
+        The last modification time and row count, or None if the
+        metadata cannot be read; the export then goes without an ETag.
+    """
+    try:
+        metadata = client.get_table(table)
+    except Exception:
+        # Validators are an optimisation, never a reason to fail
+        return None
+    if metadata.modified is None:
+        return None
+    return f"{metadata.modified.isoformat()}/{metadata.num_rows}"
+
+
+# Table -> (expiry, version), shared by the threads of a worker
+_table_versions: dict[str, tuple[float, Optional[str]]] = {}
+
+
+async def get_table_version_loader(
+    settings: Settings = Depends(get_settings),
+) -> TableVersionLoader:
+    """
+    Dependency returning a function that reads table versions.
+
+    Versions are cached for BIGQUERY_TABLE_VERSION_TTL_SECONDS, so
+    clients polling an export cost at most one metadata call per table
+    and period per worker. Tests override this dependency.
+    """
+    ttl = settings.BIGQUERY_TABLE_VERSION_TTL_SECONDS
+
+    def loader(table: str) -> Optional[str]:
+        now = time.monotonic()
+        cached = _table_versions.get(table)
+        if cached is not None and cached[0] > now:
+            return cached[1]
+        try:
+            client = get_metadata_client()
+        except Exception:  # E.g. no credentials
+            version = None
+        else:
+            version = read_table_version(client, table)
+        _table_versions[table] = (now + ttl, version)
+        return version
+
+    return loader
+
+
+# --- JSON fallback, run in the reader threads ---
+
+def _read_schema(serialized_schema: bytes):
+    import pyarrow
+
+    return pyarrow.ipc.read_schema(pyarrow.py_buffer(serialized_schema))
+
+
+def _batch_rows(schema, message: bytes) -> list[dict]:
+    import pyarrow
+
+    batch = pyarrow.ipc.read_record_batch(pyarrow.py_buffer(message), schema)
+    return batch.to_pylist()
+
+
+def encode_ndjson(schema, message: bytes) -> bytes:
+    """Encode a serialized record batch as newline-delimited JSON."""
+    return b"".join(
+        to_json(row, bytes_mode="base64") + b"\n"
+        for row in _batch_rows(schema, message)
+    )
+
+
+def encode_json_items(schema, message: bytes) -> bytes:
+    """Encode a serialized record batch as comma-separated JSON objects."""
+    # Strip the brackets so batches can be joined into one array
+    return to_json(_batch_rows(schema, message), bytes_mode="base64")[1:-1]
+
+
+# --- Parallel stream reading ---
+
+class _Failure:
+    """A reader error, passed to the event loop to be re-raised."""
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+_STREAM_DONE = object()
+
+
+async def read_streams(
+    session: ArrowReadSession,
+    transform: Optional[Callable[[bytes], bytes]] = None,
+    buffered_batches: int = 8,
+) -> AsyncIterator[bytes]:
+    """
+    Read all streams of a session in parallel.
+
+    Batches are yielded in the order they arrive, so batches of
+    different streams are interleaved.
+
+    Parameters
+    ----------
+    session : ArrowReadSession
+        The session to read.
+    transform : callable, optional
+        Applied to each serialized batch in its reader thread.
+    buffered_batches : int, optional
+        Batches read ahead of the consumer, across all streams. Readers
+        wait once the buffer is full.
+
+    Yields
+    ------
+    bytes
+        Each batch, transformed if `transform` is given.
+    """
+    names = list(session.stream_names)
+    if not names:
+        return
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    slots = threading.Semaphore(buffered_batches)
+    stop = threading.Event()
+
+    def put(item) -> None:
+        if not stop.is_set():
+            loop.call_soon_threadsafe(queue.put_nowait, item)
+
+    def read(name: str) -> None:
+        try:
+            for message in session.read_stream(name):
+                while not slots.acquire(timeout=0.1):
+                    if stop.is_set():
+                        return
+                if stop.is_set():
+                    return
+                put(transform(message) if transform else message)
+        except BaseException as exc:
+            put(_Failure(exc))
+        else:
+            put(_STREAM_DONE)
+
+    executor = ThreadPoolExecutor(
+        max_workers=len(names), thread_name_prefix="bigquery-read"
+    )
+    try:
+        for name in names:
+            executor.submit(read, name)
+        remaining = len(names)
+        while remaining:
+            item = await queue.get()
+            if item is _STREAM_DONE:
+                remaining -= 1
+                continue
+            if isinstance(item, _Failure):
+                raise item.error
+            slots.release()
+            yield item
+    finally:
+        # Readers notice at their next batch; nobody waits for them
+        stop.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def stream_session(
+    session: ArrowReadSession,
+    fmt: ArrowExportFormat = "arrow",
+    buffered_batches: int = 8,
+) -> AsyncIterator[bytes]:
+    """
+    Stream a read session in the requested format.
+
+    Parameters
+    ----------
+    session : ArrowReadSession
+        The session to read.
+    fmt : {"arrow", "ndjson", "json"}, optional
+        ``"arrow"`` forwards the Arrow IPC stream as is; the other
+        formats decode each batch into JSON objects.
+    buffered_batches : int, optional
+        Batches read ahead of the client, across all streams.
+
+    Yields
+    ------
+    bytes
+        Chunks of the encoded response body.
+    """
+    if fmt == "arrow":
+        yield session.serialized_schema
+        async with aclosing(
+            read_streams(session, None, buffered_batches)
+        ) as batches:
+            async for message in batches:
+                yield message
+        yield ARROW_EOS
+        return
+
+    schema = _read_schema(session.serialized_schema)
+    if fmt == "ndjson":
+        transform = functools.partial(encode_ndjson, schema)
+    else:
+        transform = functools.partial(encode_json_items, schema)
+        yield b"["
+    first = True
+    async with aclosing(
+        read_streams(session, transform, buffered_batches)
+    ) as chunks:
+        async for chunk in chunks:
+            if not chunk:
+                continue
+            if fmt == "json" and not first:
+                chunk = b"," + chunk
+            first = False
+            yield chunk
+    if fmt == "json":
+        yield b"]"
+
+
+def session_response(
+    session: ArrowReadSession,
+    fmt: ArrowExportFormat = "arrow",
+    buffered_batches: int = 8,
+) -> StreamingResponse:
+    """
+    Build a streaming response for a read session.
+
+    Parameters
+    ----------
+    session : ArrowReadSession
+        The session to stream.
+    fmt : {"arrow", "ndjson", "json"}, optional
+        Output format, usually from `negotiate_format` with
+        ``media_types=MEDIA_TYPES``.
+    buffered_batches : int, optional
+        Batches read ahead of the client, across all streams.
+
+    Returns
+    -------
+    StreamingResponse
+        The response streaming the table.
+    """
+    return StreamingResponse(
+        stream_session(session, fmt, buffered_batches),
+        media_type=MEDIA_TYPES[fmt],
+    )
@@ -0,0 +1,327 @@
+"""
+Result cache for read queries.
+
+Dashboards tend to send the same expensive query from many clients at
+once. `QueryCache` keeps recent results in memory, keyed on the
+normalized SQL text and its parameters, so repeated reads are served
+without touching the database:
+
+- Entries expire after a TTL, and the cache is bounded by the total
+  (estimated) size of the cached results rather than by their number,
+  evicting the least recently used results first.
+- Concurrent misses for the same key are coalesced: the first caller
+  starts the query and every other caller awaits that same result, so
+  a burst of identical requests runs one backend query.
+
+Usage in a controller::
+
+    rows = await cached_fetchall(
+        cache, pool, "SELECT region, SUM(total) FROM sales GROUP BY region"
+    )
+
+The cache lives on the event loop of its worker and is not shared
+between gunicorn workers; it needs no locking because it is only used
+from coroutines.
+"""
+import asyncio
+import hashlib
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional
+
+from fastapi import Request
+from prometheus_client import Counter, Gauge
+from pydantic_core import to_json
+
+from rest_fastapi.db.pool import ConnectionPool
+
+CACHE_REQUESTS = Counter(
+    "query_cache_requests_total",
+    "Query cache lookups, by result (hit, miss or coalesced).",
+    ["cache", "result"],
+)
+CACHE_EVICTIONS = Counter(
+    "query_cache_evictions_total",
+    "Results removed from the query cache, by reason.",
+    ["cache", "reason"],
+)
+CACHE_BYTES = Gauge(
+    "query_cache_bytes",
+    "Estimated size of the results held in the query cache.",
+    ["cache"],
+    multiprocess_mode="livesum",
+)
+
+# String literals and quoted identifiers are kept verbatim; whitespace
+# and comments elsewhere do not change what a query means.
+_SQL_TOKENS = re.compile(
+    r"""
+    (?P<quoted>'(?:[^']|'')*'|"(?:[^"]|"")*"|\[(?:[^\]]|\]\])*\])
+    | (?P<gap>(?:\s+|--[^\n]*|/\*.*?\*/)+)
+    """,
+    re.VERBOSE | re.DOTALL,
+)
+
+
+def normalize_sql(sql: str) -> str:
+    """
+    Normalize a query's layout so equivalent texts share a cache key.
+
+    Runs of whitespace and comments become a single space and a
+    trailing semicolon is dropped. Quoted text and the case of the
+    query are left untouched.
+    """
+    def replace(match: re.Match) -> str:
+        if match.group("quoted"):
+            return match.group("quoted")
+        return " "
+
+    return _SQL_TOKENS.sub(replace, sql).strip().rstrip(";").rstrip()
+
+
+def _estimate_size(value: Any) -> int:
+    """Approximate the memory held by a result by its JSON size."""
+    if isinstance(value, (bytes, bytearray, str)):
+        return len(value)
+    return len(to_json(value, fallback=str))
+
+
+class _Entry:
+    """A cached result with its size and expiry time."""
+
+    __slots__ = ("value", "size", "expires")
+
+    def __init__(self, value: Any, size: int, expires: float):
+        self.value = value
+        self.size = size
+        self.expires = expires
+
+
+class QueryCache:
+    """
+    TTL and size-bounded LRU cache with single-flight loading.
+
+    Parameters
+    ----------
+    max_bytes : int
+        Upper bound on the estimated size of all cached results. With
+        0 nothing is stored, but concurrent misses are still coalesced.
+    ttl : float
+        Default number of seconds a result stays cached.
+    sizeof : callable, optional
+        Estimates the size of a result in bytes. Defaults to the length
+        of its JSON encoding.
+    clock : callable, optional
+        Time source, injectable for tests.
+    name : str, optional
+        Label of the cache in metrics.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        ttl: float,
+        sizeof: Callable[[Any], int] = _estimate_size,
+        clock: Callable[[], float] = time.monotonic,
+        name: str = "default",
+    ):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.name = name
+        self._sizeof = sizeof
+        self._clock = clock
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._inflight: dict[str, asyncio.Task] = {}
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._coalesced = 0
+        self._evictions = 0
+        self._requests = {
+            result: CACHE_REQUESTS.labels(name, result)
+            for result in ("hit", "miss", "coalesced")
+        }
+        self._size_gauge = CACHE_BYTES.labels(name)
+
+    @staticmethod
+    def make_key(sql: str, params: tuple = (), namespace: str = "") -> str:
+        """
+        Build the cache key of a query.
+
+        Parameters are keyed by their ``repr``, so ``1`` and ``"1"``
+        give different keys.
+
+        Parameters
+        ----------
+        sql : str
+            The query text.
+        params : tuple, optional
+            Query parameters.
+        namespace : str, optional
+            Separates identical queries run against different databases.
+        """
+        material = "\0".join(
+            (namespace, normalize_sql(sql), repr(tuple(params)))
+        )
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    async def get_or_load(
+        self,
+        key: str,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: Optional[float] = None,
+    ) -> Any:
+        """
+        Return the cached result for a key, loading it on a miss.
+
+        The loader runs in its own task, so a caller that is cancelled
+        (e.g. because its client disconnected) does not fail the other
+        callers waiting for the same result. Errors are not cached;
+        every caller waiting on a failed load receives the exception.
+
+        Parameters
+        ----------
+        key : str
+            Cache key, usually from `make_key`.
+        loader : callable
+            Coroutine function producing the result.
+        ttl : float, optional
+            Lifetime of this result, overriding the default TTL.
+
+        Returns
+        -------
+        Any
+            The cached or freshly loaded result. Callers must not
+            mutate it, as it is shared.
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry.expires > self._clock():
+                self._entries.move_to_end(key)
+                self._hits += 1
+                self._requests["hit"].inc()
+                return entry.value
+            self._remove(key, "expired")
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self._coalesced += 1
+            self._requests["coalesced"].inc()
+        else:
+            self._misses += 1
+            self._requests["miss"].inc()
+            task = asyncio.ensure_future(loader())
+            self._inflight[key] = task
+            task.add_done_callback(
+                lambda done: self._loaded(key, done, ttl)
+            )
+        return await asyncio.shield(task)
+
+    def _loaded(self, key: str, task: asyncio.Task, ttl: Optional[float]):
+        if self._inflight.get(key) is not task:
+            return  # Discarded while loading: the result may be stale
+        del self._inflight[key]
+        if task.cancelled() or task.exception() is not None:
+            return
+        self.put(key, task.result(), ttl)
+
+    def put(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Store a result, evicting least recently used ones as needed."""
+        size = self._sizeof(value)
+        if key in self._entries:
+            self._remove(key, "replaced")
+        if size > self.max_bytes:
+            return  # Would evict everything else; serve it uncached
+        expires = self._clock() + (self.ttl if ttl is None else ttl)
+        self._entries[key] = _Entry(value, size, expires)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest, "size")
+        self._size_gauge.set(self._bytes)
+
+    def discard(self, key: str) -> None:
+        """
+        Drop a result, e.g. after writing to the data behind it.
+
+        A load of the key already running is detached: its callers
+        still receive its result, but it is not stored, and the next
+        caller loads again.
+        """
+        self._inflight.pop(key, None)
+        if key in self._entries:
+            self._remove(key, "invalidated")
+            self._size_gauge.set(self._bytes)
+
+    def clear(self) -> None:
+        """Drop all cached results, and detach the running loads."""
+        self._inflight.clear()
+        for key in list(self._entries):
+            self._remove(key, "invalidated")
+        self._size_gauge.set(self._bytes)
+
+    def _remove(self, key: str, reason: str) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        if reason in ("size", "expired"):
+            self._evictions += 1
+        CACHE_EVICTIONS.labels(self.name, reason).inc()
+
+    def stats(self) -> dict:
+        """Return counters for monitoring and tests."""
+        lookups = self._hits + self._misses + self._coalesced
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self._hits,
+            "misses": self._misses,
+            "coalesced": self._coalesced,
+            "evictions": self._evictions,
+            "inflight": len(self._inflight),
+            "hit_ratio": (
+                (self._hits + self._coalesced) / lookups if lookups else 0.0
+            ),
+        }
+
+
+async def cached_fetchall(
+    cache: QueryCache,
+    pool: ConnectionPool,
+    sql: str,
+    params: tuple = (),
+    ttl: Optional[float] = None,
+) -> list:
+    """
+    Run a read query through the cache.
+
+    Parameters
+    ----------
+    cache : QueryCache
+        The result cache.
+    pool : ConnectionPool
+        Pool used on a miss. Its name is part of the cache key.
+    sql : str
+        The query. Use placeholders for all values.
+    params : tuple, optional
+        Query parameters.
+    ttl : float, optional
+        Lifetime of the result, overriding the cache default.
+
+    Returns
+    -------
+    list
+        The rows, shared with other callers; do not mutate them.
+    """
+    async def load() -> list:
+        async with pool.acquire() as conn:
+            return await conn.fetchall(sql, params)
+
+    key = cache.make_key(sql, params, namespace=pool.name)
+    return await cache.get_or_load(key, load, ttl)
+
+
+async def get_query_cache(request: Request) -> QueryCache:
+    """Dependency returning the application's query result cache."""
+    return request.app.state.query_cache
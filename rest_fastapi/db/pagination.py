@@ -0,0 +1,439 @@
+"""
+Keyset pagination with opaque, signed cursors.
+
+With ``OFFSET``, the server reads and throws away every row before the
+requested page, so page 1000 costs a thousand pages. Keyset pagination
+instead remembers where the previous page ended, the sort key of its
+last row, and asks for the rows after it::
+
+    WHERE created_at <= ? AND (created_at < ? OR (created_at = ?
+        AND id < ?))
+    ORDER BY created_at DESC, id DESC
+
+With an index on the sort columns that is one index seek whatever the
+depth, so every page costs the same as the first. The leading bound
+(``created_at <= ?``) repeats the first condition so the optimizer can
+seek on it; SQL Server has no row-value comparison to say it shorter.
+
+The last sort key is handed to the client as an opaque cursor: the key
+values as JSON, with an HMAC derived from ``SECRET_KEY`` over them and
+the query they page. A client can neither forge a position nor reuse a
+cursor on another query; a tampered cursor is rejected with 400.
+Cursors do not expire, but rotating ``SECRET_KEY`` invalidates them.
+
+The sort keys must be columns of the query that are never NULL, the
+last one unique (e.g. the primary key), so the order is total. Values
+are round-tripped through JSON, with dates, times and decimals tagged
+with their type, so they are bound as the same type on the next page:
+SQL Server cannot convert an ISO string with microseconds to
+``DATETIME``.
+
+Pages are streamed: rows are fetched in `fetchmany` batches and
+encoded into the body as they come, as a JSON object whose
+``next_cursor`` is written after the rows (``null`` on the last page).
+
+Usage in a controller::
+
+    ITEMS = Keyset(
+        "SELECT id, name, created_at FROM items WHERE region = ?",
+        [SortKey("created_at", descending=True), SortKey("id", True)],
+    )
+
+    @router.get("/items")
+    async def list_items(
+        self,
+        region: str,
+        page: Annotated[PageRequest, Depends(get_page_request)],
+        pool: Annotated[ConnectionPool, Depends(get_db_pool)],
+        settings: Annotated[Settings, Depends(get_settings)],
+    ):
+        return ITEMS.response(pool, page, settings, params=(region,))
+"""
+import base64
+import binascii
+import datetime
+import functools
+import hashlib
+import hmac
+import json
+import re
+from contextlib import aclosing
+from decimal import Decimal, InvalidOperation
+from typing import Annotated, AsyncIterator, NamedTuple, Optional, Union
+
+from fastapi import Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from pydantic_core import to_json
+
+from rest_fastapi.core.config import Settings, get_settings
+from rest_fastapi.db.pool import ConnectionPool
+from rest_fastapi.db.streaming import stream_query
+
+# Sort columns are interpolated into SQL, so only plain identifiers
+_IDENTIFIER = re.compile(r"^\w+$", re.ASCII)
+
+# Bytes of HMAC-SHA256 kept in a cursor
+_TAG_SIZE = 16
+
+# Key value types that JSON would turn into strings, by cursor tag;
+# datetime first, as it is a date
+_KEY_TYPES = {
+    "$datetime": (datetime.datetime, datetime.datetime.fromisoformat),
+    "$date": (datetime.date, datetime.date.fromisoformat),
+    "$time": (datetime.time, datetime.time.fromisoformat),
+    "$decimal": (Decimal, Decimal),
+}
+
+# Row limit of SQL Server, after ORDER BY
+FETCH_NEXT = "OFFSET 0 ROWS FETCH NEXT ? ROWS ONLY"
+
+
+class SortKey(NamedTuple):
+    """A column of the sort order of a `Keyset`."""
+
+    column: str
+    descending: bool = False
+
+
+class PageRequest(NamedTuple):
+    """The cursor and page size of a request for a page."""
+
+    cursor: Optional[str]
+    limit: int
+
+
+# --- Cursors ---
+
+@functools.lru_cache(maxsize=4)
+def _cursor_key(secret: str) -> bytes:
+    """Derive the cursor signing key, distinct from the JWT key."""
+    return hmac.new(
+        secret.encode("utf-8"), b"pagination-cursor", hashlib.sha256
+    ).digest()
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _encode_value(value):
+    """Tag a key value JSON cannot hold with its type."""
+    for tag, (kind, _) in _KEY_TYPES.items():
+        if isinstance(value, kind):
+            return {tag: str(value) if kind is Decimal else value.isoformat()}
+    return value
+
+
+def _decode_value(value):
+    """Parse a key value tagged by `_encode_value`."""
+    if not isinstance(value, dict):
+        return value
+    if len(value) != 1:
+        raise ValueError("Malformed cursor")
+    (tag, text), = value.items()
+    if tag not in _KEY_TYPES or not isinstance(text, str):
+        raise ValueError("Malformed cursor")
+    try:
+        return _KEY_TYPES[tag][1](text)
+    except (ValueError, InvalidOperation):
+        raise ValueError("Malformed cursor")
+
+
+def sign_cursor(values: list, secret: str, context: bytes) -> str:
+    """
+    Encode sort key values as an opaque cursor.
+
+    Parameters
+    ----------
+    values : list
+        The sort key of the last row of a page.
+    secret : str
+        The application's ``SECRET_KEY``.
+    context : bytes
+        Identifies the query the cursor pages; a cursor is only valid
+        for the same context.
+
+    Returns
+    -------
+    str
+        The URL-safe cursor.
+    """
+    payload = to_json([_encode_value(value) for value in values])
+    tag = hmac.new(
+        _cursor_key(secret), context + payload, hashlib.sha256
+    ).digest()[:_TAG_SIZE]
+    return f"{_b64encode(payload)}.{_b64encode(tag)}"
+
+
+def read_cursor(cursor: str, secret: str, context: bytes) -> list:
+    """
+    Decode a cursor made by `sign_cursor`.
+
+    Raises
+    ------
+    ValueError
+        If the cursor is malformed, or was not signed with this secret
+        for this context.
+    """
+    try:
+        payload, tag = (_b64decode(part) for part in cursor.split("."))
+    except (ValueError, binascii.Error):
+        raise ValueError("Malformed cursor")
+    expected = hmac.new(
+        _cursor_key(secret), context + payload, hashlib.sha256
+    ).digest()[:_TAG_SIZE]
+    if not hmac.compare_digest(tag, expected):
+        raise ValueError("Invalid cursor signature")
+    values = json.loads(payload)
+    if not isinstance(values, list):
+        raise ValueError("Malformed cursor")
+    return [_decode_value(value) for value in values]
+
+
+# --- Pages ---
+
+class _PageEncoder:
+    """
+    Encodes the rows of a page as JSON array items, on the pool
+    executor, and remembers the sort key of the last one.
+
+    The query fetches one row more than the page, which tells whether
+    there is a next page; that row is not sent.
+    """
+
+    def __init__(self, key_columns: list[str], limit: int):
+        self.key_columns = key_columns
+        self.limit = limit
+        self.count = 0
+        self.more = False
+        self.last: Optional[list] = None
+        self._indexes: Optional[list[int]] = None
+
+    def __call__(self, columns: list[str], rows: list) -> bytes:
+        if self._indexes is None:
+            self._indexes = [columns.index(c) for c in self.key_columns]
+        kept = rows[:self.limit - self.count]
+        if len(kept) < len(rows):
+            self.more = True
+        if not kept:
+            return b""
+        chunk = b",".join(to_json(dict(zip(columns, row))) for row in kept)
+        if self.count:
+            chunk = b"," + chunk
+        self.count += len(kept)
+        self.last = [kept[-1][index] for index in self._indexes]
+        return chunk
+
+
+class Keyset:
+    """
+    Keyset pagination of a query.
+
+    Parameters
+    ----------
+    sql : str
+        The query to page, without ``ORDER BY``. Use placeholders for
+        all values.
+    keys : list[SortKey or str]
+        The sort order: columns of the query, never NULL, the last one
+        unique. A plain name sorts in ascending order. Index them, in
+        this order, for pages to be seeks.
+    limit_clause : str, optional
+        Clause limiting the rows, with one placeholder for their
+        number. Defaults to SQL Server's; ``"LIMIT ?"`` for SQLite.
+
+    Raises
+    ------
+    ValueError
+        If there are no keys, or a column is not a plain identifier.
+    """
+
+    def __init__(
+        self,
+        sql: str,
+        keys: list[Union[SortKey, str]],
+        limit_clause: str = FETCH_NEXT,
+    ):
+        if not keys:
+            raise ValueError("A keyset needs at least one sort key")
+        keys = [
+            key if isinstance(key, SortKey) else SortKey(key)
+            for key in keys
+        ]
+        for key in keys:
+            if not _IDENTIFIER.match(key.column):
+                raise ValueError(f"Invalid sort column {key.column!r}")
+        self.sql = sql
+        self.keys = keys
+        self.limit_clause = limit_clause
+        self.order_by = ", ".join(
+            f"{key.column} {'DESC' if key.descending else 'ASC'}"
+            for key in keys
+        )
+        self.predicate = self._predicate()
+        self.context = hashlib.sha256(
+            f"{sql}\0{self.order_by}".encode("utf-8")
+        ).digest()
+
+    def _predicate(self) -> str:
+        """The condition selecting the rows after a sort key."""
+        def after(key: SortKey, inclusive: bool = False) -> str:
+            operator = "<" if key.descending else ">"
+            return f"{key.column} {operator}{'=' if inclusive else ''} ?"
+
+        terms = []
+        for index, key in enumerate(self.keys):
+            equal = [f"{k.column} = ?" for k in self.keys[:index]]
+            terms.append(" AND ".join([*equal, after(key)]))
+        if len(terms) == 1:
+            return terms[0]
+        alternatives = " OR ".join(f"({term})" for term in terms)
+        return f"{after(self.keys[0], inclusive=True)} AND ({alternatives})"
+
+    def _predicate_params(self, values: list) -> list:
+        params = [values[0]] if len(self.keys) > 1 else []
+        for index in range(len(self.keys)):
+            params.extend(values[:index + 1])
+        return params
+
+    def page_query(
+        self, params: tuple, after: Optional[list], limit: int
+    ) -> tuple[str, tuple]:
+        """
+        Build the query of a page.
+
+        Parameters
+        ----------
+        params : tuple
+            Parameters of the paged query.
+        after : list or None
+            Sort key of the last row of the previous page, None for the
+            first page.
+        limit : int
+            Rows to fetch.
+
+        Returns
+        -------
+        tuple[str, tuple]
+            The SQL and its parameters.
+        """
+        sql = f"SELECT * FROM ({self.sql}) AS keyset_page"
+        params = list(params)
+        if after is not None:
+            sql += f" WHERE {self.predicate}"
+            params.extend(self._predicate_params(after))
+        sql += f" ORDER BY {self.order_by} {self.limit_clause}"
+        params.append(limit)
+        return sql, tuple(params)
+
+    def read_cursor(self, cursor: str, settings: Settings) -> list:
+        """
+        Decode a cursor of this keyset.
+
+        Raises
+        ------
+        HTTPException
+            With status 400 if the cursor is invalid.
+        """
+        try:
+            values = read_cursor(cursor, settings.SECRET_KEY, self.context)
+        except ValueError:
+            values = None
+        if values is None or len(values) != len(self.keys):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid cursor",
+            )
+        return values
+
+    async def stream_page(
+        self,
+        pool: ConnectionPool,
+        after: Optional[list],
+        limit: int,
+        settings: Settings,
+        params: tuple = (),
+    ) -> AsyncIterator[bytes]:
+        """
+        Run the query of a page and yield it as a JSON object.
+
+        The object holds the rows in ``items`` and the cursor of the
+        next page in ``next_cursor``, or null on the last page.
+
+        Parameters
+        ----------
+        pool : ConnectionPool
+            The pool to take a connection from.
+        after : list or None
+            Sort key the page starts after, from `read_cursor`, or None
+            for the first page.
+        limit : int
+            Rows in the page at most.
+        settings : Settings
+            The key signing cursors and the fetch batch size.
+        params : tuple, optional
+            Parameters of the paged query.
+        """
+        sql, query_params = self.page_query(params, after, limit + 1)
+        encoder = _PageEncoder([key.column for key in self.keys], limit)
+        yield b'{"items":['
+        async with aclosing(stream_query(
+            pool, sql, query_params,
+            batch_size=min(limit + 1, settings.DB_STREAM_BATCH_SIZE),
+            encode=encoder,
+        )) as chunks:
+            async for chunk in chunks:
+                if chunk:
+                    yield chunk
+        next_cursor = None
+        if encoder.more:
+            next_cursor = sign_cursor(
+                encoder.last, settings.SECRET_KEY, self.context
+            )
+        yield b'],"next_cursor":' + to_json(next_cursor) + b"}"
+
+    def response(
+        self,
+        pool: ConnectionPool,
+        page: PageRequest,
+        settings: Settings,
+        params: tuple = (),
+    ) -> StreamingResponse:
+        """
+        Build the streaming response of a page.
+
+        Raises
+        ------
+        HTTPException
+            With status 400 if the cursor is invalid, before anything
+            is sent.
+        """
+        after = (
+            self.read_cursor(page.cursor, settings) if page.cursor else None
+        )
+        return StreamingResponse(
+            self.stream_page(pool, after, page.limit, settings, params),
+            media_type="application/json",
+        )
+
+
+async def get_page_request(
+    settings: Annotated[Settings, Depends(get_settings)],
+    cursor: Annotated[Optional[str], Query(max_length=1024)] = None,
+    limit: Annotated[Optional[int], Query(ge=1)] = None,
+) -> PageRequest:
+    """
+    Dependency reading the ``cursor`` and ``limit`` query parameters.
+
+    The limit defaults to ``PAGINATION_DEFAULT_LIMIT`` and is capped at
+    ``PAGINATION_MAX_LIMIT``.
+    """
+    return PageRequest(
+        cursor,
+        min(limit or settings.PAGINATION_DEFAULT_LIMIT,
+            settings.PAGINATION_MAX_LIMIT),
+    )
@@ -0,0 +1,499 @@
+"""
+Connection pool for DB-API drivers such as pyodbc.
+
+Opening an ODBC connection to SQL Server takes a network round trip
+and a login handshake, far longer than most queries. This module keeps
+a pool of open connections whose lifecycle follows the application
+lifespan (see `rest_fastapi.app`).
+
+DB-API drivers are blocking, so every driver call (connect, ping,
+execute, fetch, close) runs on a dedicated thread pool owned by the
+pool, never on the event loop and never on Starlette's shared
+threadpool. A connection is only used by one caller at a time.
+
+The pool works with any DB-API module. For tests, `sqlite3` can stand
+in for pyodbc, provided connections are opened with
+``check_same_thread=False``.
+"""
+import asyncio
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Optional, TypeVar
+
+import anyio
+from fastapi import HTTPException, Request, status
+from loguru import logger
+from prometheus_client import Counter, Gauge, Histogram
+
+from rest_fastapi.core.tracing import record
+
+T = TypeVar("T")
+
+POOL_CONNECTIONS = Gauge(
+    "db_pool_connections",
+    "Open database connections, by state.",
+    ["pool", "state"],
+    multiprocess_mode="livesum",
+)
+POOL_ACQUIRE_SECONDS = Histogram(
+    "db_pool_acquire_seconds",
+    "Time spent waiting to acquire a database connection.",
+    ["pool"],
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0),
+)
+POOL_TIMEOUTS = Counter(
+    "db_pool_acquire_timeouts_total",
+    "Connection requests that timed out waiting for the pool.",
+    ["pool"],
+)
+POOL_CLOSED = Counter(
+    "db_pool_connections_closed_total",
+    "Connections closed by the pool, by reason.",
+    ["pool", "reason"],
+)
+
+
+class PoolError(Exception):
+    """Base class for connection pool errors."""
+
+
+class PoolTimeout(PoolError):
+    """No connection became available within the acquire timeout."""
+
+
+class PoolClosed(PoolError):
+    """The pool has been closed."""
+
+
+class _Entry:
+    """A raw connection with the bookkeeping the pool needs."""
+
+    __slots__ = ("raw", "created", "last_used", "broken")
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.created = time.monotonic()
+        self.last_used = self.created
+        self.broken = False
+
+
+class PooledConnection:
+    """
+    Handle to a connection checked out of a `ConnectionPool`.
+
+    Parameters
+    ----------
+    pool : ConnectionPool
+        The pool the connection belongs to.
+    entry : _Entry
+        The pooled connection.
+    """
+
+    def __init__(self, pool: "ConnectionPool", entry: _Entry):
+        self._pool = pool
+        self._entry = entry
+
+    @property
+    def raw(self):
+        """The underlying DB-API connection (only use it via `run`)."""
+        return self._entry.raw
+
+    async def run(self, func: Callable[..., T], *args) -> T:
+        """
+        Run a blocking function with the connection on the pool executor.
+
+        Parameters
+        ----------
+        func : Callable
+            Called as ``func(connection, *args)``.
+        *args
+            Extra arguments for `func`.
+
+        Returns
+        -------
+        T
+            The return value of `func`.
+        """
+        try:
+            return await self._pool.run_blocking(
+                func, self._entry.raw, *args
+            )
+        except self._pool.fatal_errors:
+            # The connection state is unknown; do not reuse it.
+            self._entry.broken = True
+            raise
+
+    def invalidate(self) -> None:
+        """Close the connection on release instead of reusing it."""
+        self._entry.broken = True
+
+    async def fetchall(self, sql: str, params: tuple = ()) -> list:
+        """Execute a query and return all rows."""
+        return await self.run(_fetchall, sql, params)
+
+    async def execute(self, sql: str, params: tuple = ()) -> int:
+        """Execute a statement, commit, and return the row count."""
+        return await self.run(_execute, sql, params)
+
+
+def _fetchall(connection, sql: str, params: tuple) -> list:
+    cursor = connection.cursor()
+    try:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def _execute(connection, sql: str, params: tuple) -> int:
+    cursor = connection.cursor()
+    try:
+        cursor.execute(sql, params)
+        connection.commit()
+        return cursor.rowcount
+    finally:
+        cursor.close()
+
+
+def _ping(connection, query: str) -> None:
+    cursor = connection.cursor()
+    try:
+        cursor.execute(query)
+        cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+class ConnectionPool:
+    """
+    Asynchronous pool of blocking DB-API connections.
+
+    Parameters
+    ----------
+    connect : Callable[[], Any]
+        Opens a new DB-API connection. Called on the pool executor.
+    min_size : int
+        Number of connections opened at startup and kept open.
+    max_size : int
+        Maximum number of open connections.
+    acquire_timeout : float
+        Seconds a caller waits for a free connection before
+        `PoolTimeout` is raised.
+    max_lifetime : float
+        Connections older than this many seconds are closed and replaced
+        instead of being reused.
+    health_check_after : float
+        Idle connections unused for longer than this many seconds are
+        pinged before being handed out.
+    maintenance_interval : float
+        Seconds between background passes that recycle expired idle
+        connections and refill the pool up to `min_size`.
+    health_check_query : str, optional
+        Query used to ping a connection. The default is ``SELECT 1``.
+    fatal_errors : tuple of exception types, optional
+        Errors after which a connection is discarded instead of being
+        returned to the pool. The default is all exceptions.
+    name : str, optional
+        Label used in metrics. The default is ``"default"``.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], Any],
+        min_size: int,
+        max_size: int,
+        acquire_timeout: float,
+        max_lifetime: float,
+        health_check_after: float,
+        maintenance_interval: float,
+        health_check_query: str = "SELECT 1",
+        fatal_errors: tuple = (Exception,),
+        name: str = "default",
+    ):
+        if not 0 <= min_size <= max_size or max_size < 1:
+            raise ValueError(
+                "Pool sizes must satisfy 0 <= min_size <= max_size and "
+                "max_size >= 1"
+            )
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.acquire_timeout = acquire_timeout
+        self.max_lifetime = max_lifetime
+        self.health_check_after = health_check_after
+        self.maintenance_interval = maintenance_interval
+        self.health_check_query = health_check_query
+        self.fatal_errors = fatal_errors
+        self.name = name
+
+        # One thread per connection, plus one for maintenance work
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_size + 1, thread_name_prefix=f"db-{name}"
+        )
+        self._idle: deque[_Entry] = deque()
+        self._slots = asyncio.Semaphore(max_size)
+        self._size = 0  # Open connections, idle or in use
+        self._closed = False
+        self._maintenance_task: Optional[asyncio.Task] = None
+        self._idle_gauge = POOL_CONNECTIONS.labels(name, "idle")
+        self._in_use_gauge = POOL_CONNECTIONS.labels(name, "in_use")
+        self.acquired = 0
+        self.timeouts = 0
+        self.opened = 0
+        self.closed = 0
+
+    # --- Lifecycle ---
+
+    async def open(self) -> None:
+        """Open `min_size` connections and start the maintenance task."""
+        await self._fill()
+        self._maintenance_task = asyncio.create_task(self._maintain())
+
+    async def close(self) -> None:
+        """Close all idle connections and stop the executor.
+
+        Connections still checked out are closed when they are released;
+        the executor stops once the last one is closed.
+        """
+        self._closed = True
+        if self._maintenance_task is not None:
+            self._maintenance_task.cancel()
+            try:
+                await self._maintenance_task
+            except asyncio.CancelledError:
+                pass
+        while self._idle:
+            entry = self._idle.popleft()
+            self._idle_gauge.dec()
+            await self._discard(entry, "shutdown")
+        self._shutdown_if_drained()
+
+    # --- Checkout ---
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[PooledConnection]:
+        """
+        Check a connection out of the pool for the duration of a block.
+
+        Yields
+        ------
+        PooledConnection
+            A healthy connection, used exclusively by the caller.
+
+        Raises
+        ------
+        PoolTimeout
+            If no connection is available within `acquire_timeout`.
+        PoolClosed
+            If the pool is closed.
+        """
+        if self._closed:
+            raise PoolClosed(f"Pool {self.name!r} is closed")
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(
+                self._slots.acquire(), self.acquire_timeout
+            )
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            POOL_TIMEOUTS.labels(self.name).inc()
+            raise PoolTimeout(
+                f"No connection available from pool {self.name!r} within "
+                f"{self.acquire_timeout}s"
+            ) from None
+
+        try:
+            entry = await self._checkout()
+        except BaseException:
+            self._slots.release()
+            raise
+        POOL_ACQUIRE_SECONDS.labels(self.name).observe(
+            time.perf_counter() - start
+        )
+        record("pool", start)
+        self.acquired += 1
+        self._in_use_gauge.inc()
+        try:
+            yield PooledConnection(self, entry)
+        finally:
+            self._in_use_gauge.dec()
+            try:
+                # Shielded so a cancelled request (e.g. a client that
+                # disconnected) still returns or closes its connection.
+                with anyio.CancelScope(shield=True):
+                    await self._checkin(entry)
+            finally:
+                self._slots.release()
+
+    async def _checkout(self) -> _Entry:
+        """Take a healthy idle connection, or open a new one."""
+        while self._idle:
+            # LIFO keeps the hottest connections busy and lets surplus
+            # ones age out at the other end of the deque.
+            entry = self._idle.pop()
+            self._idle_gauge.dec()
+            if self._expired(entry):
+                await self._discard(entry, "max_lifetime")
+                continue
+            idle_for = time.monotonic() - entry.last_used
+            if idle_for > self.health_check_after:
+                if not await self._is_healthy(entry):
+                    await self._discard(entry, "health_check")
+                    continue
+            return entry
+        return await self._open_connection()
+
+    async def _checkin(self, entry: _Entry) -> None:
+        """Return a connection to the pool, or close it if unusable."""
+        if entry.broken:
+            await self._discard(entry, "error")
+        elif self._closed:
+            await self._discard(entry, "shutdown")
+        elif self._expired(entry):
+            await self._discard(entry, "max_lifetime")
+        else:
+            entry.last_used = time.monotonic()
+            self._idle.append(entry)
+            self._idle_gauge.inc()
+
+    # --- Helpers ---
+
+    async def run_blocking(self, func: Callable[..., T], *args) -> T:
+        """Run a blocking call on the pool's dedicated executor."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    def _expired(self, entry: _Entry) -> bool:
+        return time.monotonic() - entry.created > self.max_lifetime
+
+    async def _is_healthy(self, entry: _Entry) -> bool:
+        try:
+            await self.run_blocking(_ping, entry.raw, self.health_check_query)
+        except Exception:
+            return False
+        return True
+
+    async def _open_connection(self) -> _Entry:
+        self._size += 1
+        try:
+            raw = await self.run_blocking(self._connect)
+        except BaseException:
+            self._size -= 1
+            raise
+        self.opened += 1
+        return _Entry(raw)
+
+    async def _discard(self, entry: _Entry, reason: str) -> None:
+        self._size -= 1
+        self.closed += 1
+        POOL_CLOSED.labels(self.name, reason).inc()
+        try:
+            await self.run_blocking(entry.raw.close)
+        except Exception:
+            pass  # Closing a dead connection may fail; it is gone anyway
+        self._shutdown_if_drained()
+
+    def _shutdown_if_drained(self) -> None:
+        """Stop the executor once the pool is closed and empty."""
+        if self._closed and self._size == 0:
+            self._executor.shutdown(wait=False)
+
+    async def _fill(self) -> None:
+        """Open connections until `min_size` are open."""
+        while not self._closed and self._size < self.min_size:
+            entry = await self._open_connection()
+            self._idle.appendleft(entry)
+            self._idle_gauge.inc()
+
+    async def _recycle(self) -> None:
+        """Close the expired idle connections."""
+        for entry in [e for e in self._idle if self._expired(e)]:
+            # A checkout may have taken it while a discard awaited
+            if entry not in self._idle:
+                continue
+            self._idle.remove(entry)
+            self._idle_gauge.dec()
+            await self._discard(entry, "max_lifetime")
+
+    async def _maintain(self) -> None:
+        """Periodically recycle expired idle connections and refill."""
+        while not self._closed:
+            await asyncio.sleep(self.maintenance_interval)
+            try:
+                await self._recycle()
+                await self._fill()
+            except Exception:
+                # The database may be down; retry on the next pass
+                logger.exception("Maintenance of pool {} failed", self.name)
+
+    def stats(self) -> dict:
+        """
+        Return a snapshot of the pool state and counters.
+
+        Returns
+        -------
+        dict
+            Open, idle and in-use connection counts, and the number of
+            acquisitions, timeouts, opened and closed connections.
+        """
+        return {
+            "size": self._size,
+            "idle": len(self._idle),
+            "in_use": self._size - len(self._idle),
+            "max_size": self.max_size,
+            "acquired": self.acquired,
+            "timeouts": self.timeouts,
+            "opened": self.opened,
+            "closed": self.closed,
+        }
+
+
+def odbc_connector(
+    connection_string: str, timeout: int
+) -> Callable[[], Any]:
+    """
+    Build a connect function for SQL Server through pyodbc.
+
+    pyodbc is imported on first use, so the application does not need
+    the ODBC driver manager unless a database is configured.
+
+    Parameters
+    ----------
+    connection_string : str
+        The ODBC connection string.
+    timeout : int
+        Login timeout in seconds.
+
+    Returns
+    -------
+    Callable[[], Any]
+        A function opening a new pyodbc connection.
+    """
+    def connect():
+        import pyodbc
+
+        # This pool replaces the driver manager's own pooling
+        pyodbc.pooling = False
+        return pyodbc.connect(connection_string, timeout=timeout)
+
+    return connect
+
+
+async def get_db_pool(request: Request) -> ConnectionPool:
+    """
+    Dependency returning the application's connection pool.
+
+    Raises
+    ------
+    HTTPException
+        With status 503 if no database is configured.
+    """
+    pool = getattr(request.app.state, "db_pool", None)
+    if pool is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Database is not configured",
+        )
+    return pool
@@ -0,0 +1,276 @@
+"""
+Streaming responses for SQL query results.
+
+Buffering a whole result set into a list of dicts and one JSON body
+needs memory proportional to the number of rows. The helpers in this
+module instead pull rows from the cursor in `fetchmany` batches and
+serialize each batch straight into an NDJSON or CSV chunk, so peak
+memory is bounded by the batch size no matter how many rows the query
+returns.
+
+Each fetch and its serialization run together on the pool executor, so
+the event loop only moves finished byte chunks. The next batch is only
+fetched after the previous chunk has been handed to the server, which
+applies the client's TCP backpressure to the query. If the client
+disconnects, Starlette cancels the response; the running query is then
+cancelled on the server and its connection is discarded.
+
+Usage in a controller::
+
+    @router.get("/items/export")
+    async def export(
+        self,
+        request: Request,
+        pool: Annotated[ConnectionPool, Depends(get_db_pool)],
+    ):
+        return query_response(
+            pool, "SELECT * FROM items", fmt=negotiate_format(request)
+        )
+"""
+import asyncio
+import csv
+import io
+from typing import AsyncIterator, Callable, Literal, Optional
+
+import anyio
+from fastapi import HTTPException, Request, status
+from fastapi.responses import StreamingResponse
+from pydantic_core import to_json
+
+from rest_fastapi.core import config
+from rest_fastapi.db.pool import ConnectionPool
+
+ExportFormat = Literal["ndjson", "csv"]
+
+MEDIA_TYPES: dict[str, str] = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+# --- Encoders ---
+
+def encode_ndjson(columns: list[str], rows: list) -> bytes:
+    """Encode rows as newline-delimited JSON objects."""
+    return b"".join(
+        to_json(dict(zip(columns, row))) + b"\n" for row in rows
+    )
+
+
+def encode_csv(columns: list[str], rows: list) -> bytes:
+    """Encode rows as CSV lines, without a header."""
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue().encode("utf-8")
+
+
+def _csv_header(columns: list[str]) -> bytes:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(columns)
+    return buffer.getvalue().encode("utf-8")
+
+
+ENCODERS: dict[str, Callable[[list[str], list], bytes]] = {
+    "ndjson": encode_ndjson,
+    "csv": encode_csv,
+}
+
+
+# --- Blocking cursor operations, run on the pool executor ---
+
+def _open_cursor(connection, sql: str, params: tuple):
+    cursor = connection.cursor()
+    try:
+        cursor.execute(sql, params)
+    except BaseException:
+        cursor.close()
+        raise
+    columns = [column[0] for column in cursor.description]
+    return cursor, columns
+
+
+def _fetch_chunk(
+    cursor, batch_size: int, encode: Callable, columns: list[str]
+) -> Optional[bytes]:
+    rows = cursor.fetchmany(batch_size)
+    if not rows:
+        return None
+    return encode(columns, rows)
+
+
+def _cancel_query(connection, cursor) -> None:
+    """Ask the server to stop a running query, from any thread."""
+    try:
+        if hasattr(cursor, "cancel"):  # pyodbc
+            cursor.cancel()
+        elif hasattr(connection, "interrupt"):  # sqlite3
+            connection.interrupt()
+    except Exception:
+        pass  # The connection is discarded anyway
+
+
+def _close_cursor(cursor) -> None:
+    try:
+        cursor.close()
+    except Exception:
+        pass
+
+
+async def stream_query(
+    pool: ConnectionPool,
+    sql: str,
+    params: tuple = (),
+    fmt: ExportFormat = "ndjson",
+    batch_size: Optional[int] = None,
+    encode: Optional[Callable[[list[str], list], bytes]] = None,
+) -> AsyncIterator[bytes]:
+    """
+    Run a query and yield its result as encoded chunks.
+
+    Parameters
+    ----------
+    pool : ConnectionPool
+        The pool to take a connection from.
+    sql : str
+        The query. Use placeholders for all values.
+    params : tuple, optional
+        Query parameters.
+    fmt : {"ndjson", "csv"}, optional
+        Output format. CSV output starts with a header row.
+    batch_size : int, optional
+        Number of rows fetched and encoded per chunk. Defaults to
+        ``DB_STREAM_BATCH_SIZE``.
+    encode : Callable[[list[str], list], bytes], optional
+        Encoder of each batch, given the column names and the rows,
+        replacing the encoder of `fmt`. It runs on the pool executor,
+        one batch at a time.
+
+    Yields
+    ------
+    bytes
+        One encoded chunk per batch of rows.
+    """
+    if encode is None:
+        encode = ENCODERS[fmt]
+    if batch_size is None:
+        batch_size = config.current_settings().DB_STREAM_BATCH_SIZE
+    async with pool.acquire() as conn:
+        cursor, columns = await conn.run(_open_cursor, sql, params)
+        pending: Optional[asyncio.Future] = None
+        exhausted = False
+        try:
+            if fmt == "csv":
+                yield _csv_header(columns)
+            while True:
+                pending = asyncio.ensure_future(
+                    pool.run_blocking(
+                        _fetch_chunk, cursor, batch_size, encode, columns
+                    )
+                )
+                # Shielded so a cancellation leaves the fetch running
+                # until the query is cancelled below.
+                chunk = await asyncio.shield(pending)
+                pending = None
+                if chunk is None:
+                    exhausted = True
+                    break
+                yield chunk
+        finally:
+            with anyio.CancelScope(shield=True):
+                if not exhausted:
+                    # Client went away or the fetch failed mid-stream
+                    _cancel_query(conn.raw, cursor)
+                    conn.invalidate()
+                    if pending is not None:
+                        try:
+                            await pending
+                        except Exception:
+                            pass
+                await pool.run_blocking(_close_cursor, cursor)
+
+
+def negotiate_format(
+    request: Request,
+    default: str = "ndjson",
+    media_types: Optional[dict[str, str]] = None,
+) -> str:
+    """
+    Pick the export format for a request.
+
+    A ``format`` query parameter wins over the ``Accept`` header.
+
+    Parameters
+    ----------
+    request : Request
+        The incoming request.
+    default : str, optional
+        Format used when the client expresses no preference.
+    media_types : dict[str, str], optional
+        Supported formats and their media types, in order of
+        preference. Defaults to the query export formats.
+
+    Raises
+    ------
+    HTTPException
+        With status 406 if an unsupported format is requested.
+    """
+    if media_types is None:
+        media_types = MEDIA_TYPES
+    requested = request.query_params.get("format")
+    if requested is None:
+        accept = request.headers.get("accept", "")
+        for fmt, media_type in media_types.items():
+            if media_type.split(";")[0] in accept:
+                return fmt
+        return default
+    if requested not in media_types:
+        raise HTTPException(
+            status_code=status.HTTP_406_NOT_ACCEPTABLE,
+            detail=f"Unsupported format {requested!r}; "
+                   f"use one of {', '.join(media_types)}",
+        )
+    return requested
+
+
+def query_response(
+    pool: ConnectionPool,
+    sql: str,
+    params: tuple = (),
+    fmt: ExportFormat = "ndjson",
+    batch_size: Optional[int] = None,
+    filename: Optional[str] = None,
+) -> StreamingResponse:
+    """
+    Build a streaming response for a query.
+
+    Parameters
+    ----------
+    pool : ConnectionPool
+        The pool to take a connection from.
+    sql : str
+        The query.
+    params : tuple, optional
+        Query parameters.
+    fmt : {"ndjson", "csv"}, optional
+        Output format.
+    batch_size : int, optional
+        Rows per `fetchmany` batch. Defaults to ``DB_STREAM_BATCH_SIZE``.
+    filename : str, optional
+        If given, the response is sent as a download with this base
+        name (the extension is added from the format).
+
+    Returns
+    -------
+    StreamingResponse
+        The response streaming the encoded rows.
+    """
+    headers = {}
+    if filename:
+        headers["Content-Disposition"] = (
+            f'attachment; filename="{filename}.{fmt}"'
+        )
+    return StreamingResponse(
+        stream_query(pool, sql, params, fmt, batch_size),
+        media_type=MEDIA_TYPES[fmt],
+        headers=headers,
+    )
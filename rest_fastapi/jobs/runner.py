@@ -0,0 +1,378 @@
+"""
+Background workers running queued jobs and spooling their results.
+
+Reads that take minutes, far longer than a request may last, are
+submitted as jobs instead: the client polls the job and downloads its
+result once it has succeeded. Each worker process runs a `JobRunner`
+with a bounded number of worker tasks. A worker task claims a job from
+the `JobStore`, streams it from its source and writes the chunks to a
+file in the spool directory, then records the job's end. The result is
+written to ``<id>.<format>.partial`` and renamed when complete, so a
+download never sees a truncated file.
+
+While a job runs its lease is renewed; a renewal failing means the job
+was cancelled, and the worker stops it. At shutdown the runner gives
+its jobs back to the queue, and a job left behind by a worker that
+died is claimed again once its lease runs out. Results are deleted
+``JOBS_RESULT_TTL_SECONDS`` after their job ended.
+
+There are two kinds of jobs, each with its own catalog of names, so
+clients never send SQL:
+
+- ``table``: a table of ``BIGQUERY_EXPORT_TABLES``, as an Arrow IPC
+  stream, NDJSON or a JSON array;
+- ``query``: a query of ``JOBS_QUERIES``, run on the SQL Server pool,
+  as NDJSON or CSV.
+"""
+import asyncio
+import os
+import secrets
+import socket
+import time
+from contextlib import aclosing
+from typing import AsyncIterator, Callable, Optional
+
+from fastapi import HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from loguru import logger
+from prometheus_client import Counter, Histogram
+
+from rest_fastapi.core import config
+from rest_fastapi.core.config import Settings
+from rest_fastapi.db import bigquery, streaming
+from rest_fastapi.db.pool import ConnectionPool
+from rest_fastapi.jobs.store import Job, JobStore
+
+JOBS_FINISHED = Counter(
+    "jobs_finished_total",
+    "Jobs ended by this worker, by kind and state.",
+    ["kind", "state"],
+)
+JOB_DURATION = Histogram(
+    "job_duration_seconds",
+    "Time spent running a job, until its result is spooled.",
+    ["kind"],
+    buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1200, 3600),
+)
+
+# Formats of the result of each kind of job
+KIND_FORMATS: dict[str, tuple[str, ...]] = {
+    "table": tuple(bigquery.MEDIA_TYPES),
+    "query": tuple(streaming.MEDIA_TYPES),
+}
+
+MEDIA_TYPES: dict[str, str] = {
+    **streaming.MEDIA_TYPES,
+    **bigquery.MEDIA_TYPES,
+}
+
+# A source streams the result of a job
+JobSource = Callable[[Job], AsyncIterator[bytes]]
+
+# Seconds between two deletions of expired jobs and results
+PURGE_INTERVAL = 60.0
+
+
+def job_names(settings: Settings, kind: str) -> dict[str, str]:
+    """Return the catalog of the jobs of a kind."""
+    if kind == "table":
+        return settings.BIGQUERY_EXPORT_TABLES
+    return settings.JOBS_QUERIES
+
+
+def table_source(job: Job) -> AsyncIterator[bytes]:
+    """Stream a table of ``BIGQUERY_EXPORT_TABLES`` from BigQuery."""
+    async def chunks() -> AsyncIterator[bytes]:
+        settings = config.current_settings()
+        session = await run_in_threadpool(
+            bigquery.open_read_session,
+            bigquery.get_read_client(),
+            settings.BIGQUERY_EXPORT_TABLES[job.name],
+            list(job.fields) if job.fields else None,
+            project=settings.BIGQUERY_PROJECT,
+            max_streams=settings.BIGQUERY_MAX_READ_STREAMS,
+        )
+        async with aclosing(bigquery.stream_session(
+            session, job.format, settings.BIGQUERY_BUFFERED_BATCHES
+        )) as body:
+            async for chunk in body:
+                yield chunk
+
+    return chunks()
+
+
+def query_source(pool: Optional[ConnectionPool]) -> JobSource:
+    """Return the source running queries of ``JOBS_QUERIES`` on `pool`."""
+    def source(job: Job) -> AsyncIterator[bytes]:
+        async def chunks() -> AsyncIterator[bytes]:
+            if pool is None:
+                raise HTTPException(
+                    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                    detail="Database is not configured",
+                )
+            settings = config.current_settings()
+            async with aclosing(streaming.stream_query(
+                pool,
+                settings.JOBS_QUERIES[job.name],
+                fmt=job.format,
+                batch_size=settings.DB_STREAM_BATCH_SIZE,
+            )) as body:
+                async for chunk in body:
+                    yield chunk
+
+        return chunks()
+
+    return source
+
+
+def _describe(error: BaseException) -> str:
+    """The error message of a failed job, as shown to its principal."""
+    if isinstance(error, HTTPException):
+        return str(error.detail)
+    return "The job failed unexpectedly"
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class JobRunner:
+    """
+    Runs the jobs of a `JobStore` on a bounded number of tasks.
+
+    Parameters
+    ----------
+    store : JobStore
+        The jobs, shared with the other worker processes.
+    sources : dict[str, JobSource]
+        The source of each kind of job.
+    spool_dir : str
+        Directory the results are written to.
+    workers : int, optional
+        Jobs run at once by this runner.
+    per_principal : int, optional
+        Jobs of a principal run at once, over all the runners.
+    lease : float, optional
+        Seconds a job stays claimed without its lease being renewed.
+    poll_interval : float, optional
+        Seconds an idle worker task waits before looking for jobs.
+    result_ttl : float, optional
+        Seconds a job and its result are kept after it ended.
+    max_attempts : int, optional
+        Times a job is started before it is failed.
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        sources: dict[str, JobSource],
+        spool_dir: str,
+        workers: int = 2,
+        per_principal: int = 1,
+        lease: float = 30.0,
+        poll_interval: float = 1.0,
+        result_ttl: float = 24 * 60 * 60,
+        max_attempts: int = 3,
+    ):
+        self.store = store
+        self.sources = sources
+        self.spool_dir = spool_dir
+        self.workers = workers
+        self.per_principal = per_principal
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self.result_ttl = result_ttl
+        self.max_attempts = max_attempts
+        self.owner = (
+            f"{socket.gethostname()}:{os.getpid()}:{secrets.token_hex(4)}"
+        )
+        self._wakeup = asyncio.Event()
+        self._tasks: list[asyncio.Task] = []
+
+    @classmethod
+    def from_settings(
+        cls, settings: Settings, pool: Optional[ConnectionPool] = None
+    ) -> "JobRunner":
+        """Build the runner the settings describe."""
+        return cls(
+            JobStore(settings.JOBS_DB_PATH),
+            {"table": table_source, "query": query_source(pool)},
+            settings.JOBS_SPOOL_DIR,
+            workers=settings.JOBS_WORKERS,
+            per_principal=settings.JOBS_PER_PRINCIPAL,
+            lease=settings.JOBS_LEASE_SECONDS,
+            poll_interval=settings.JOBS_POLL_INTERVAL_SECONDS,
+            result_ttl=settings.JOBS_RESULT_TTL_SECONDS,
+            max_attempts=settings.JOBS_MAX_ATTEMPTS,
+        )
+
+    def result_path(self, job: Job) -> str:
+        """Return the file holding the result of a job."""
+        return os.path.join(self.spool_dir, f"{job.id}.{job.format}")
+
+    def wake(self) -> None:
+        """Have an idle worker task look for jobs now, e.g. on submit."""
+        self._wakeup.set()
+
+    # --- Lifecycle ---
+
+    async def start(self) -> None:
+        """Start the worker tasks and the purge of expired results."""
+        await run_in_threadpool(os.makedirs, self.spool_dir, exist_ok=True)
+        self._tasks = [
+            asyncio.create_task(self._work()) for _ in range(self.workers)
+        ]
+        self._tasks.append(asyncio.create_task(self._purge_expired()))
+
+    async def stop(self) -> None:
+        """Stop the tasks and queue the jobs they were running again."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        released = await run_in_threadpool(self.store.release, self.owner)
+        if released:
+            logger.info("Released {count} running jobs", count=released)
+        self.store.close()
+
+    # --- Workers ---
+
+    async def _work(self) -> None:
+        while True:
+            try:
+                job = await run_in_threadpool(
+                    self.store.claim,
+                    self.owner, self.lease, self.per_principal,
+                    self.max_attempts,
+                )
+            except Exception as exc:
+                # E.g. the database is locked by another process
+                logger.warning("Job claim failed: {!r}", exc)
+                await asyncio.sleep(self.poll_interval)
+                continue
+            if job is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(
+                        self._wakeup.wait(), self.poll_interval
+                    )
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                await self._run(job)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # The store is unreachable; the lease recovers the job
+                logger.exception("Job {job_id} crashed", job_id=job.id)
+
+    async def _run(self, job: Job) -> None:
+        """Run a claimed job and record how it ended."""
+        path = self.result_path(job)
+        partial = f"{path}.partial"
+        start = time.perf_counter()
+        spool = asyncio.create_task(self._spool(job, partial))
+        lost = False
+        try:
+            while not spool.done():
+                await asyncio.wait({spool}, timeout=self.lease / 3)
+                if spool.done():
+                    break
+                if not await run_in_threadpool(
+                    self.store.renew, job.id, self.owner, self.lease
+                ):
+                    # Cancelled by its principal, or taken over
+                    lost = True
+                    spool.cancel()
+                    await asyncio.gather(spool, return_exceptions=True)
+        except asyncio.CancelledError:
+            spool.cancel()
+            await asyncio.gather(spool, return_exceptions=True)
+            _remove(partial)
+            raise
+
+        if lost:
+            await run_in_threadpool(_remove, partial)
+            logger.info("Job {job_id} stopped", job_id=job.id)
+            return
+        error = spool.exception()
+        if error is None:
+            await run_in_threadpool(os.replace, partial, path)
+            ended = await run_in_threadpool(
+                self.store.finish, job.id, self.owner, spool.result()
+            )
+            state = "succeeded"
+        else:
+            await run_in_threadpool(_remove, partial)
+            ended = await run_in_threadpool(
+                self.store.fail, job.id, self.owner, _describe(error)
+            )
+            state = "failed"
+        if not ended:
+            # Cancelled just as it ended
+            await run_in_threadpool(_remove, path)
+            return
+        duration = time.perf_counter() - start
+        JOBS_FINISHED.labels(job.kind, state).inc()
+        JOB_DURATION.labels(job.kind).observe(duration)
+        logger.opt(exception=error).log(
+            "INFO" if error is None else "WARNING",
+            "Job {job_id} {state}",
+            job_id=job.id,
+            kind=job.kind,
+            name=job.name,
+            state=state,
+            duration_ms=round(duration * 1e3, 3),
+            bytes=spool.result() if error is None else None,
+        )
+
+    async def _spool(self, job: Job, partial: str) -> int:
+        """Write the result of a job to a file; return its size."""
+        size = 0
+        file = await run_in_threadpool(open, partial, "wb")
+        try:
+            async with aclosing(self.sources[job.kind](job)) as chunks:
+                async for chunk in chunks:
+                    await run_in_threadpool(file.write, chunk)
+                    size += len(chunk)
+        finally:
+            file.close()
+        return size
+
+    async def _purge_expired(self) -> None:
+        """Delete the jobs and results past their TTL, periodically."""
+        while True:
+            try:
+                expired = await run_in_threadpool(
+                    self.store.purge, self.result_ttl
+                )
+                for job_id, fmt in expired:
+                    await run_in_threadpool(
+                        _remove,
+                        os.path.join(self.spool_dir, f"{job_id}.{fmt}"),
+                    )
+            except Exception as exc:
+                logger.warning("Job purge failed: {!r}", exc)
+            await asyncio.sleep(PURGE_INTERVAL)
+
+
+async def get_job_runner(request: Request) -> JobRunner:
+    """
+    Dependency returning the application's job runner.
+
+    Raises
+    ------
+    HTTPException
+        With status 503 if jobs are disabled.
+    """
+    runner = getattr(request.app.state, "jobs", None)
+    if runner is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Jobs are not enabled",
+        )
+    return runner
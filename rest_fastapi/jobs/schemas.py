@@ -0,0 +1,96 @@
+"""
+Pydantic models for background jobs.
+
+This module defines the body of a job submission and the status
+returned while a client polls the job.
+"""
+from datetime import datetime, timezone
+from typing import Literal, Optional
+
+from pydantic import BaseModel
+
+from rest_fastapi.jobs.store import Job
+
+
+class JobRequest(BaseModel):
+    """
+    Request model for submitting a job.
+
+    Attributes
+    ----------
+    kind : {"table", "query"}
+        Whether the job exports a BigQuery table or runs a SQL query.
+    name : str
+        The table or query, from the catalog of its kind.
+    format : str
+        Format of the result: ``arrow``, ``ndjson`` or ``json`` for
+        tables, ``ndjson`` or ``csv`` for queries.
+    fields : list[str] or None
+        Columns of a table to export. All columns if omitted.
+    """
+    kind: Literal["table", "query"]
+    name: str
+    format: str = "ndjson"
+    fields: Optional[list[str]] = None
+
+
+def _timestamp(value: Optional[float]) -> Optional[datetime]:
+    if value is None:
+        return None
+    return datetime.fromtimestamp(value, timezone.utc)
+
+
+class JobStatus(BaseModel):
+    """
+    Response model describing a job.
+
+    Attributes
+    ----------
+    id : str
+        Identifies the job.
+    kind, name, format : str
+        What the job runs, as submitted.
+    state : str
+        ``queued``, ``running``, ``succeeded``, ``failed`` or
+        ``cancelled``.
+    created_at : datetime
+        When the job was submitted.
+    started_at : datetime or None
+        When the job last started running.
+    finished_at : datetime or None
+        When the job ended.
+    size : int or None
+        Size of the result in bytes, once the job succeeded.
+    error : str or None
+        Why the job failed.
+    result_url : str or None
+        Where to download the result, once the job succeeded.
+    """
+    id: str
+    kind: str
+    name: str
+    format: str
+    state: str
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    size: Optional[int] = None
+    error: Optional[str] = None
+    result_url: Optional[str] = None
+
+    @classmethod
+    def from_job(cls, job: Job, result_url: str) -> "JobStatus":
+        """Describe a job; `result_url` is only shown once it succeeded."""
+        return cls(
+            id=job.id,
+            kind=job.kind,
+            name=job.name,
+            format=job.format,
+            state=job.state,
+            created_at=_timestamp(job.created_at),
+            started_at=_timestamp(job.started_at),
+            finished_at=_timestamp(job.finished_at),
+            size=job.size,
+            error=job.error,
+            result_url=result_url if job.state == "succeeded" else None,
+        )
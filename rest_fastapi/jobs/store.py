@@ -0,0 +1,336 @@
+"""
+Job state in a SQLite database shared by the worker processes.
+
+A job goes from ``queued`` to ``running`` when a worker *claims* it,
+then ends ``succeeded``, ``failed`` or ``cancelled``. The claiming
+worker holds a *lease* on the job, which it renews while the job runs.
+If the worker dies, e.g. on a restart, the lease runs out and any
+worker claims the job again; a job whose worker died
+`max_attempts` times is failed rather than retried forever.
+
+Claims enforce the concurrency limit of each principal over the whole
+server: a job is only claimed while its principal has fewer running
+jobs than the limit, whichever worker runs them.
+"""
+import json
+import secrets
+import sqlite3
+import threading
+import time
+from typing import Callable, NamedTuple, Optional
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    principal TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    format TEXT NOT NULL,
+    fields TEXT,
+    state TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    owner TEXT,
+    lease_until REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    size INTEGER,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, created_at);
+CREATE INDEX IF NOT EXISTS jobs_principal ON jobs (principal, state);
+"""
+
+_COLUMNS = (
+    "id, principal, kind, name, format, fields, state, created_at, "
+    "started_at, finished_at, attempts, size, error"
+)
+
+
+class Job(NamedTuple):
+    """A job and its progress."""
+
+    id: str
+    principal: str
+    kind: str
+    name: str
+    format: str
+    fields: Optional[tuple[str, ...]]
+    state: str
+    created_at: float
+    started_at: Optional[float]
+    finished_at: Optional[float]
+    attempts: int
+    size: Optional[int]
+    error: Optional[str]
+
+    @classmethod
+    def from_row(cls, row: tuple) -> "Job":
+        fields = row[5]
+        return cls(
+            *row[:5],
+            tuple(json.loads(fields)) if fields is not None else None,
+            *row[6:],
+        )
+
+
+class JobStore:
+    """
+    Jobs in a SQLite database.
+
+    Parameters
+    ----------
+    path : str
+        The database file. It is created if needed.
+    clock : Callable[[], float], optional
+        Source of the current UNIX time.
+    timeout : float, optional
+        Seconds to wait for another process holding the write lock.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        clock: Callable[[], float] = time.time,
+        timeout: float = 5.0,
+    ):
+        self.path = path
+        self._clock = clock
+        self._conn = sqlite3.connect(
+            path, timeout=timeout, isolation_level=None,
+            check_same_thread=False,
+        )
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+
+    def _transaction(self, func: Callable, *args):
+        """Run `func` in a write transaction, holding the lock."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = func(*args)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+        return result
+
+    def _get(self, job_id: str) -> Optional[Job]:
+        row = self._conn.execute(
+            f"SELECT {_COLUMNS} FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        return Job.from_row(row) if row else None
+
+    def submit(
+        self,
+        principal: str,
+        kind: str,
+        name: str,
+        fmt: str,
+        fields: Optional[list[str]],
+        max_pending: int,
+    ) -> Optional[Job]:
+        """
+        Queue a job.
+
+        Returns
+        -------
+        Job or None
+            The new job, or None if the principal already has
+            `max_pending` jobs queued or running.
+        """
+        def submit() -> Optional[Job]:
+            pending = self._conn.execute(
+                "SELECT COUNT(*) FROM jobs WHERE principal = ? "
+                "AND state IN ('queued', 'running')",
+                (principal,),
+            ).fetchone()[0]
+            if pending >= max_pending:
+                return None
+            job_id = secrets.token_hex(12)
+            self._conn.execute(
+                "INSERT INTO jobs (id, principal, kind, name, format, "
+                "fields, state, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, 'queued', ?)",
+                (
+                    job_id, principal, kind, name, fmt,
+                    json.dumps(fields) if fields is not None else None,
+                    self._clock(),
+                ),
+            )
+            return self._get(job_id)
+
+        return self._transaction(submit)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """Return a job, or None if it does not exist."""
+        with self._lock:
+            return self._get(job_id)
+
+    def claim(
+        self,
+        owner: str,
+        lease: float,
+        per_principal: int,
+        max_attempts: int,
+    ) -> Optional[Job]:
+        """
+        Take the oldest job that can run, for a worker.
+
+        Parameters
+        ----------
+        owner : str
+            Identifies the claiming worker.
+        lease : float
+            Seconds the job is the worker's, unless renewed.
+        per_principal : int
+            Running jobs allowed per principal.
+        max_attempts : int
+            Jobs whose lease already ran out this many times are failed
+            instead of claimed.
+
+        Returns
+        -------
+        Job or None
+            The claimed job, now running, or None if none can run.
+        """
+        def claim() -> Optional[Job]:
+            now = self._clock()
+            self._conn.execute(
+                "UPDATE jobs SET state = 'failed', finished_at = ?, "
+                "owner = NULL, lease_until = NULL, "
+                "error = 'The job was interrupted too many times' "
+                "WHERE state = 'running' AND lease_until < ? "
+                "AND attempts >= ?",
+                (now, now, max_attempts),
+            )
+            row = self._conn.execute(
+                "SELECT id FROM jobs WHERE (state = 'queued' "
+                "OR (state = 'running' AND lease_until < :now)) "
+                "AND principal NOT IN (SELECT principal FROM jobs "
+                "WHERE state = 'running' AND lease_until >= :now "
+                "GROUP BY principal HAVING COUNT(*) >= :limit) "
+                "ORDER BY created_at LIMIT 1",
+                {"now": now, "limit": per_principal},
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE jobs SET state = 'running', owner = ?, "
+                "lease_until = ?, started_at = ?, "
+                "attempts = attempts + 1 WHERE id = ?",
+                (owner, now + lease, now, row[0]),
+            )
+            return self._get(row[0])
+
+        return self._transaction(claim)
+
+    def renew(self, job_id: str, owner: str, lease: float) -> bool:
+        """
+        Extend the lease of a running job.
+
+        Returns
+        -------
+        bool
+            False if the job is no longer the worker's to run, e.g.
+            because it was cancelled.
+        """
+        with self._lock:
+            return self._conn.execute(
+                "UPDATE jobs SET lease_until = ? WHERE id = ? "
+                "AND owner = ? AND state = 'running'",
+                (self._clock() + lease, job_id, owner),
+            ).rowcount > 0
+
+    def _end(
+        self,
+        job_id: str,
+        owner: str,
+        state: str,
+        size: Optional[int] = None,
+        error: Optional[str] = None,
+    ) -> bool:
+        with self._lock:
+            return self._conn.execute(
+                "UPDATE jobs SET state = ?, finished_at = ?, size = ?, "
+                "error = ?, owner = NULL, lease_until = NULL "
+                "WHERE id = ? AND owner = ? AND state = 'running'",
+                (state, self._clock(), size, error, job_id, owner),
+            ).rowcount > 0
+
+    def finish(self, job_id: str, owner: str, size: int) -> bool:
+        """Record the success of a job and the size of its result."""
+        return self._end(job_id, owner, "succeeded", size=size)
+
+    def fail(self, job_id: str, owner: str, error: str) -> bool:
+        """Record the failure of a job."""
+        return self._end(job_id, owner, "failed", error=error)
+
+    def release(self, owner: str) -> int:
+        """
+        Queue the running jobs of a worker again, e.g. at shutdown.
+
+        Returns
+        -------
+        int
+            The number of jobs released.
+        """
+        with self._lock:
+            return self._conn.execute(
+                "UPDATE jobs SET state = 'queued', owner = NULL, "
+                "lease_until = NULL, attempts = attempts - 1 "
+                "WHERE owner = ? AND state = 'running'",
+                (owner,),
+            ).rowcount
+
+    def cancel(self, job_id: str, principal: str) -> Optional[Job]:
+        """
+        Cancel a queued or running job of a principal.
+
+        A running job is stopped by its worker at its next lease
+        renewal.
+
+        Returns
+        -------
+        Job or None
+            The job, cancelled unless it had already ended; None if
+            the principal has no such job.
+        """
+        def cancel() -> Optional[Job]:
+            self._conn.execute(
+                "UPDATE jobs SET state = 'cancelled', finished_at = ?, "
+                "owner = NULL, lease_until = NULL WHERE id = ? "
+                "AND principal = ? AND state IN ('queued', 'running')",
+                (self._clock(), job_id, principal),
+            )
+            job = self._get(job_id)
+            return job if job and job.principal == principal else None
+
+        return self._transaction(cancel)
+
+    def purge(self, ttl: float) -> list[tuple[str, str]]:
+        """
+        Delete the jobs that ended more than `ttl` seconds ago.
+
+        Returns
+        -------
+        list[tuple[str, str]]
+            The id and format of the deleted jobs, whose results can be
+            removed.
+        """
+        def purge() -> list[tuple[str, str]]:
+            return self._conn.execute(
+                "DELETE FROM jobs WHERE finished_at < ? "
+                "AND state NOT IN ('queued', 'running') "
+                "RETURNING id, format",
+                (self._clock() - ttl,),
+            ).fetchall()
+
+        return self._transaction(purge)
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,136 @@
+"""
+Access logging with correlation ids.
+
+`AccessLogMiddleware` gives every request a correlation id: the
+``X-Request-ID`` header set by the nginx proxy (``$request_id``) or a
+client, if it looks like one, or a new random id. The id is returned
+in the ``X-Request-ID`` response header and added to every record
+logged while the request is handled (see `rest_fastapi.core.logs`), so
+the access record, application logs and traces of a request can be
+joined.
+
+Once the response body is sent, the request is logged with its route,
+status, duration and size. Successful requests are sampled with
+``ACCESS_LOG_SAMPLE_RATE`` to keep the volume down on busy routes;
+errors (4xx and 5xx) and requests slower than
+``ACCESS_LOG_SLOW_SECONDS`` are always logged.
+"""
+import random
+import re
+import secrets
+import time
+from typing import Optional
+
+from loguru import logger
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from rest_fastapi.core import config
+from rest_fastapi.core.config import Settings
+from rest_fastapi.core.logs import request_id
+
+# Request ids accepted from the proxy or the client
+_REQUEST_ID = re.compile(rb"[A-Za-z0-9._-]{1,64}")
+
+
+class AccessLogMiddleware:
+    """
+    ASGI middleware assigning correlation ids and logging requests.
+
+    Parameters
+    ----------
+    app : ASGIApp
+        The wrapped application.
+    settings : Settings, optional
+        Sampling options. Defaults to the application settings,
+        following their reloads.
+    """
+
+    def __init__(self, app: ASGIApp, settings: Optional[Settings] = None):
+        self.app = app
+        self._fixed_settings = settings
+        self._configure(settings or config.current_settings())
+
+    def _configure(self, settings: Settings) -> None:
+        """Read the options of a settings object."""
+        self.settings = settings
+        self.enabled = settings.ACCESS_LOG_ENABLED
+        self.sample_rate = settings.ACCESS_LOG_SAMPLE_RATE
+        self.slow_seconds = settings.ACCESS_LOG_SLOW_SECONDS
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if self._fixed_settings is None:
+            settings = config.current_settings()
+            if settings is not self.settings:
+                self._configure(settings)
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        rid = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                if _REQUEST_ID.fullmatch(value):
+                    rid = value.decode("ascii")
+                break
+        if rid is None:
+            rid = secrets.token_hex(8)
+        token = request_id.set(rid)
+        status_code = 500
+        body_size = 0
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code, body_size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                MutableHeaders(scope=message)["X-Request-ID"] = rid
+            elif message["type"] == "http.response.body":
+                body_size += len(message.get("body", b""))
+            await send(message)
+
+        start = time.perf_counter()
+        error = None
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception as exc:
+            error = exc
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            if self.enabled and (
+                error is not None
+                or status_code >= 400
+                or duration >= self.slow_seconds
+                or random.random() < self.sample_rate
+            ):
+                self._log(scope, status_code, duration, body_size, error)
+            request_id.reset(token)
+
+    def _log(
+        self,
+        scope: Scope,
+        status_code: int,
+        duration: float,
+        body_size: int,
+        error: Optional[Exception],
+    ) -> None:
+        """Log the access record of a request."""
+        if error is not None or status_code >= 500:
+            level = "ERROR"
+        elif status_code >= 400:
+            level = "WARNING"
+        else:
+            level = "INFO"
+        route = scope.get("route")
+        client = scope.get("client")
+        logger.opt(exception=error).log(
+            level,
+            "{method} {path} {status}",
+            method=scope["method"],
+            path=scope["path"],
+            route=getattr(route, "path", None),
+            status=status_code,
+            duration_ms=round(duration * 1e3, 3),
+            bytes=body_size,
+            client=client[0] if client else None,
+        )
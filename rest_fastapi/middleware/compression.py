@@ -0,0 +1,383 @@
+"""
+Response compression negotiated from ``Accept-Encoding``.
+
+JSON, NDJSON, CSV and Arrow exports compress several times over, and
+the nginx proxy in front of the app passes them through as they are.
+`CompressionMiddleware` picks the best codec the client accepts among
+``COMPRESSION_LEVELS``:
+
+- ``zstd``, from `compression.zstd` (Python 3.14+) or the
+  ``backports.zstd`` package;
+- ``br``, from the ``brotli`` package;
+- ``gzip``, always available.
+
+The optional codecs come with the ``compression`` extra
+(``pip install rest-fastapi[compression]``).
+
+A response sent in one message is compressed in one call and keeps a
+``Content-Length``. A streaming response is compressed chunk by chunk
+as the application sends it, each chunk flushed so the client can
+decode it right away; nothing is buffered. Bodies under
+``COMPRESSION_MINIMUM_SIZE`` and media types that do not compress are
+sent as they are. Chunks large enough to stall the event loop are
+compressed in the threadpool; the codecs release the GIL.
+
+Routes listed in ``COMPRESSION_ROUTE_LEVELS`` get their own codecs and
+levels, e.g. a cheap level for a large export or no compression at all
+for a latency-sensitive route.
+"""
+import functools
+import zlib
+from typing import Callable, Optional, Protocol
+
+from prometheus_client import Counter
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from rest_fastapi.core import config
+from rest_fastapi.core.config import Settings
+
+try:
+    import brotli
+except ImportError:  # Optional, see the "compression" extra
+    brotli = None
+
+try:
+    from compression import zstd
+except ImportError:
+    try:
+        from backports import zstd
+    except ImportError:  # Optional, see the "compression" extra
+        zstd = None
+
+COMPRESSION_INPUT = Counter(
+    "http_compression_input_bytes_total",
+    "Response body bytes handed to a codec, by encoding.",
+    ["encoding"],
+)
+COMPRESSION_OUTPUT = Counter(
+    "http_compression_output_bytes_total",
+    "Compressed response body bytes sent, by encoding.",
+    ["encoding"],
+)
+
+# Media types worth compressing, besides text/* and +json/+xml types
+COMPRESSIBLE_TYPES = frozenset({
+    "application/json",
+    "application/x-ndjson",
+    "application/vnd.apache.arrow.stream",
+    "application/xml",
+    "application/javascript",
+})
+
+# Chunks at least this large are compressed in the threadpool
+THREADPOOL_MIN_BYTES = 64 * 1024
+
+
+# --- Codecs ---
+
+class Encoder(Protocol):
+    """The compression state of one response body."""
+
+    def encode(self, data: bytes, last: bool) -> bytes:
+        """Compress a chunk; `last` ends the stream."""
+
+
+class GzipEncoder:
+    """gzip, flushed at the end of every chunk."""
+
+    def __init__(self, level: int):
+        # wbits=31: a deflate stream in a gzip container
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def encode(self, data: bytes, last: bool) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(
+            zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH
+        )
+
+
+class BrotliEncoder:
+    """Brotli, flushed at the end of every chunk."""
+
+    def __init__(self, level: int):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def encode(self, data: bytes, last: bool) -> bytes:
+        compressor = self._compressor
+        output = compressor.process(data)
+        return output + (compressor.finish() if last else compressor.flush())
+
+
+class ZstdEncoder:
+    """Zstandard, one frame flushed block by block."""
+
+    def __init__(self, level: int):
+        self._compressor = zstd.ZstdCompressor(level=level)
+
+    def encode(self, data: bytes, last: bool) -> bytes:
+        compressor = self._compressor
+        return compressor.compress(
+            data,
+            compressor.FLUSH_FRAME if last else compressor.FLUSH_BLOCK,
+        )
+
+
+# Codec name in Accept-Encoding -> encoder factory, if installed
+ENCODERS: dict[str, Callable[[int], Encoder]] = {"gzip": GzipEncoder}
+if brotli is not None:
+    ENCODERS["br"] = BrotliEncoder
+if zstd is not None:
+    ENCODERS["zstd"] = ZstdEncoder
+
+KNOWN_CODECS = ("zstd", "br", "gzip")
+
+
+def available_levels(levels: dict[str, int]) -> dict[str, int]:
+    """
+    Keep the installed codecs of a ``COMPRESSION_LEVELS`` mapping.
+
+    Each level is tried once, so a bad one fails at startup rather than
+    on a request.
+
+    Raises
+    ------
+    ValueError
+        If a codec is unknown or a level out of range.
+    """
+    available = {}
+    for codec, level in levels.items():
+        if codec not in KNOWN_CODECS:
+            raise ValueError(f"Unknown compression codec {codec!r}")
+        if codec in ENCODERS:
+            try:
+                ENCODERS[codec](level)
+            except Exception as exc:
+                raise ValueError(
+                    f"Invalid {codec} compression level {level}: {exc}"
+                ) from exc
+            available[codec] = level
+    return available
+
+
+@functools.lru_cache(maxsize=256)
+def negotiate(accept_encoding: str, offered: tuple[str, ...]) -> Optional[str]:
+    """
+    Pick the codec to use for an ``Accept-Encoding`` header.
+
+    Parameters
+    ----------
+    accept_encoding : str
+        The header value, e.g. ``gzip, deflate, br;q=0.9``.
+    offered : tuple[str, ...]
+        The codecs available, most preferred first.
+
+    Returns
+    -------
+    str or None
+        The offered codec with the highest quality value, ties going to
+        the most preferred; None if the client accepts none of them.
+    """
+    weights = {}
+    for item in accept_encoding.split(","):
+        coding, *params = item.split(";")
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        weights[coding.strip().lower()] = quality
+    default = weights.get("*", 0.0)
+    best, best_quality = None, 0.0
+    for codec in offered:
+        quality = weights.get(codec, default)
+        if quality > best_quality:
+            best, best_quality = codec, quality
+    return best
+
+
+def is_compressible(content_type: str) -> bool:
+    """Whether a media type is worth compressing."""
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    return (
+        media_type.startswith("text/")
+        or media_type in COMPRESSIBLE_TYPES
+        or media_type.endswith(("+json", "+xml"))
+    )
+
+
+# --- Middleware ---
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing responses for clients that accept it.
+
+    Parameters
+    ----------
+    app : ASGIApp
+        The wrapped application.
+    settings : Settings, optional
+        Codecs, levels and threshold. Defaults to the application
+        settings, following their reloads.
+    """
+
+    def __init__(self, app: ASGIApp, settings: Optional[Settings] = None):
+        self.app = app
+        self._fixed_settings = settings
+        self._configure(settings or config.current_settings())
+
+    def _configure(self, settings: Settings) -> None:
+        """Check the codecs and levels of a settings object."""
+        self.settings = settings
+        self.enabled = settings.COMPRESSION_ENABLED
+        self.minimum_size = settings.COMPRESSION_MINIMUM_SIZE
+        self.levels = available_levels(settings.COMPRESSION_LEVELS)
+        self.route_levels = {
+            template: available_levels(levels)
+            for template, levels in settings.COMPRESSION_ROUTE_LEVELS.items()
+        }
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if self._fixed_settings is None:
+            settings = config.current_settings()
+            if settings is not self.settings:
+                self._configure(settings)
+        if (
+            scope["type"] != "http"
+            or not self.enabled
+            or scope["method"] == "HEAD"
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+                break
+        responder = _CompressingResponder(self, scope, accept_encoding, send)
+        await self.app(scope, receive, responder.send)
+
+    def levels_for(self, scope: Scope) -> dict[str, int]:
+        """Return the codecs and levels of the route a request matched."""
+        route = scope.get("route")
+        if route is not None and self.route_levels:
+            return self.route_levels.get(route.path, self.levels)
+        return self.levels
+
+
+class _CompressingResponder:
+    """Compresses the response of one request as it is sent."""
+
+    def __init__(
+        self,
+        middleware: CompressionMiddleware,
+        scope: Scope,
+        accept_encoding: str,
+        send: Send,
+    ):
+        self.middleware = middleware
+        self.scope = scope
+        self.accept_encoding = accept_encoding
+        self._send = send
+        self.passthrough = False
+        self.start: Optional[Message] = None
+        self.codec: Optional[str] = None
+        self.level = 0
+        self.encoder: Optional[Encoder] = None
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    async def send(self, message: Message) -> None:
+        if self.passthrough:
+            await self._send(message)
+        elif message["type"] == "http.response.start":
+            await self._start(message)
+        elif message["type"] == "http.response.body":
+            await self._body(message)
+        else:
+            await self._send(message)
+
+    async def _start(self, message: Message) -> None:
+        headers = Headers(raw=message["headers"])
+        status = message["status"]
+        if (
+            status < 200
+            or status in (204, 206, 304)
+            or "content-encoding" in headers
+            or not is_compressible(headers.get("content-type", ""))
+            or "no-transform" in headers.get("cache-control", "")
+        ):
+            self.passthrough = True
+            await self._send(message)
+            return
+
+        # The body depends on Accept-Encoding, whichever was picked
+        MutableHeaders(raw=message["headers"]).add_vary_header(
+            "Accept-Encoding"
+        )
+        levels = self.middleware.levels_for(self.scope)
+        codec = negotiate(self.accept_encoding, tuple(levels))
+        content_length = headers.get("content-length")
+        if codec is None or (
+            content_length is not None
+            and int(content_length) < self.middleware.minimum_size
+        ):
+            self.passthrough = True
+            await self._send(message)
+            return
+        self.start = message
+        self.codec = codec
+        self.level = levels[codec]
+
+    async def _body(self, message: Message) -> None:
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.encoder is None:
+            if not more_body and len(body) < self.middleware.minimum_size:
+                self.passthrough = True
+                await self._send(self.start)
+                await self._send(message)
+                return
+            self.encoder = ENCODERS[self.codec](self.level)
+            headers = MutableHeaders(raw=self.start["headers"])
+            headers["Content-Encoding"] = self.codec
+            etag = headers.get("etag")
+            if etag is not None and not etag.startswith("W/"):
+                # The compressed body is not byte-identical to the
+                # representation the strong validator was computed on
+                headers["ETag"] = "W/" + etag
+            if more_body:
+                del headers["content-length"]
+                await self._send(self.start)
+            else:
+                data = await self._encode(body, last=True)
+                headers["Content-Length"] = str(len(data))
+                await self._send(self.start)
+                await self._send({"type": "http.response.body", "body": data})
+                return
+
+        data = await self._encode(body, last=not more_body)
+        # Skip empty chunks, but always end the body
+        if data or not more_body:
+            await self._send({
+                "type": "http.response.body",
+                "body": data,
+                "more_body": more_body,
+            })
+
+    async def _encode(self, data: bytes, last: bool) -> bytes:
+        if len(data) >= THREADPOOL_MIN_BYTES:
+            output = await run_in_threadpool(self.encoder.encode, data, last)
+        else:
+            output = self.encoder.encode(data, last)
+        self.bytes_in += len(data)
+        self.bytes_out += len(output)
+        if last:
+            COMPRESSION_INPUT.labels(self.codec).inc(self.bytes_in)
+            COMPRESSION_OUTPUT.labels(self.codec).inc(self.bytes_out)
+        return output
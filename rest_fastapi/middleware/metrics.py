@@ -0,0 +1,173 @@
+"""
+Prometheus metrics for the API.
+
+This module defines the application metrics and a pure ASGI middleware
+that records them for every request. Metrics are labelled by the route
+template (e.g. ``/examples/protected/jwt-only``) rather than the raw
+path, which keeps label cardinality bounded.
+
+Under gunicorn every worker is a separate process with its own
+counters. When the ``PROMETHEUS_MULTIPROC_DIR`` environment variable
+points to a shared directory (see ``gunicorn.conf.py``), each worker
+writes its values to memory-mapped files there and `render_metrics`
+merges the files from all workers, so any worker can answer a scrape
+with the totals for the whole server.
+"""
+import os
+import time
+from typing import Optional
+
+from fastapi.security import OAuth2
+from fastapi.security.api_key import APIKeyBase
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Label used for requests that did not match any route (e.g. 404s).
+UNMATCHED_ROUTE = "<unmatched>"
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Time spent handling a request, until the last body chunk is sent.",
+    ["method", "route", "status"],
+    buckets=(
+        0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+        2.5, 5.0, 10.0,
+    ),
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "Requests currently being handled.",
+    ["method"],
+    multiprocess_mode="livesum",
+)
+RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes",
+    "Size of response bodies.",
+    ["method", "route"],
+    buckets=(100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000),
+)
+AUTH_FAILURES = Counter(
+    "auth_failures_total",
+    "Requests rejected by authentication, by scheme.",
+    ["scheme", "route"],
+)
+
+
+def _auth_scheme(route) -> Optional[str]:
+    """
+    Find which authentication scheme protects a route.
+
+    The route's dependency tree is searched for FastAPI security
+    schemes, so any dependency built on `oauth2_scheme` or an API key
+    header is recognised.
+
+    Returns
+    -------
+    str or None
+        ``"jwt"``, ``"api_key"``, ``"mixed"`` if both are accepted, or
+        None for public routes.
+    """
+    schemes = set()
+    stack = [route.dependant]
+    while stack:
+        dependant = stack.pop()
+        if isinstance(dependant.call, OAuth2):
+            schemes.add("jwt")
+        elif isinstance(dependant.call, APIKeyBase):
+            schemes.add("api_key")
+        stack.extend(dependant.dependencies)
+    if len(schemes) > 1:
+        return "mixed"
+    return schemes.pop() if schemes else None
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording latency, size, in-flight and auth metrics.
+
+    It is written as a plain ASGI middleware rather than with
+    `BaseHTTPMiddleware`, which adds a task and a memory stream per
+    request and buffers streaming responses.
+
+    Parameters
+    ----------
+    app : ASGIApp
+        The wrapped application.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        # id(route) -> auth scheme label, computed on first use
+        self._route_schemes: dict[int, Optional[str]] = {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+        body_size = 0
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code, body_size
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                body_size += len(message.get("body", b""))
+            await send(message)
+
+        in_progress = REQUESTS_IN_PROGRESS.labels(method)
+        in_progress.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            in_progress.dec()
+            # The router stores the matched route in the scope
+            route = scope.get("route")
+            route_path = getattr(route, "path", UNMATCHED_ROUTE)
+            REQUEST_LATENCY.labels(
+                method, route_path, str(status_code)
+            ).observe(elapsed)
+            RESPONSE_SIZE.labels(method, route_path).observe(body_size)
+            if status_code in (401, 403) and route is not None:
+                self._record_auth_failure(route, route_path)
+
+    def _record_auth_failure(self, route, route_path: str) -> None:
+        key = id(route)  # Routes are not hashable, but live forever
+        if key not in self._route_schemes:
+            self._route_schemes[key] = _auth_scheme(route)
+        scheme = self._route_schemes[key]
+        if scheme is not None:
+            AUTH_FAILURES.labels(scheme, route_path).inc()
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """
+    Render all metrics in the Prometheus text format.
+
+    In multiprocess mode the values written by every worker are merged;
+    otherwise the metrics of the current process are returned.
+
+    Returns
+    -------
+    tuple[bytes, str]
+        The exposition body and its content type.
+    """
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,329 @@
+"""
+Per-principal rate limiting with token buckets shared across workers.
+
+Every request is charged to a token bucket keyed on who sent it:
+
+- ``user:<sub>`` for a valid JWT, the subject `auth_jwt` would return;
+- ``key:<id>`` for an API key accepted by `auth_token` (``key:simple``
+  for ``SIMPLE_API_TOKEN``);
+- ``ip:<address>`` for anything else, including invalid credentials.
+
+A bucket holds up to ``burst`` tokens and refills at ``rate`` tokens per
+second; a request needs one token. Routes listed in
+``RATE_LIMIT_ROUTES`` get their own bucket per principal with their own
+limit, every other route shares the principal's default bucket, and
+``RATE_LIMIT_PRINCIPALS`` overrides the limit of specific principals.
+The paths in `UNLIMITED_PATHS` are never limited: the nginx
+``auth_request`` subrequests to ``/auth/verify`` cannot be answered
+with a 429, and would charge each proxied request twice, and
+``/metrics`` is scraped by Prometheus.
+
+Gunicorn runs several worker processes, so the buckets live in a small
+memory-mapped file (`SharedBucketStore`) rather than in each worker's
+memory, and limits hold for the server as a whole. The file is an open
+addressing hash table split into groups of slots; a request locks only
+its key's group, with an `fcntl` record lock, for the few microseconds
+the update takes.
+
+JWTs are verified through `auth.verify_jwt`, which fills the
+verified-JWT cache, so `auth_jwt` finds the token already verified.
+The denylist is not consulted here, as it may query SQLite: a revoked
+token is still charged to its user, and rejected by the route.
+Rejected requests get a pre-encoded 429 response with ``Retry-After``
+and never reach the application.
+"""
+import fcntl
+import hashlib
+import inspect
+import math
+import mmap
+import os
+import struct
+import time
+from typing import NamedTuple, Optional
+
+from fastapi import HTTPException
+from prometheus_client import Counter
+from starlette.routing import compile_path
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from rest_fastapi.core import config
+from rest_fastapi.core.config import Settings, get_settings
+from rest_fastapi.core.tracing import span
+from rest_fastapi.security import auth
+
+RATE_LIMITED = Counter(
+    "rate_limited_requests_total",
+    "Requests rejected by the rate limiter, by bucket.",
+    ["bucket"],
+)
+
+# Bucket shared by all routes without a limit of their own
+DEFAULT_BUCKET = "*"
+
+# Paths never limited: nginx turns a 429 from its auth subrequest into
+# a 500, and the proxied request itself is charged anyway
+UNLIMITED_PATHS = frozenset({"/auth/verify", "/metrics"})
+
+_REJECTED_BODY = b'{"detail":"Too many requests"}'
+
+
+class RateLimit(NamedTuple):
+    """Token bucket parameters: tokens per second and bucket size."""
+
+    rate: float
+    burst: int
+
+
+# --- Shared bucket store ---
+
+# Key hash (0 marks a free slot), tokens left, time of the last update
+_SLOT = struct.Struct("<Qdd")
+_GROUP_SLOTS = 8
+
+
+class SharedBucketStore:
+    """
+    Token buckets in a memory-mapped file, shared between processes.
+
+    Keys are hashed to a group of slots. A key missing from its group
+    takes a free slot, or else the least recently updated one; an idle
+    bucket refills completely after ``burst / rate`` seconds, so
+    reusing old slots is normally invisible.
+
+    Parameters
+    ----------
+    path : str
+        The state file. It is created if needed and reset if its size
+        does not match `slots`.
+    slots : int
+        Number of buckets the file can hold.
+    clock : callable, optional
+        Time source. Wall-clock time is used because it is the same in
+        every process.
+    """
+
+    def __init__(self, path: str, slots: int, clock=time.time):
+        self.groups = max(1, slots // _GROUP_SLOTS)
+        self._group_size = _GROUP_SLOTS * _SLOT.size
+        self._clock = clock
+        size = self.groups * self._group_size
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.lockf(fd, fcntl.LOCK_EX)
+            try:
+                if os.fstat(fd).st_size != size:
+                    os.ftruncate(fd, 0)  # Stale layout: start empty
+                    os.ftruncate(fd, size)
+            finally:
+                fcntl.lockf(fd, fcntl.LOCK_UN)
+            self._map = mmap.mmap(fd, size)
+        except BaseException:
+            os.close(fd)
+            raise
+        self._fd = fd
+
+    def take(self, key: str, limit: RateLimit) -> tuple[bool, float]:
+        """
+        Take one token from a bucket.
+
+        Parameters
+        ----------
+        key : str
+            Identifies the bucket.
+        limit : RateLimit
+            The bucket's refill rate and size.
+
+        Returns
+        -------
+        tuple[bool, float]
+            Whether a token was available and, if not, the number of
+            seconds until one will be.
+        """
+        digest = int.from_bytes(
+            hashlib.blake2b(key.encode(), digest_size=8).digest(), "little"
+        ) or 1
+        base = (digest % self.groups) * self._group_size
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, base)
+        try:
+            now = self._clock()
+            offset, bucket = self._find(base, digest)
+            if bucket is None:
+                tokens = float(limit.burst)
+            else:
+                tokens, updated = bucket
+                elapsed = max(0.0, now - updated)
+                tokens = min(float(limit.burst), tokens + elapsed * limit.rate)
+            allowed = tokens >= 1.0
+            if allowed:
+                tokens -= 1.0
+            _SLOT.pack_into(self._map, offset, digest, tokens, now)
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, base)
+        return allowed, 0.0 if allowed else (1.0 - tokens) / limit.rate
+
+    def _find(self, base: int, digest: int):
+        """
+        Look a key up in its group.
+
+        Returns the slot offset and, for an existing bucket, its
+        ``(tokens, updated)``; for a new one, the slot it should use and
+        None.
+        """
+        free = oldest = None
+        oldest_time = math.inf
+        for offset in range(base, base + self._group_size, _SLOT.size):
+            slot_key, tokens, updated = _SLOT.unpack_from(self._map, offset)
+            if slot_key == digest:
+                return offset, (tokens, updated)
+            if slot_key == 0:
+                if free is None:
+                    free = offset
+            elif updated < oldest_time:
+                oldest, oldest_time = offset, updated
+        return (free if free is not None else oldest), None
+
+    def close(self) -> None:
+        """Unmap and close the state file."""
+        self._map.close()
+        os.close(self._fd)
+
+
+# --- Middleware ---
+
+class RateLimitMiddleware:
+    """
+    ASGI middleware rejecting requests over their principal's limit.
+
+    Parameters
+    ----------
+    app : ASGIApp
+        The wrapped application.
+    settings : Settings, optional
+        Limits and state file location. Defaults to the application
+        settings, following their reloads and any override of the
+        `get_settings` dependency; the state file location is fixed
+        once the store is opened.
+    """
+
+    def __init__(self, app: ASGIApp, settings: Optional[Settings] = None):
+        self.app = app
+        self._fixed_settings = settings
+        self._configure(settings or config.current_settings())
+        self._store: Optional[SharedBucketStore] = None
+
+    def _configure(self, settings: Settings) -> None:
+        """Compile the limits of a settings object."""
+        self.settings = settings
+        self.enabled = settings.RATE_LIMIT_ENABLED
+        self.default = RateLimit(
+            settings.RATE_LIMIT_RATE, settings.RATE_LIMIT_BURST
+        )
+        self.routes = [
+            (compile_path(template)[0], template, RateLimit(*limit))
+            for template, limit in settings.RATE_LIMIT_ROUTES.items()
+        ]
+        self.principals = {
+            principal: RateLimit(*limit)
+            for principal, limit in settings.RATE_LIMIT_PRINCIPALS.items()
+        }
+
+    @property
+    def store(self) -> SharedBucketStore:
+        """The bucket store, opened on first use in the worker process."""
+        if self._store is None:
+            self._store = SharedBucketStore(
+                self.settings.RATE_LIMIT_STATE_FILE,
+                self.settings.RATE_LIMIT_SLOTS,
+            )
+        return self._store
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if self._fixed_settings is None:
+            settings = await self._app_settings(scope)
+            if settings is not self.settings:
+                self._configure(settings)
+        if (
+            scope["type"] != "http"
+            or not self.enabled
+            or scope["path"] in UNLIMITED_PATHS
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        with span("ratelimit"):
+            principal = await self.principal(scope)
+            bucket, limit = self._bucket(scope["path"])
+            limit = self.principals.get(principal, limit)
+            allowed, retry_after = self.store.take(
+                f"{principal}|{bucket}", limit
+            )
+        if allowed:
+            await self.app(scope, receive, send)
+            return
+
+        RATE_LIMITED.labels(bucket).inc()
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(_REJECTED_BODY)).encode()),
+                (b"retry-after", str(math.ceil(retry_after)).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": _REJECTED_BODY})
+
+    @staticmethod
+    async def _app_settings(scope: Scope) -> Settings:
+        """The settings the routes of the request's application see."""
+        overrides = getattr(scope.get("app"), "dependency_overrides", {})
+        override = overrides.get(get_settings)
+        if override is None:
+            return config.current_settings()
+        settings = override()
+        if inspect.isawaitable(settings):
+            settings = await settings
+        return settings
+
+    async def principal(self, scope: Scope) -> str:
+        """Identify who a request is charged to."""
+        authorization = api_key = None
+        for name, value in scope["headers"]:
+            if name == b"authorization":
+                authorization = value
+            elif name == b"authentication":
+                api_key = value
+
+        settings = self.settings
+        if authorization and authorization[:7].lower() == b"bearer ":
+            token = authorization[7:].decode("latin-1").strip()
+            try:
+                token_data = await auth.run_crypto(
+                    auth.token_algorithm(token, settings),
+                    auth.verify_jwt,
+                    token,
+                    settings,
+                    check_revoked=False,  # Checked by the route
+                )
+            except HTTPException:
+                pass
+            else:
+                return f"user:{token_data.username}"
+        if api_key is not None:
+            try:
+                key = auth.verify_api_token(
+                    api_key.decode("latin-1"), settings
+                )
+            except HTTPException:
+                pass
+            else:
+                return f"key:{key.id}"
+        client = scope.get("client")
+        return f"ip:{client[0] if client else 'unknown'}"
+
+    def _bucket(self, path: str) -> tuple[str, RateLimit]:
+        for regex, template, limit in self.routes:
+            if regex.match(path):
+                return template, limit
+        return DEFAULT_BUCKET, self.default
@@ -0,0 +1,179 @@
+"""
+Request tracing and on-demand profiling.
+
+`TracingMiddleware` traces a sample of the requests (see
+`rest_fastapi.core.tracing` for the phases recorded). Each traced
+response gets a ``Server-Timing`` header with the time spent in every
+phase, which browser developer tools display, and each traced request
+is logged with its route, status and phases once its body is sent::
+
+    Server-Timing: ratelimit;dur=0.052, auth;dur=0.031, deps;dur=0.094,
+        handler;dur=1.204, serialize;dur=0.088, app;dur=1.571
+
+Tracing is off by default (``TRACING_ENABLED``); the route wrappers
+then cost a context variable lookup per request.
+
+A request can also ask to be profiled with an ``X-Profile`` header,
+when ``PROFILING_ENABLED`` is set and its bearer token grants the
+``debug:profile`` scope; otherwise the header is ignored. A
+`SamplingProfiler` samples the threads working on the request while it
+runs, and the folded stacks are stored in ``PROFILING_DIR`` under the
+id returned in the ``X-Profile-Id`` header, to be fetched from
+``/debug/profiles/{id}``. The sampler sees the whole event loop, so a
+profile also shows other requests running at the same time; profile
+on an otherwise quiet worker for a clean flame graph.
+"""
+import random
+import secrets
+import time
+from typing import Optional
+
+from fastapi import HTTPException
+from loguru import logger
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from rest_fastapi.core import config
+from rest_fastapi.core.config import Settings
+from rest_fastapi.core.profiling import (
+    SamplingProfiler,
+    folded_stacks,
+    write_profile,
+)
+from rest_fastapi.core.tracing import Trace, end_trace, start_trace
+from rest_fastapi.security import auth
+from rest_fastapi.security.scopes import SCOPE_BITS
+
+PROFILE_SCOPE = SCOPE_BITS["debug:profile"]
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware tracing sampled requests and profiling on demand.
+
+    Parameters
+    ----------
+    app : ASGIApp
+        The wrapped application.
+    settings : Settings, optional
+        Sampling, logging and profiling options. Defaults to the
+        application settings, following their reloads.
+    """
+
+    def __init__(self, app: ASGIApp, settings: Optional[Settings] = None):
+        self.app = app
+        self._fixed_settings = settings
+        self._configure(settings or config.current_settings())
+
+    def _configure(self, settings: Settings) -> None:
+        """Read the options of a settings object."""
+        self.settings = settings
+        self.enabled = settings.TRACING_ENABLED
+        self.sample_rate = settings.TRACING_SAMPLE_RATE
+        self.log_min_seconds = settings.TRACING_LOG_MIN_SECONDS
+        self.profiling = settings.PROFILING_ENABLED
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if self._fixed_settings is None:
+            settings = config.current_settings()
+            if settings is not self.settings:
+                self._configure(settings)
+        if scope["type"] != "http" or not (self.enabled or self.profiling):
+            await self.app(scope, receive, send)
+            return
+
+        profile = self.profiling and await self._profile_requested(scope)
+        if not profile and not (
+            self.enabled and random.random() < self.sample_rate
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        trace, token = start_trace()
+        profiler = profile_id = None
+        if profile:
+            profile_id = secrets.token_hex(8)
+            profiler = SamplingProfiler(
+                trace.threads,
+                self.settings.PROFILING_INTERVAL_SECONDS,
+                self.settings.PROFILING_MAX_SECONDS,
+            ).start()
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append(
+                    "Server-Timing", trace.server_timing(time.perf_counter())
+                )
+                if profile_id is not None:
+                    headers["X-Profile-Id"] = profile_id
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            end_trace(token)
+            if profiler is not None:
+                await run_in_threadpool(
+                    write_profile,
+                    self.settings.PROFILING_DIR,
+                    profile_id,
+                    folded_stacks(profiler.stop()),
+                )
+            self._log(scope, status_code, trace, profile_id)
+
+    async def _profile_requested(self, scope: Scope) -> bool:
+        """Whether the request asks to be profiled and may be."""
+        profile = authorization = None
+        for name, value in scope["headers"]:
+            if name == b"x-profile":
+                profile = value
+            elif name == b"authorization":
+                authorization = value
+        if (
+            not profile
+            or not authorization
+            or authorization[:7].lower() != b"bearer "
+        ):
+            return False
+        token = authorization[7:].decode("latin-1").strip()
+        settings = self.settings
+        try:
+            token_data = await auth.run_crypto(
+                auth.token_algorithm(token, settings),
+                auth.verify_jwt,
+                token,
+                settings,
+                check_revoked=False,
+            )
+            # Off the event loop: the denylist may query SQLite
+            await auth.check_revocation_async(token_data, settings)
+        except HTTPException:
+            return False
+        return bool(token_data.scopes & PROFILE_SCOPE)
+
+    def _log(
+        self,
+        scope: Scope,
+        status_code: int,
+        trace: Trace,
+        profile_id: Optional[str],
+    ) -> None:
+        """Log a traced request, if it was slow enough."""
+        duration = time.perf_counter() - trace.start
+        if duration < self.log_min_seconds and profile_id is None:
+            return
+        route = scope.get("route")
+        logger.info(
+            "{method} {route} {status} in {duration_ms:.3f} ms",
+            method=scope["method"],
+            route=getattr(route, "path", scope["path"]),
+            status=status_code,
+            duration_ms=duration * 1e3,
+            spans=trace.durations(),
+            profile_id=profile_id,
+        )
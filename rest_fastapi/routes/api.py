@@ -6,7 +6,16 @@ corresponding class-based controllers (resources).
 """
 from fastapi import FastAPI
 
-from rest_fastapi.controllers import login, protected
+from rest_fastapi.controllers import (
+    debug,
+    exports,
+    jobs,
+    jwks,
+    login,
+    metrics,
+    protected,
+    verify,
+)
 
 
 def init_api_routes(app: FastAPI):
@@ -23,4 +32,10 @@ def init_api_routes(app: FastAPI):
         The main FastAPI application instance.
     """
     app.include_router(login.router)
+    app.include_router(verify.router)
+    app.include_router(jwks.router)
     app.include_router(protected.router)
+    app.include_router(exports.router)
+    app.include_router(jobs.router)
+    app.include_router(metrics.router)
+    app.include_router(debug.router)
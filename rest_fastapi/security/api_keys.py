@@ -0,0 +1,341 @@
+"""
+API key store.
+
+Partners authenticate with API keys sent in the ``Authentication``
+header. There can be tens of thousands of them, so keys are not
+compared one by one: the store indexes them by the SHA-256 digest of
+the key, and a lookup is one digest plus one dictionary access. Only
+digests are kept, in memory and at rest; the matched digest is
+compared again in constant time. Each key carries an id, scopes and
+free-form metadata.
+
+Keys are loaded from a JSON Lines file (``API_KEYS_FILE``), a database
+table (``API_KEYS_TABLE``), or both, and refreshed in the background
+every ``API_KEYS_REFRESH_SECONDS`` by a task of the application
+lifespan:
+
+- the file is re-read only when its modification time changes, parsed
+  off the event loop, and swapped in as a whole;
+- the table is queried for the rows updated since the last refresh, so
+  new, changed and revoked keys are applied incrementally.
+
+Requests only ever read the current in-memory index, so a refresh
+never blocks them. A new key can be generated with::
+
+    python -m rest_fastapi.security.api_keys <key_id> [scope ...]
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import re
+import secrets
+import sys
+from typing import Any, NamedTuple, Optional
+
+from loguru import logger
+from starlette.concurrency import run_in_threadpool
+
+from rest_fastapi.core.config import Settings
+from rest_fastapi.security.scopes import scope_mask
+
+
+class APIKey(NamedTuple):
+    """
+    An API key known to the store.
+
+    Attributes
+    ----------
+    id : str
+        Identifies the key, e.g. in logs and rate limits.
+    digest : bytes
+        SHA-256 digest of the key.
+    scopes : frozenset[str]
+        What the key may access. ``*`` grants every scope.
+    metadata : dict
+        Free-form details, e.g. the partner's name.
+    mask : int
+        `scopes` compiled to a bitset, see `scope_mask`.
+    """
+
+    id: str
+    digest: bytes
+    scopes: frozenset[str]
+    metadata: dict
+    mask: int = 0
+
+
+def hash_api_key(token: str) -> bytes:
+    """Return the SHA-256 digest identifying an API key."""
+    return hashlib.sha256(token.encode("utf-8")).digest()
+
+
+def parse_key_record(record: dict) -> APIKey:
+    """
+    Build an `APIKey` from a file line or table row.
+
+    Parameters
+    ----------
+    record : dict
+        ``id`` and ``sha256`` (the hex digest of the key), and optional
+        ``scopes`` (a list, or a space-separated string) and
+        ``metadata`` (a dict, or a JSON string).
+
+    Returns
+    -------
+    APIKey
+        The parsed key.
+    """
+    scopes = record.get("scopes") or ()
+    if isinstance(scopes, str):
+        scopes = scopes.split()
+    metadata = record.get("metadata") or {}
+    if isinstance(metadata, str):
+        metadata = json.loads(metadata)
+    return APIKey(
+        id=str(record["id"]),
+        digest=bytes.fromhex(record["sha256"]),
+        scopes=frozenset(scopes),
+        metadata=metadata,
+        mask=scope_mask(scopes, strict=False),
+    )
+
+
+class APIKeyStore:
+    """
+    In-memory index of API keys by digest.
+
+    Keys from the file and from the table are kept in separate indexes,
+    so reloading the file leaves the table's keys alone. Every update
+    happens on the event loop, or replaces an index in one assignment.
+    """
+
+    def __init__(self):
+        self._file: dict[bytes, APIKey] = {}
+        self._table: dict[bytes, APIKey] = {}
+        self._table_ids: dict[str, bytes] = {}
+
+    def lookup(self, token: str) -> Optional[APIKey]:
+        """
+        Find the key matching a token.
+
+        Parameters
+        ----------
+        token : str
+            The key sent by the client.
+
+        Returns
+        -------
+        APIKey or None
+            The key, or None if it is unknown.
+        """
+        digest = hash_api_key(token)
+        key = self._table.get(digest) or self._file.get(digest)
+        if key is not None and hmac.compare_digest(key.digest, digest):
+            return key
+        return None
+
+    def replace_file_keys(self, keys: list[APIKey]) -> None:
+        """Swap in the keys of a freshly read file."""
+        self._file = {key.digest: key for key in keys}
+
+    def apply_table_changes(
+        self, upserts: list[APIKey], revoked_ids: list[str]
+    ) -> None:
+        """Add or update keys from the table, and drop revoked ones."""
+        for key in upserts:
+            old = self._table_ids.get(key.id)
+            if old is not None and old != key.digest:
+                self._table.pop(old, None)  # The key was rotated
+            self._table[key.digest] = key
+            self._table_ids[key.id] = key.digest
+        for key_id in revoked_ids:
+            digest = self._table_ids.pop(key_id, None)
+            if digest is not None:
+                self._table.pop(digest, None)
+
+    def clear(self) -> None:
+        """Forget all keys."""
+        self._file, self._table, self._table_ids = {}, {}, {}
+
+    def __len__(self) -> int:
+        return len(self._file) + len(self._table)
+
+
+# Shared by the whole worker process, filled by `APIKeyLoader`
+api_key_store = APIKeyStore()
+
+
+# --- Sources ---
+
+class FileKeySource:
+    """
+    API keys in a JSON Lines file, one `parse_key_record` record per
+    line. Blank lines and lines starting with ``#`` are skipped.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._mtime: Optional[int] = None
+
+    def load(self) -> Optional[list[APIKey]]:
+        """Return all keys if the file changed since the last load."""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime == self._mtime:
+            return None
+        keys = []
+        if mtime is not None:
+            with open(self.path, encoding="utf-8") as file:
+                for line in file:
+                    line = line.strip()
+                    if line and not line.startswith("#"):
+                        keys.append(parse_key_record(json.loads(line)))
+        self._mtime = mtime
+        return keys
+
+
+# Table names are interpolated into SQL, so only plain identifiers
+_IDENTIFIER = re.compile(r"^\w+(\.\w+)*$", re.ASCII)
+
+
+class TableKeySource:
+    """
+    API keys in a database table.
+
+    The table needs the columns ``key_id``, ``key_sha256`` (hex),
+    ``scopes`` (space-separated), ``metadata`` (JSON or NULL),
+    ``revoked`` (0 or 1) and ``updated_at``, which must be set on every
+    change. Rows are never deleted; revoking a key sets ``revoked``.
+    """
+
+    def __init__(self, table: str):
+        if not _IDENTIFIER.match(table):
+            raise ValueError(f"Invalid API key table name {table!r}")
+        self._sql = (
+            "SELECT key_id, key_sha256, scopes, metadata, revoked, "
+            f"updated_at FROM {table}"
+        )
+        self._since: Any = None
+
+    async def changes(self, pool) -> tuple[list[APIKey], list[str]]:
+        """
+        Fetch the rows changed since the last call.
+
+        Rows updated at exactly the previous watermark are fetched
+        again, so changes committed in the same instant are not lost.
+
+        Returns
+        -------
+        tuple[list[APIKey], list[str]]
+            The new or updated keys, and the ids of revoked keys.
+        """
+        async with pool.acquire() as connection:
+            if self._since is None:
+                rows = await connection.fetchall(self._sql)
+            else:
+                rows = await connection.fetchall(
+                    f"{self._sql} WHERE updated_at >= ?", (self._since,)
+                )
+        upserts, revoked = [], []
+        for key_id, sha256, scopes, metadata, is_revoked, updated_at in rows:
+            if is_revoked:
+                revoked.append(str(key_id))
+            else:
+                upserts.append(parse_key_record({
+                    "id": key_id, "sha256": sha256,
+                    "scopes": scopes, "metadata": metadata,
+                }))
+            if self._since is None or updated_at > self._since:
+                self._since = updated_at
+        return upserts, revoked
+
+
+class APIKeyLoader:
+    """
+    Keeps a store in sync with its sources.
+
+    Parameters
+    ----------
+    store : APIKeyStore
+        The store to fill.
+    file_source : FileKeySource, optional
+        Keys from a file.
+    table_source : TableKeySource, optional
+        Keys from a table, read through `pool`.
+    pool : ConnectionPool, optional
+        The database pool.
+    interval : float
+        Seconds between refreshes.
+    """
+
+    def __init__(
+        self,
+        store: APIKeyStore,
+        file_source: Optional[FileKeySource] = None,
+        table_source: Optional[TableKeySource] = None,
+        pool=None,
+        interval: float = 30.0,
+    ):
+        self.store = store
+        self.file_source = file_source
+        self.table_source = table_source if pool is not None else None
+        self.pool = pool
+        self.interval = interval
+
+    @classmethod
+    def from_settings(
+        cls, settings: Settings, store: APIKeyStore, pool=None
+    ) -> "APIKeyLoader":
+        """Build the loader for the sources the settings configure."""
+        return cls(
+            store,
+            file_source=(
+                FileKeySource(settings.API_KEYS_FILE)
+                if settings.API_KEYS_FILE else None
+            ),
+            table_source=(
+                TableKeySource(settings.API_KEYS_TABLE)
+                if settings.API_KEYS_TABLE else None
+            ),
+            pool=pool,
+            interval=settings.API_KEYS_REFRESH_SECONDS,
+        )
+
+    async def refresh(self) -> None:
+        """Apply the changes of every source to the store."""
+        if self.file_source is not None:
+            keys = await run_in_threadpool(self.file_source.load)
+            if keys is not None:
+                self.store.replace_file_keys(keys)
+        if self.table_source is not None:
+            upserts, revoked = await self.table_source.changes(self.pool)
+            self.store.apply_table_changes(upserts, revoked)
+
+    async def run(self) -> None:
+        """Refresh every `interval` seconds until cancelled."""
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.refresh()
+            except Exception as exc:
+                # Keep serving the keys already loaded
+                logger.warning("API key refresh failed: {!r}", exc)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        sys.exit(
+            "usage: python -m rest_fastapi.security.api_keys "
+            "<key_id> [scope ...]"
+        )
+    new_key = secrets.token_urlsafe(32)
+    print(new_key)
+    print(json.dumps({
+        "id": sys.argv[1],
+        "sha256": hash_api_key(new_key).hex(),
+        "scopes": sys.argv[2:],
+    }))
@@ -0,0 +1,171 @@
+"""
+In-memory cache of verified JWTs.
+
+Verifying a JWT costs an HMAC computation plus claim parsing on every
+request, even though clients typically reuse the same token many times
+before it expires. This module provides a bounded LRU cache of tokens
+that already passed verification, keyed by a digest of the token, so
+repeat callers can skip the signature check. An entry is never kept
+past the expiry of the token it was built from.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+from rest_fastapi.security.schemas import TokenData
+
+
+class TokenCache:
+    """
+    Bounded LRU + TTL cache of verified JWTs.
+
+    The cache is safe to share between threads, since synchronous
+    dependencies are executed in Starlette's threadpool.
+
+    Parameters
+    ----------
+    max_size : int
+        Maximum number of entries. The least recently used entry is
+        evicted when the cache is full.
+    ttl : float
+        Maximum number of seconds an entry is trusted, regardless of how
+        far in the future the token's ``exp`` claim lies.
+    clock : Callable[[], float], optional
+        Source of the current UNIX time. Defaults to ``time.time``, which
+        is on the same scale as the ``exp`` claim.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        ttl: float,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: OrderedDict[bytes, tuple[float, TokenData]] = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(token: str, secret: str, algorithm: str) -> bytes:
+        """
+        Build the cache key for a token.
+
+        The signing secret and algorithm are part of the digest, so a
+        token verified under one key is never accepted from the cache
+        once a different key is configured.
+
+        Parameters
+        ----------
+        token : str
+            The encoded JWT.
+        secret : str
+            The key the token was verified with, or the fingerprint of
+            the key ring.
+        algorithm : str
+            The algorithm the token was verified with.
+
+        Returns
+        -------
+        bytes
+            A SHA-256 digest identifying the token.
+        """
+        digest = hashlib.sha256()
+        digest.update(algorithm.encode())
+        digest.update(b"\0")
+        digest.update(secret.encode())
+        digest.update(b"\0")
+        digest.update(token.encode())
+        return digest.digest()
+
+    def get(self, key: bytes) -> Optional[TokenData]:
+        """
+        Return the cached token data for a key, if still valid.
+
+        Parameters
+        ----------
+        key : bytes
+            A key built by `make_key`.
+
+        Returns
+        -------
+        TokenData or None
+            The cached token data, or None on a miss or expired entry.
+        """
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, token_data = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return token_data
+
+    def put(
+        self, key: bytes, token_data: TokenData, exp: Optional[float] = None
+    ) -> None:
+        """
+        Store the result of a successful verification.
+
+        Parameters
+        ----------
+        key : bytes
+            A key built by `make_key`.
+        token_data : TokenData
+            The verified token contents.
+        exp : float, optional
+            The token's ``exp`` claim as a UNIX timestamp. The entry
+            expires at whichever comes first, ``exp`` or the cache TTL.
+        """
+        if self.max_size <= 0:
+            return
+        expires_at = self._clock() + self.ttl
+        if exp is not None:
+            expires_at = min(expires_at, float(exp))
+        with self._lock:
+            self._entries[key] = (expires_at, token_data)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Remove all entries and reset the statistics."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> dict:
+        """
+        Return hit/miss statistics for the cache.
+
+        Returns
+        -------
+        dict
+            The current size, capacity, hit, miss and eviction counts,
+            and the hit ratio.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,338 @@
+"""
+JWT signing key ring.
+
+Tokens carry a ``kid`` (key id) header naming the key that signed them.
+The key ring maps every kid to its key, so verification picks the right
+key with one dictionary lookup, and several keys can be valid at the
+same time. That is what makes rotation possible without a restart:
+
+1. Add the new key to ``JWT_KEYS``. Tokens signed with either key
+   verify.
+2. Point ``JWT_ACTIVE_KID`` at it. New tokens are signed with it.
+3. Once the old tokens have expired, remove the old key.
+
+``SECRET_KEY`` is always part of the ring, under a kid derived from
+its value, and is the active key unless ``JWT_ACTIVE_KID`` says
+otherwise. Tokens issued before kids were introduced have no ``kid``
+header and are verified with it.
+
+Besides HMAC secrets, the ring holds RSA, EC and Ed25519 keys
+(RS256, ES256, EdDSA, ...). Their public halves are published as a JWK
+Set at ``/.well-known/jwks.json``, so other services can verify tokens
+locally without the secret and without calling this API.
+"""
+import base64
+import hashlib
+from functools import cached_property
+from typing import NamedTuple, Optional, Union
+
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric.ed25519 import (
+    Ed25519PrivateKey,
+    Ed25519PublicKey,
+)
+from jose import jwk
+from jose.backends.base import Key
+from jose.exceptions import JWKError
+
+from rest_fastapi.core.config import JWTKeyConfig, Settings
+
+# Algorithms whose keys are shared secrets, never published
+HMAC_ALGORITHMS = frozenset({"HS256", "HS384", "HS512"})
+
+
+def _b64url(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64url_decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+class EdDSAKey(Key):
+    """
+    Ed25519 key for the EdDSA JWS algorithm (RFC 8037).
+
+    python-jose has no EdDSA support, so this key is registered with
+    `jose.jwk` and implemented with `cryptography`.
+
+    Parameters
+    ----------
+    key : str, bytes, dict or Ed25519 key
+        A PEM encoded key, an OKP JWK or a `cryptography` key object.
+    algorithm : str
+        Must be ``EdDSA``.
+    """
+
+    def __init__(self, key, algorithm: str):
+        if algorithm != "EdDSA":
+            raise JWKError(f"EdDSAKey cannot be used with {algorithm}")
+        if isinstance(key, dict):
+            key = self._from_jwk(key)
+        elif isinstance(key, (str, bytes)):
+            key = self._from_pem(
+                key.encode("utf-8") if isinstance(key, str) else key
+            )
+        if not isinstance(key, (Ed25519PrivateKey, Ed25519PublicKey)):
+            raise JWKError("Not an Ed25519 key")
+        self.prepared_key = key
+
+    @staticmethod
+    def _from_jwk(data: dict):
+        if data.get("kty") != "OKP" or data.get("crv") != "Ed25519":
+            raise JWKError("Not an Ed25519 JWK")
+        if "d" in data:
+            return Ed25519PrivateKey.from_private_bytes(
+                _b64url_decode(data["d"])
+            )
+        return Ed25519PublicKey.from_public_bytes(_b64url_decode(data["x"]))
+
+    @staticmethod
+    def _from_pem(data: bytes):
+        try:
+            try:
+                return serialization.load_pem_public_key(data)
+            except ValueError:
+                return serialization.load_pem_private_key(data, password=None)
+        except ValueError as exc:
+            raise JWKError(exc)
+
+    def is_public(self) -> bool:
+        return isinstance(self.prepared_key, Ed25519PublicKey)
+
+    def sign(self, msg: bytes) -> bytes:
+        if self.is_public():
+            raise JWKError("Cannot sign with a public key")
+        return self.prepared_key.sign(msg)
+
+    def verify(self, msg: bytes, sig: bytes) -> bool:
+        public = self.public_key().prepared_key
+        try:
+            public.verify(sig, msg)
+        except InvalidSignature:
+            return False
+        return True
+
+    def public_key(self) -> "EdDSAKey":
+        if self.is_public():
+            return self
+        return EdDSAKey(self.prepared_key.public_key(), "EdDSA")
+
+    def to_pem(self) -> bytes:
+        if self.is_public():
+            return self.prepared_key.public_bytes(
+                serialization.Encoding.PEM,
+                serialization.PublicFormat.SubjectPublicKeyInfo,
+            )
+        return self.prepared_key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        )
+
+    def to_dict(self) -> dict:
+        public = self.public_key().prepared_key.public_bytes(
+            serialization.Encoding.Raw, serialization.PublicFormat.Raw
+        )
+        data = {
+            "alg": "EdDSA", "kty": "OKP", "crv": "Ed25519",
+            "x": _b64url(public),
+        }
+        if not self.is_public():
+            data["d"] = _b64url(self.prepared_key.private_bytes(
+                serialization.Encoding.Raw,
+                serialization.PrivateFormat.Raw,
+                serialization.NoEncryption(),
+            ))
+        return data
+
+
+jwk.register_key("EdDSA", EdDSAKey)
+
+
+class JWTKey(NamedTuple):
+    """
+    A key of the ring, parsed once.
+
+    Attributes
+    ----------
+    kid : str
+        The key id.
+    algorithm : str
+        The JWS algorithm the key is used with.
+    signing_key : Key or None
+        The parsed key tokens are signed with; None for keys that only
+        verify (public keys).
+    verification_key : Key
+        The parsed key signatures are checked with.
+    """
+
+    kid: str
+    algorithm: str
+    signing_key: Optional[Key]
+    verification_key: Key
+
+    @property
+    def public_jwk(self) -> Optional[dict]:
+        """The public JWK of an asymmetric key, None for HMAC."""
+        if self.algorithm in HMAC_ALGORITHMS:
+            return None
+        return {
+            **self.verification_key.to_dict(),
+            "kid": self.kid,
+            "use": "sig",
+        }
+
+
+def load_key(kid: str, algorithm: str, material: str) -> JWTKey:
+    """
+    Parse a key for an algorithm.
+
+    Parameters
+    ----------
+    kid : str
+        The key id.
+    algorithm : str
+        The JWS algorithm.
+    material : str
+        The HMAC secret, or a PEM encoded private or public key.
+
+    Returns
+    -------
+    JWTKey
+        The parsed key.
+    """
+    try:
+        key = jwk.construct(material, algorithm)
+    except JWKError as exc:
+        raise ValueError(f"Invalid JWT key {kid!r}: {exc}") from exc
+    if algorithm in HMAC_ALGORITHMS:
+        return JWTKey(kid, algorithm, key, key)
+    if key.is_public():
+        return JWTKey(kid, algorithm, None, key)
+    return JWTKey(kid, algorithm, key, key.public_key())
+
+
+def derive_kid(secret: str) -> str:
+    """Derive a stable key id from a secret."""
+    return hashlib.sha256(secret.encode("utf-8")).hexdigest()[:16]
+
+
+class KeyRing:
+    """
+    The keys accepted for JWT verification, indexed by kid.
+
+    Keys are parsed once, when the ring is built, so signing and
+    verifying never parse PEM or JWK data.
+
+    Parameters
+    ----------
+    keys : dict[str, tuple[str, str]]
+        ``(algorithm, material)`` by kid, where material is an HMAC
+        secret or a PEM encoded key.
+    active_kid : str
+        Kid of the key new tokens are signed with. It must be able to
+        sign, i.e. not be a public key.
+    legacy_kid : str, optional
+        Kid of the key used for tokens without a ``kid`` header.
+    """
+
+    def __init__(
+        self,
+        keys: dict[str, tuple[str, str]],
+        active_kid: str,
+        legacy_kid: Optional[str] = None,
+    ):
+        if active_kid not in keys:
+            raise ValueError(
+                f"Active JWT key {active_kid!r} is not in the ring"
+            )
+        self._keys = {
+            kid: load_key(kid, algorithm, material)
+            for kid, (algorithm, material) in keys.items()
+        }
+        self.active = self._keys[active_kid]
+        if self.active.signing_key is None:
+            raise ValueError(
+                f"Active JWT key {active_kid!r} is a public key"
+            )
+        self._legacy = self._keys.get(legacy_kid)
+        # Identifies the whole ring, e.g. in cache keys
+        self.fingerprint = hashlib.sha256(
+            repr(sorted(keys.items())).encode("utf-8")
+        ).hexdigest()
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> "KeyRing":
+        """Build the key ring described by the settings."""
+        default_kid = derive_kid(settings.SECRET_KEY)
+        keys = {default_kid: (settings.ALGORITHM, settings.SECRET_KEY)}
+        for kid, value in settings.JWT_KEYS.items():
+            keys[kid] = _key_material(value, settings.ALGORITHM)
+        return cls(
+            keys,
+            active_kid=settings.JWT_ACTIVE_KID or default_kid,
+            legacy_kid=default_kid,
+        )
+
+    def get(self, kid: Optional[str]) -> Optional[JWTKey]:
+        """Return the key for a kid, or None if it is not accepted."""
+        if kid is None:
+            return self._legacy
+        return self._keys.get(kid)
+
+    @cached_property
+    def jwks(self) -> dict:
+        """The JWK Set of the public keys, for local verification."""
+        return {
+            "keys": [
+                key.public_jwk for key in self._keys.values()
+                if key.public_jwk is not None
+            ]
+        }
+
+    def __contains__(self, kid: str) -> bool:
+        return kid in self._keys
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
+def _key_material(
+    value: Union[str, JWTKeyConfig], default_algorithm: str
+) -> tuple[str, str]:
+    if isinstance(value, str):
+        return default_algorithm, value
+    return value.algorithm, value.load()
+
+
+_key_ring: Optional[tuple[Settings, tuple, KeyRing]] = None
+
+
+def get_key_ring(settings: Settings) -> KeyRing:
+    """
+    Return the key ring for the settings.
+
+    The ring is built once and rebuilt only when the key settings
+    change, e.g. after the settings were reloaded.
+    """
+    global _key_ring
+    cached = _key_ring
+    if cached is not None and cached[0] is settings:
+        return cached[2]
+    config = (
+        settings.SECRET_KEY,
+        settings.ALGORITHM,
+        settings.JWT_ACTIVE_KID,
+        tuple(sorted(
+            (kid, value if isinstance(value, str) else value.model_dump_json())
+            for kid, value in settings.JWT_KEYS.items()
+        )),
+    )
+    if cached is None or cached[1] != config:
+        ring = KeyRing.from_settings(settings)
+    else:
+        ring = cached[2]
+    _key_ring = (settings, config, ring)
+    return ring
@@ -0,0 +1,285 @@
+"""
+Password hashing and verification.
+
+bcrypt is deliberately slow: one verification at the default cost takes
+a few hundred milliseconds of CPU. Running it on the event loop would
+block every other request handled by the same worker, so verification
+runs on a small dedicated executor instead. The executor is bounded by
+a worker count and a queue limit, and callers wait at most a fixed
+timeout, so a login storm is shed with 503 responses rather than
+starving the protected routes.
+
+Stored passwords that use an outdated scheme (legacy plaintext entries)
+or different bcrypt cost parameters are still accepted, but flagged on
+each successful login so they can be replaced in `USER_LOGIN`.
+
+A hash for the `USER_LOGIN` setting can be generated with::
+
+    python -m rest_fastapi.security.passwords <password>
+"""
+import asyncio
+import functools
+import logging
+import sys
+import threading
+from concurrent.futures import (
+    Executor,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from typing import TYPE_CHECKING, Optional
+
+from fastapi import HTTPException, status
+
+from rest_fastapi.core.config import Settings
+
+if TYPE_CHECKING:
+    from passlib.context import CryptContext
+
+# passlib 1.7.4 cannot read the version of bcrypt >= 4.1 and logs a
+# harmless traceback the first time the backend is loaded.
+logging.getLogger("passlib.handlers.bcrypt").setLevel(logging.ERROR)
+
+
+@functools.lru_cache(maxsize=None)
+def _crypt_context(rounds: int) -> "CryptContext":
+    """
+    Build the passlib context for a bcrypt cost.
+
+    Pinning both the minimum and maximum rounds to the configured cost
+    makes passlib flag any hash with a different cost for an update.
+    Plaintext is accepted for legacy entries but always flagged.
+    passlib is imported here, on the first login, rather than when the
+    application starts.
+    """
+    from passlib.context import CryptContext
+
+    return CryptContext(
+        schemes=["bcrypt", "plaintext"],
+        default="bcrypt",
+        deprecated=["plaintext"],
+        bcrypt__rounds=rounds,
+        bcrypt__min_rounds=rounds,
+        bcrypt__max_rounds=rounds,
+    )
+
+
+# --- Blocking primitives ---
+# Module-level functions so they can be pickled for a process pool.
+
+def verify_password(
+    password: str, stored: str, rounds: int
+) -> tuple[bool, bool]:
+    """
+    Verify a password, blocking the calling thread.
+
+    Parameters
+    ----------
+    password : str
+        The password sent by the client.
+    stored : str
+        The stored hash (or legacy plaintext value).
+    rounds : int
+        The current bcrypt cost factor.
+
+    Returns
+    -------
+    tuple[bool, bool]
+        Whether the password matches, and whether the stored value uses
+        an outdated scheme or cost. Only a match is checked for that.
+    """
+    context = _crypt_context(rounds)
+    verified = context.verify(password, stored)
+    return verified, verified and context.needs_update(stored)
+
+
+def hash_password(password: str, rounds: int) -> str:
+    """Hash a password with bcrypt, blocking the calling thread."""
+    return _crypt_context(rounds).hash(password)
+
+
+def _dummy_verify(rounds: int) -> bool:
+    return _crypt_context(rounds).dummy_verify()
+
+
+def _unavailable(detail: str) -> HTTPException:
+    """Build the error returned when the hasher cannot take more work."""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=detail,
+        headers={"Retry-After": "1"},
+    )
+
+
+class PasswordHasher:
+    """
+    Bounded, asynchronous front end for bcrypt.
+
+    Parameters
+    ----------
+    rounds : int
+        The bcrypt cost factor for new hashes.
+    workers : int
+        Number of threads or processes hashing concurrently.
+    queue_limit : int
+        Number of verifications allowed to wait for a free worker. Any
+        request beyond ``workers + queue_limit`` is rejected immediately.
+    timeout : float
+        Maximum number of seconds a caller waits for a result.
+    use_processes : bool, optional
+        Run bcrypt in a process pool instead of a thread pool. bcrypt
+        releases the GIL, so threads are usually sufficient and avoid
+        the cost of pickling. The default is False.
+    """
+
+    def __init__(
+        self,
+        rounds: int,
+        workers: int,
+        queue_limit: int,
+        timeout: float,
+        use_processes: bool = False,
+    ):
+        self.rounds = rounds
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.timeout = timeout
+        self.use_processes = use_processes
+        self._executor: Executor
+        if use_processes:
+            self._executor = ProcessPoolExecutor(max_workers=workers)
+        else:
+            self._executor = ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix="password-hasher"
+            )
+        self._capacity = workers + queue_limit
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    @property
+    def in_flight(self) -> int:
+        """Number of jobs running or waiting for a worker."""
+        return self._in_flight
+
+    def _release(self, _future) -> None:
+        with self._lock:
+            self._in_flight -= 1
+
+    async def _submit(self, func, *args):
+        """Run a job on the executor, enforcing the queue limit and timeout."""
+        with self._lock:
+            if self._in_flight >= self._capacity:
+                raise _unavailable("Too many concurrent login attempts")
+            self._in_flight += 1
+        try:
+            future = self._executor.submit(func, *args)
+        except BaseException:
+            self._release(None)
+            raise
+        # The slot is released when the job finishes, not when the caller
+        # gives up, so abandoned jobs still count against the limit.
+        future.add_done_callback(self._release)
+        try:
+            return await asyncio.wait_for(
+                asyncio.wrap_future(future), self.timeout
+            )
+        except asyncio.TimeoutError:
+            raise _unavailable("Password verification timed out")
+
+    async def verify(
+        self, password: str, stored: str
+    ) -> tuple[bool, bool]:
+        """
+        Verify a password and check whether its hash is outdated.
+
+        Parameters
+        ----------
+        password : str
+            The password sent by the client.
+        stored : str
+            The stored hash (or legacy plaintext value).
+
+        Returns
+        -------
+        tuple[bool, bool]
+            Whether the password matches, and whether the stored value
+            uses an outdated scheme or cost and should be replaced.
+        """
+        return await self._submit(
+            verify_password, password, stored, self.rounds
+        )
+
+    async def dummy_verify(self) -> None:
+        """
+        Spend the time of a real verification without checking anything.
+
+        Used for unknown usernames, so response times do not reveal
+        which accounts exist.
+        """
+        await self._submit(_dummy_verify, self.rounds)
+
+    async def hash(self, password: str) -> str:
+        """Hash a password with the current cost parameters."""
+        return await self._submit(hash_password, password, self.rounds)
+
+    def shutdown(self) -> None:
+        """Stop the executor without waiting for running jobs."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+# Process-wide hasher, built lazily so each gunicorn worker owns its pool.
+_hasher: Optional[PasswordHasher] = None
+
+
+def get_password_hasher(settings: Settings) -> PasswordHasher:
+    """
+    Return the password hasher configured by the settings.
+
+    The hasher is rebuilt if its settings change.
+
+    Parameters
+    ----------
+    settings : Settings
+        The application settings.
+
+    Returns
+    -------
+    PasswordHasher
+        The shared hasher.
+    """
+    global _hasher
+    hasher = _hasher
+    config = (
+        settings.PASSWORD_BCRYPT_ROUNDS,
+        settings.PASSWORD_HASH_WORKERS,
+        settings.PASSWORD_HASH_QUEUE_LIMIT,
+        settings.PASSWORD_HASH_TIMEOUT_SECONDS,
+        settings.PASSWORD_HASH_USE_PROCESSES,
+    )
+    if hasher is None or config != (
+        hasher.rounds,
+        hasher.workers,
+        hasher.queue_limit,
+        hasher.timeout,
+        hasher.use_processes,
+    ):
+        if hasher is not None:
+            hasher.shutdown()
+        hasher = PasswordHasher(*config)
+        _hasher = hasher
+    return hasher
+
+
+def shutdown_password_hasher() -> None:
+    """Shut down the shared hasher, if one was created."""
+    global _hasher
+    if _hasher is not None:
+        _hasher.shutdown()
+        _hasher = None
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        sys.exit("usage: python -m rest_fastapi.security.passwords <password>")
+    default_rounds = Settings.model_fields["PASSWORD_BCRYPT_ROUNDS"].default
+    print(hash_password(sys.argv[1], default_rounds))
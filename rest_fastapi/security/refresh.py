@@ -0,0 +1,241 @@
+"""
+Refresh tokens with rotation and reuse detection.
+
+A login verifies a bcrypt hash, which costs hundreds of milliseconds of
+CPU. Instead of logging in again whenever their access token expires,
+clients exchange a refresh token for a new access token, which costs
+one SQLite transaction and an HMAC signature. Login CPU then scales
+with the number of sessions, not with how short-lived access tokens
+are.
+
+Refresh tokens are opaque random strings; only their SHA-256 digest is
+stored. Each login starts a session (a token family), and every
+refresh rotates the token: the presented token is marked used and a
+new one is issued in the same family. Sessions slide: a new token is
+valid for ``REFRESH_TOKEN_EXPIRE_SECONDS`` from its refresh, but never
+past ``REFRESH_SESSION_MAX_SECONDS`` after the login.
+
+A used token presented again means it was copied: either the attacker
+or the legitimate client already rotated it. The whole family is then
+deleted, so both have to log in again.
+
+The store is a SQLite database shared by all worker processes, so a
+token rotated by one worker is known as used by the others.
+"""
+import hashlib
+import secrets
+import sqlite3
+import threading
+import time
+from typing import Callable, NamedTuple, Optional
+
+from prometheus_client import Counter
+
+from rest_fastapi.core.config import Settings
+
+REFRESH_TOKEN_REUSE = Counter(
+    "refresh_token_reuse_total",
+    "Refresh tokens presented again after rotation; their sessions are "
+    "revoked.",
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS refresh_tokens (
+    token_hash BLOB PRIMARY KEY,
+    family TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    session_expires_at REAL NOT NULL,
+    used INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS refresh_tokens_family
+    ON refresh_tokens (family);
+CREATE INDEX IF NOT EXISTS refresh_tokens_expires_at
+    ON refresh_tokens (expires_at);
+"""
+
+
+class RefreshGrant(NamedTuple):
+    """A refresh token and the subject it was issued to."""
+
+    subject: str
+    token: str
+    expires_at: float
+
+
+def _digest(token: str) -> bytes:
+    return hashlib.sha256(token.encode("utf-8")).digest()
+
+
+class RefreshTokenStore:
+    """
+    Refresh token families in a SQLite database.
+
+    Parameters
+    ----------
+    path : str
+        The database file. It is created if needed.
+    ttl : float
+        Lifetime of a refresh token, renewed by every rotation.
+    session_ttl : float
+        Maximum lifetime of a session, from its login.
+    clock : Callable[[], float], optional
+        Source of the current UNIX time.
+    timeout : float, optional
+        Seconds to wait for another process holding the write lock.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        ttl: float,
+        session_ttl: float,
+        clock: Callable[[], float] = time.time,
+        timeout: float = 5.0,
+    ):
+        self.path = path
+        self.ttl = ttl
+        self.session_ttl = session_ttl
+        self._clock = clock
+        self._conn = sqlite3.connect(
+            path, timeout=timeout, isolation_level=None,
+            check_same_thread=False,
+        )
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+
+    def _insert(
+        self, family: str, subject: str, now: float, session_expires_at: float
+    ) -> RefreshGrant:
+        token = secrets.token_urlsafe(32)
+        expires_at = min(now + self.ttl, session_expires_at)
+        self._conn.execute(
+            "INSERT INTO refresh_tokens (token_hash, family, subject, "
+            "expires_at, session_expires_at) VALUES (?, ?, ?, ?, ?)",
+            (_digest(token), family, subject, expires_at, session_expires_at),
+        )
+        return RefreshGrant(subject, token, expires_at)
+
+    def issue(self, subject: str) -> RefreshGrant:
+        """
+        Start a session for a subject that just logged in.
+
+        Expired tokens of all sessions are purged at the same time.
+        """
+        now = self._clock()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "DELETE FROM refresh_tokens WHERE expires_at <= ?", (now,)
+                )
+                grant = self._insert(
+                    secrets.token_urlsafe(16), subject, now,
+                    now + self.session_ttl,
+                )
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+        return grant
+
+    def rotate(self, token: str) -> Optional[RefreshGrant]:
+        """
+        Exchange a refresh token for a new one of the same session.
+
+        Parameters
+        ----------
+        token : str
+            The refresh token presented by the client.
+
+        Returns
+        -------
+        RefreshGrant or None
+            The new token, or None if the token is unknown, expired or
+            was already used. Reusing a token revokes its session.
+        """
+        now = self._clock()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                grant = self._rotate(_digest(token), now)
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+        return grant
+
+    def _rotate(self, token_hash: bytes, now: float) -> Optional[RefreshGrant]:
+        row = self._conn.execute(
+            "SELECT family, subject, expires_at, session_expires_at, used "
+            "FROM refresh_tokens WHERE token_hash = ?",
+            (token_hash,),
+        ).fetchone()
+        if row is None:
+            return None
+        family, subject, expires_at, session_expires_at, used = row
+        if used:
+            REFRESH_TOKEN_REUSE.inc()
+            self._conn.execute(
+                "DELETE FROM refresh_tokens WHERE family = ?", (family,)
+            )
+            return None
+        if expires_at <= now:
+            return None
+        self._conn.execute(
+            "UPDATE refresh_tokens SET used = 1 WHERE token_hash = ?",
+            (token_hash,),
+        )
+        return self._insert(family, subject, now, session_expires_at)
+
+    def revoke(self, token: str) -> bool:
+        """End the session of a refresh token, e.g. on logout."""
+        with self._lock:
+            return self._conn.execute(
+                "DELETE FROM refresh_tokens WHERE family = ("
+                "SELECT family FROM refresh_tokens WHERE token_hash = ?)",
+                (_digest(token),),
+            ).rowcount > 0
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
+
+
+_refresh_store: Optional[tuple[tuple, RefreshTokenStore]] = None
+
+
+def get_refresh_store(settings: Settings) -> Optional[RefreshTokenStore]:
+    """
+    Return the refresh token store configured by the settings.
+
+    The store is opened lazily, so each worker process owns its
+    database connection, and reopened if its settings change.
+
+    Parameters
+    ----------
+    settings : Settings
+        The application settings.
+
+    Returns
+    -------
+    Optional[RefreshTokenStore]
+        The shared store, or None if refresh tokens are disabled.
+    """
+    global _refresh_store
+    if not settings.REFRESH_TOKEN_ENABLED:
+        return None
+    config = (
+        settings.REFRESH_TOKEN_DB_PATH,
+        settings.REFRESH_TOKEN_EXPIRE_SECONDS,
+        settings.REFRESH_SESSION_MAX_SECONDS,
+    )
+    cached = _refresh_store
+    if cached is not None and cached[0] == config:
+        return cached[1]
+    store = RefreshTokenStore(*config)
+    _refresh_store = (config, store)
+    return store
@@ -0,0 +1,352 @@
+"""
+Revoked JWT denylist.
+
+Every access token carries a unique ``jti`` (JWT ID) claim, and revoking
+a token adds its ``jti`` to a denylist until the token's ``exp``, after
+which the token is rejected anyway and the entry is dropped.
+
+Almost no token presented to the API is revoked, so the check has to be
+cheap for that case. Each worker keeps a Bloom filter of the revoked
+ids in memory, a few bytes per entry: a token missing from the filter
+is certainly not revoked and costs a handful of bit tests. Only a
+filter hit, which is a revoked token or a rare false positive, is
+confirmed against the exact store.
+
+The exact store is a SQLite database shared by all workers. A worker
+revoking a token updates the store and its own filter; the others pick
+the new ids up incrementally, by sequence number, at most
+``REVOCATION_SYNC_INTERVAL_SECONDS`` later. Bloom filters cannot forget
+entries, so each worker periodically purges the expired rows and
+rebuilds its filter from the live ones.
+"""
+import math
+import sqlite3
+import threading
+import time
+from typing import Callable, Iterator, Optional
+
+from prometheus_client import Counter
+
+from rest_fastapi.core.config import Settings
+
+DENYLIST_CHECKS = Counter(
+    "jwt_denylist_checks_total",
+    "JWT revocation checks, by outcome (clear, false_positive, revoked).",
+    ["result"],
+)
+
+
+class BloomFilter:
+    """
+    Bloom filter over strings.
+
+    The bit positions are derived from the key's built-in 64-bit hash
+    by double hashing, so a lookup hashes its key only once. String
+    hashes are salted per process, which is fine since every worker
+    builds its own filter.
+
+    Parameters
+    ----------
+    capacity : int
+        Number of entries the filter is sized for.
+    error_rate : float
+        False positive rate at full capacity.
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        capacity = max(1, capacity)
+        self.bits = max(64, math.ceil(
+            -capacity * math.log(error_rate) / math.log(2) ** 2
+        ))
+        self.hashes = max(1, round(self.bits / capacity * math.log(2)))
+        self.count = 0
+        self._array = bytearray((self.bits + 7) // 8)
+
+    def _positions(self, key: str) -> Iterator[int]:
+        digest = hash(key) & 0xFFFF_FFFF_FFFF_FFFF
+        bits = self.bits
+        position = (digest & 0xFFFF_FFFF) % bits
+        step = ((digest >> 32) | 1) % bits
+        for _ in range(self.hashes):
+            yield position
+            position = (position + step) % bits
+
+    def add(self, key: str) -> None:
+        """Add a key to the filter."""
+        array = self._array
+        for position in self._positions(key):
+            array[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        # Same positions as `_positions`, inlined: this is the hot path
+        digest = hash(key) & 0xFFFF_FFFF_FFFF_FFFF
+        bits, array = self.bits, self._array
+        position = (digest & 0xFFFF_FFFF) % bits
+        step = ((digest >> 32) | 1) % bits
+        for _ in range(self.hashes):
+            if not array[position >> 3] & (1 << (position & 7)):
+                return False
+            position = (position + step) % bits
+        return True
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def size_bytes(self) -> int:
+        """Memory used by the bit array."""
+        return len(self._array)
+
+
+# --- Exact store ---
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS revoked_tokens (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    jti TEXT NOT NULL UNIQUE,
+    expires_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS revoked_tokens_expires_at
+    ON revoked_tokens (expires_at);
+"""
+
+
+class RevocationStore:
+    """
+    Revoked token ids in a SQLite database shared by the workers.
+
+    ``seq`` only grows, even across deletions, so a worker can ask for
+    the rows added since its last sync.
+
+    Parameters
+    ----------
+    path : str
+        The database file. It is created if needed.
+    timeout : float, optional
+        Seconds to wait for another process holding the write lock.
+    """
+
+    def __init__(self, path: str, timeout: float = 5.0):
+        self.path = path
+        self._conn = sqlite3.connect(
+            path, timeout=timeout, isolation_level=None,
+            check_same_thread=False,
+        )
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+
+    def add(self, jti: str, expires_at: float) -> None:
+        """Revoke a token id until `expires_at` (a UNIX timestamp)."""
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO revoked_tokens (jti, expires_at) VALUES (?, ?) "
+                "ON CONFLICT (jti) DO UPDATE SET expires_at = "
+                "max(expires_at, excluded.expires_at)",
+                (jti, expires_at),
+            )
+
+    def contains(self, jti: str, now: float) -> bool:
+        """Return whether a token id is revoked and not yet expired."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM revoked_tokens "
+                "WHERE jti = ? AND expires_at > ?",
+                (jti, now),
+            ).fetchone()
+        return row is not None
+
+    def since(self, seq: int, now: float) -> list[tuple[int, str]]:
+        """Return the live ``(seq, jti)`` rows added after `seq`."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT seq, jti FROM revoked_tokens "
+                "WHERE seq > ? AND expires_at > ? ORDER BY seq",
+                (seq, now),
+            ).fetchall()
+
+    def last_seq(self) -> int:
+        """Return the sequence number of the newest row ever added."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT seq FROM sqlite_sequence WHERE name = 'revoked_tokens'"
+            ).fetchone()
+        return row[0] if row else 0
+
+    def purge(self, now: float) -> int:
+        """Delete expired rows and return how many were removed."""
+        with self._lock:
+            return self._conn.execute(
+                "DELETE FROM revoked_tokens WHERE expires_at <= ?", (now,)
+            ).rowcount
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
+
+
+# --- Denylist ---
+
+class Denylist:
+    """
+    Bloom filter in front of the shared revocation store.
+
+    Parameters
+    ----------
+    store : RevocationStore
+        The exact, shared set of revoked ids.
+    capacity : int
+        Minimum number of entries the filter is sized for. A rebuild
+        sizes it for twice the live entries if that is more.
+    error_rate : float
+        False positive rate of the filter at capacity.
+    sync_interval : float
+        Seconds between fetches of ids revoked by other workers.
+    rebuild_interval : float
+        Seconds between purges of expired ids and filter rebuilds.
+    clock : Callable[[], float], optional
+        Source of the current UNIX time, the scale of ``exp``.
+    """
+
+    def __init__(
+        self,
+        store: RevocationStore,
+        capacity: int,
+        error_rate: float,
+        sync_interval: float,
+        rebuild_interval: float,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.store = store
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.sync_interval = sync_interval
+        self.rebuild_interval = rebuild_interval
+        self._clock = clock
+        self._sync_lock = threading.Lock()
+        self._next_sync = 0.0
+        self._next_rebuild = 0.0
+        self._seq = 0
+        self.filter = BloomFilter(capacity, error_rate)
+
+    def sync_due(self) -> bool:
+        """Return whether `sync` should run before the next check."""
+        return self._clock() >= self._next_sync
+
+    def sync(self) -> None:
+        """
+        Fetch the ids revoked since the last sync.
+
+        Once every `rebuild_interval`, expired ids are purged from the
+        store and the filter is rebuilt from the remaining ones instead.
+        Blocks on SQLite, so async callers run it in the threadpool.
+        """
+        with self._sync_lock:
+            now = self._clock()
+            if now < self._next_sync:
+                return
+            if now >= self._next_rebuild:
+                self._rebuild(now)
+            else:
+                for seq, jti in self.store.since(self._seq, now):
+                    self.filter.add(jti)
+                    self._seq = seq
+            self._next_sync = now + self.sync_interval
+
+    def _rebuild(self, now: float) -> None:
+        self.store.purge(now)
+        # Read the sequence first: rows added meanwhile are fetched
+        # again by the next sync, which is harmless
+        seq = self.store.last_seq()
+        rows = self.store.since(0, now)
+        bloom = BloomFilter(
+            max(self.capacity, 2 * len(rows)), self.error_rate
+        )
+        for _, jti in rows:
+            bloom.add(jti)
+        self.filter, self._seq = bloom, seq
+        self._next_rebuild = now + self.rebuild_interval
+
+    def is_revoked(self, jti: str) -> bool:
+        """
+        Return whether a token id is revoked.
+
+        A filter miss is answered from memory. A hit is confirmed with
+        the store, which blocks, so async callers should check
+        `might_be_revoked` first and only offload the rest.
+        """
+        if jti not in self.filter:
+            DENYLIST_CHECKS.labels("clear").inc()
+            return False
+        revoked = self.store.contains(jti, self._clock())
+        DENYLIST_CHECKS.labels(
+            "revoked" if revoked else "false_positive"
+        ).inc()
+        return revoked
+
+    def might_be_revoked(self, jti: str) -> bool:
+        """Return whether the filter contains a token id."""
+        if jti in self.filter:
+            return True
+        DENYLIST_CHECKS.labels("clear").inc()
+        return False
+
+    def revoke(self, jti: str, expires_at: Optional[float]) -> None:
+        """
+        Revoke a token id until the token expires.
+
+        Tokens without an expiry stay revoked for good.
+        """
+        if expires_at is None:
+            expires_at = math.inf
+        elif expires_at <= self._clock():
+            return  # Already rejected as expired
+        self.store.add(jti, expires_at)
+        self.filter.add(jti)
+
+
+_denylist: Optional[tuple[tuple, Denylist]] = None
+
+
+def get_denylist(settings: Settings) -> Optional[Denylist]:
+    """
+    Return the denylist configured by the settings.
+
+    The denylist is opened lazily, so each worker process owns its
+    database connection, and rebuilt if its settings change.
+
+    Parameters
+    ----------
+    settings : Settings
+        The application settings.
+
+    Returns
+    -------
+    Optional[Denylist]
+        The shared denylist, or None if revocation is disabled.
+    """
+    global _denylist
+    if not settings.REVOCATION_ENABLED:
+        return None
+    config = (
+        settings.REVOCATION_DB_PATH,
+        settings.REVOCATION_BLOOM_CAPACITY,
+        settings.REVOCATION_BLOOM_ERROR_RATE,
+        settings.REVOCATION_SYNC_INTERVAL_SECONDS,
+        settings.REVOCATION_REBUILD_INTERVAL_SECONDS,
+    )
+    cached = _denylist
+    if cached is not None and cached[0] == config:
+        return cached[1]
+    denylist = Denylist(
+        RevocationStore(settings.REVOCATION_DB_PATH),
+        capacity=settings.REVOCATION_BLOOM_CAPACITY,
+        error_rate=settings.REVOCATION_BLOOM_ERROR_RATE,
+        sync_interval=settings.REVOCATION_SYNC_INTERVAL_SECONDS,
+        rebuild_interval=settings.REVOCATION_REBUILD_INTERVAL_SECONDS,
+    )
+    _denylist = (config, denylist)
+    return denylist
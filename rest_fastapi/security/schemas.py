@@ -17,8 +17,18 @@ class TokenData(BaseModel):
     ----------
     username : str or None
         The subject of the token, typically the user's username.
+    jti : str or None
+        The unique id of the token, used to revoke it.
+    exp : float or None
+        The expiry of the token as a UNIX timestamp.
+    scopes : int
+        The granted scopes as a bitset, from the ``scp`` claim (see
+        `rest_fastapi.security.scopes`).
     """
     username: Optional[str] = None
+    jti: Optional[str] = None
+    exp: Optional[float] = None
+    scopes: int = 0
 
 
 class Token(BaseModel):
@@ -31,6 +41,13 @@ class Token(BaseModel):
         The JWT access token.
     token_type : str
         The type of the token (e.g., "bearer").
+    expires_in : int or None
+        The lifetime of the access token in seconds.
+    refresh_token : str or None
+        A token to exchange for a new access token at /login/refresh,
+        if refresh tokens are enabled.
     """
     access_token: str
     token_type: str
+    expires_in: Optional[int] = None
+    refresh_token: Optional[str] = None
@@ -0,0 +1,69 @@
+"""
+Authorization scopes as bitsets.
+
+Every scope known to the application has a fixed bit, so a set of
+scopes is a single integer. Access tokens carry the granted scopes in
+their ``scp`` claim as that integer, and routes declare the scopes they
+require with `auth.auth_jwt_scopes` or `auth.auth_token_scopes`, which
+compile them to a mask when the route is declared. Authorizing a
+request is then one integer AND, with no lookup.
+
+Bits are part of the tokens already issued, so `SCOPES` is append-only:
+a scope is never removed or moved, only added at the end.
+"""
+from typing import Iterable
+
+# Append-only: the position of a scope is its bit
+SCOPES: tuple[str, ...] = (
+    "examples:admin",
+    "exports:read",
+    "debug:profile",
+    "jobs:run",
+)
+
+SCOPE_BITS: dict[str, int] = {
+    scope: 1 << index for index, scope in enumerate(SCOPES)
+}
+
+# Granted by the ``*`` scope
+ALL_SCOPES = (1 << len(SCOPES)) - 1
+
+
+def scope_mask(scopes: Iterable[str], strict: bool = True) -> int:
+    """
+    Compile scope names to a bitset.
+
+    Parameters
+    ----------
+    scopes : Iterable[str]
+        Scope names. ``*`` stands for every scope.
+    strict : bool, optional
+        Whether unknown names are an error. Route declarations are
+        strict, so a typo fails at startup; scopes granted to users and
+        API keys are not, so data naming a retired or future scope
+        still loads.
+
+    Returns
+    -------
+    int
+        The bitset.
+
+    Raises
+    ------
+    ValueError
+        If `strict` and a name is unknown.
+    """
+    mask = 0
+    for scope in scopes:
+        if scope == "*":
+            mask |= ALL_SCOPES
+        elif scope in SCOPE_BITS:
+            mask |= SCOPE_BITS[scope]
+        elif strict:
+            raise ValueError(f"Unknown scope {scope!r}")
+    return mask
+
+
+def scope_names(mask: int) -> list[str]:
+    """Return the names of the scopes in a bitset."""
+    return [scope for scope, bit in SCOPE_BITS.items() if mask & bit]
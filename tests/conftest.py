@@ -6,12 +6,23 @@ TestClient, which is configured to override the application's settings
 dependency. This ensures that all tests run with a predictable,
 isolated configuration, independent of any real .env files.
 """
+import os
+import shutil
+import tempfile
+
 import pytest
 from fastapi.testclient import TestClient
 
 from rest_fastapi.app import create_app
 from rest_fastapi.core.config import Settings, get_settings
 
+# Rate limiter buckets of this test run, kept apart from other runs
+_RATE_LIMIT_DIR = tempfile.mkdtemp(prefix="rest-fastapi-tests-")
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_RATE_LIMIT_DIR, ignore_errors=True)
+
 
 def get_test_settings() -> Settings:
     """
@@ -26,7 +37,13 @@ def get_test_settings() -> Settings:
         ALGORITHM="HS256",
         ACCESS_TOKEN_EXPIRE_SECONDS=15*60,
         SIMPLE_API_TOKEN="test-static-api-token",
-        USER_LOGIN={"testuser": {"password": "testpassword"}}
+        USER_LOGIN={"testuser": {"password": "testpassword"}},
+        PASSWORD_BCRYPT_ROUNDS=4,  # Minimum cost keeps tests fast
+        # Every request is limited, but loose enough for the whole suite
+        RATE_LIMIT_ENABLED=True,
+        RATE_LIMIT_RATE=1_000.0,
+        RATE_LIMIT_BURST=1_000,
+        RATE_LIMIT_STATE_FILE=os.path.join(_RATE_LIMIT_DIR, "buckets"),
     )
 
 
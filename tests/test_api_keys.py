@@ -0,0 +1,131 @@
+"""
+Unit tests for the API key store, its sources and loader.
+"""
+import asyncio
+import json
+import os
+import sqlite3
+
+from fastapi.testclient import TestClient
+
+from rest_fastapi.core.config import get_settings
+from rest_fastapi.db.pool import ConnectionPool
+from rest_fastapi.security.api_keys import (
+    APIKeyLoader,
+    APIKeyStore,
+    FileKeySource,
+    TableKeySource,
+    api_key_store,
+    hash_api_key,
+)
+from tests.conftest import get_test_settings
+
+
+def write_keys(path, *records) -> None:
+    """Write key records as JSON Lines."""
+    with open(path, "w", encoding="utf-8") as file:
+        file.write("# partner keys\n")
+        for key_id, token, scopes in records:
+            file.write(json.dumps({
+                "id": key_id,
+                "sha256": hash_api_key(token).hex(),
+                "scopes": scopes,
+                "metadata": {"partner": key_id.title()},
+            }) + "\n")
+
+
+def test_file_keys_reload_on_change(tmp_path):
+    """Test lookups, and that the file is re-read only when it changes."""
+    path = tmp_path / "keys.jsonl"
+    write_keys(path, ("acme", "acme-secret", ["reports:read"]))
+    store = APIKeyStore()
+    loader = APIKeyLoader(store, file_source=FileKeySource(str(path)))
+
+    asyncio.run(loader.refresh())
+    key = store.lookup("acme-secret")
+    assert key.id == "acme"
+    assert key.scopes == {"reports:read"}
+    assert key.metadata == {"partner": "Acme"}
+    assert store.lookup("wrong") is None
+    assert loader.file_source.load() is None  # Unchanged
+
+    write_keys(path, ("globex", "globex-secret", []))
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    asyncio.run(loader.refresh())
+    assert store.lookup("acme-secret") is None
+    assert store.lookup("globex-secret").id == "globex"
+
+
+def test_table_keys_refresh_incrementally(tmp_path):
+    """Test new, rotated and revoked keys of a table."""
+    database = str(tmp_path / "keys.sqlite3")
+    with sqlite3.connect(database) as connection:
+        connection.execute(
+            "CREATE TABLE api_keys (key_id TEXT, key_sha256 TEXT, "
+            "scopes TEXT, metadata TEXT, revoked INTEGER, updated_at INTEGER)"
+        )
+
+    def put(key_id, token, revoked, updated_at):
+        with sqlite3.connect(database) as connection:
+            connection.execute("DELETE FROM api_keys WHERE key_id = ?",
+                               (key_id,))
+            connection.execute(
+                "INSERT INTO api_keys VALUES (?, ?, 'exports:read', NULL, "
+                "?, ?)",
+                (key_id, hash_api_key(token).hex(), revoked, updated_at),
+            )
+
+    pool = ConnectionPool(
+        lambda: sqlite3.connect(database, check_same_thread=False),
+        min_size=1, max_size=1, acquire_timeout=1.0, max_lifetime=60.0,
+        health_check_after=30.0, maintenance_interval=60.0,
+    )
+    store = APIKeyStore()
+    source = TableKeySource("api_keys")
+    loader = APIKeyLoader(store, table_source=source, pool=pool)
+
+    async def scenario():
+        await pool.open()
+        try:
+            put("acme", "acme-1", 0, 1)
+            put("globex", "globex-1", 0, 1)
+            await loader.refresh()
+            assert store.lookup("acme-1").scopes == {"exports:read"}
+            assert len(store) == 2
+
+            put("acme", "acme-2", 0, 2)  # Rotated
+            put("globex", "globex-1", 1, 2)  # Revoked
+            await loader.refresh()
+            assert store.lookup("acme-1") is None
+            assert store.lookup("acme-2").id == "acme"
+            assert store.lookup("globex-1") is None
+            assert len(store) == 1
+        finally:
+            await pool.close()
+
+    asyncio.run(scenario())
+
+
+def test_partner_key_authenticates(client: TestClient, tmp_path):
+    """Test a partner key on a route protected by `auth_token`."""
+    path = tmp_path / "keys.jsonl"
+    write_keys(path, ("acme", "acme-secret", ["*"]))
+    api_key_store.replace_file_keys(FileKeySource(str(path)).load())
+    settings = get_test_settings()
+    client.app.dependency_overrides[get_settings] = lambda: settings
+    try:
+        response = client.get(
+            "/auth/verify", headers={"Authentication": "acme-secret"}
+        )
+        assert response.status_code == 200
+        assert response.headers["X-Auth-User"] == "acme"
+        assert client.get(
+            "/auth/verify", headers={"Authentication": "test-static-api-token"}
+        ).headers["X-Auth-User"] == "simple"
+        assert client.get(
+            "/auth/verify", headers={"Authentication": "unknown"}
+        ).status_code == 401
+    finally:
+        api_key_store.clear()
+        client.app.dependency_overrides[get_settings] = get_test_settings
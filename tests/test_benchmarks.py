@@ -0,0 +1,50 @@
+"""
+Unit tests for the benchmark baseline comparison and startup profiler.
+"""
+from benchmarks.bench_routes import compare_results
+from benchmarks.bench_startup import by_package, parse_importtime
+
+
+def make_document(**metrics) -> dict:
+    """Build a minimal benchmark document for one route."""
+    values = dict(
+        rps=1000.0, p50_ms=5.0, p95_ms=8.0, p99_ms=10.0, alloc_peak_kib=20.0
+    )
+    values.update(metrics)
+    return {"meta": {}, "routes": {"public": values}}
+
+
+def test_compare_flags_regressions_beyond_tolerance():
+    """Test that slower or hungrier routes are reported."""
+    regressions = compare_results(
+        make_document(),
+        make_document(rps=800.0, p99_ms=13.0),
+        tolerance=0.15,
+    )
+    assert len(regressions) == 2
+    assert regressions[0].startswith("public: rps")
+    assert regressions[1].startswith("public: p99_ms")
+
+
+def test_compare_ignores_noise_and_improvements():
+    """Test that small changes and improvements are not flagged."""
+    regressions = compare_results(
+        make_document(),
+        make_document(rps=1500.0, p50_ms=5.5, alloc_peak_kib=10.0),
+        tolerance=0.15,
+    )
+    assert regressions == []
+
+
+def test_parse_importtime_sums_packages():
+    """Test parsing `-X importtime` output of the startup profiler."""
+    records = parse_importtime(
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |     jose.jwk\n"
+        "import time:        30 |        150 |   jose\n"
+        "import time:       500 |        650 | rest_fastapi.app\n"
+    )
+    assert [r.module for r in records] == [
+        "jose.jwk", "jose", "rest_fastapi.app"
+    ]
+    assert by_package(records) == {"rest_fastapi": 500, "jose": 150}
@@ -0,0 +1,154 @@
+"""
+Unit tests for BigQuery table exports, using a local fake read session.
+"""
+import asyncio
+import json
+import threading
+
+import pyarrow
+import pytest
+from fastapi.testclient import TestClient
+
+from rest_fastapi.app import create_app
+from rest_fastapi.core.config import get_settings
+from rest_fastapi.db import bigquery
+from tests.conftest import get_test_settings
+
+SCHEMA = pyarrow.schema([("id", pyarrow.int64()), ("name", pyarrow.string())])
+
+
+class FakeReadSession:
+    """A read session serving `streams` streams of `batches` batches."""
+
+    def __init__(self, streams: int, batches: int, rows_per_batch: int = 3):
+        self.serialized_schema = SCHEMA.serialize().to_pybytes()
+        self.stream_names = [f"stream-{i}" for i in range(streams)]
+        self.batches = batches
+        self.rows_per_batch = rows_per_batch
+        self.read_count = 0
+        self._lock = threading.Lock()
+
+    def read_stream(self, name: str):
+        stream = int(name.rsplit("-", 1)[1])
+        for batch in range(self.batches):
+            start = (stream * self.batches + batch) * self.rows_per_batch
+            ids = list(range(start, start + self.rows_per_batch))
+            record_batch = pyarrow.record_batch(
+                [ids, [f"row-{i}" for i in ids]], schema=SCHEMA
+            )
+            with self._lock:
+                self.read_count += 1
+            yield record_batch.serialize().to_pybytes()
+
+
+@pytest.fixture
+def export_client():
+    """A client exporting a fake table under the name "items"."""
+    session = FakeReadSession(streams=3, batches=4)
+    requested = []
+
+    def settings():
+        return get_test_settings().model_copy(update={
+            "BIGQUERY_EXPORT_TABLES": {"items": "project.dataset.items"},
+        })
+
+    async def opener():
+        def open_session(table, selected_fields):
+            requested.append((table, selected_fields))
+            return session
+        return open_session
+
+    app = create_app()
+    app.dependency_overrides[get_settings] = settings
+    app.dependency_overrides[bigquery.get_read_session_opener] = opener
+    app.dependency_overrides[bigquery.get_table_version_loader] = (
+        lambda: lambda table: "2025-01-01T00:00:00+00:00/36"
+    )
+    with TestClient(app) as client:
+        client.headers["Authentication"] = "test-static-api-token"
+        yield client, requested
+
+
+def test_export_streams_arrow_ipc(export_client):
+    """Test that all streams are forwarded as one Arrow IPC stream."""
+    client, requested = export_client
+    response = client.get(
+        "/exports/tables/items?fields=id,name",
+        headers={"Accept": bigquery.MEDIA_TYPES["arrow"]},
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == bigquery.MEDIA_TYPES["arrow"]
+    table = pyarrow.ipc.open_stream(response.content).read_all()
+    assert table.schema == SCHEMA
+    assert sorted(table.column("id").to_pylist()) == list(range(36))
+    assert requested == [("project.dataset.items", ["id", "name"])]
+
+
+def test_export_falls_back_to_json(export_client):
+    """Test the JSON array default and the NDJSON format."""
+    client, _ = export_client
+    array = client.get("/exports/tables/items")
+    ndjson = client.get("/exports/tables/items?format=ndjson")
+
+    assert array.headers["content-type"] == "application/json"
+    rows = array.json()
+    assert len(rows) == 36
+    assert {"id": 0, "name": "row-0"} in rows
+
+    lines = ndjson.text.splitlines()
+    assert len(lines) == 36
+    assert sorted(json.loads(line)["id"] for line in lines) == list(range(36))
+
+
+def test_export_rejects_unknown_tables_and_tokens(export_client):
+    """Test the 404, 406 and 401 responses."""
+    client, requested = export_client
+    assert client.get("/exports/tables/missing").status_code == 404
+    assert client.get("/exports/tables/items?format=xml").status_code == 406
+    unauthorized = client.get(
+        "/exports/tables/items", headers={"Authentication": "wrong"}
+    )
+    assert unauthorized.status_code == 401
+    assert requested == []
+
+
+def test_abandoned_export_stops_readers():
+    """Test that readers stop pulling batches once the client is gone."""
+    session = FakeReadSession(streams=2, batches=1000)
+
+    async def abandon():
+        stream = bigquery.stream_session(session, "arrow", buffered_batches=2)
+        schema = await stream.__anext__()
+        await stream.__anext__()
+        await stream.aclose()
+        await asyncio.sleep(0.3)  # Let the readers notice
+        return schema
+
+    assert asyncio.run(abandon()) == session.serialized_schema
+    assert session.read_count < 10
+
+
+def test_export_revalidates_without_reading_the_table(export_client):
+    """Test that a current ETag gets a 304 before any session opens."""
+    client, requested = export_client
+    response = client.get("/exports/tables/items?format=ndjson")
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert etag.startswith('W/"')
+    assert response.headers["cache-control"] == "private, no-cache"
+    assert len(requested) == 1
+
+    revalidated = client.get(
+        "/exports/tables/items?format=ndjson",
+        headers={"If-None-Match": etag},
+    )
+    assert revalidated.status_code == 304
+    assert revalidated.headers["etag"] == etag
+    assert len(requested) == 1
+
+    other_format = client.get(
+        "/exports/tables/items?format=json",
+        headers={"If-None-Match": etag},
+    )
+    assert other_format.status_code == 200
@@ -0,0 +1,159 @@
+"""
+Unit tests for the negotiated compression middleware.
+"""
+import asyncio
+import gzip
+import zlib
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.testclient import TestClient
+
+from rest_fastapi.middleware.compression import (
+    ENCODERS,
+    CompressionMiddleware,
+    available_levels,
+    negotiate,
+)
+from tests.conftest import get_test_settings
+
+BODY = "".join(f"line {i}, the same words again\n" for i in range(2000))
+
+
+def make_client(**overrides) -> TestClient:
+    """Build an app with a few routes behind the middleware."""
+    settings = get_test_settings().model_copy(update=overrides)
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, settings=settings)
+
+    @app.get("/text")
+    async def text():
+        return PlainTextResponse(BODY, headers={"ETag": '"v1"'})
+
+    @app.get("/small")
+    async def small():
+        return PlainTextResponse("tiny")
+
+    @app.get("/stream")
+    async def stream():
+        return StreamingResponse(iter([BODY, BODY]), media_type="text/csv")
+
+    @app.get("/image")
+    async def image():
+        return PlainTextResponse(BODY, media_type="image/png")
+
+    return TestClient(app)
+
+
+def test_negotiate_honours_quality_and_preference():
+    """Test q-values, wildcards, refusals and server preference."""
+    offered = ("zstd", "br", "gzip")
+    assert negotiate("gzip, deflate, br, zstd", offered) == "zstd"
+    assert negotiate("gzip;q=1.0, zstd;q=0.5", offered) == "gzip"
+    assert negotiate("*;q=0.1, gzip;q=0", ("gzip", "br")) == "br"
+    assert negotiate("gzip;q=0", offered) is None
+    assert negotiate("", offered) is None
+    assert negotiate("identity", offered) is None
+
+
+def test_levels_are_checked_up_front():
+    """Test that unknown codecs and bad levels fail at configuration."""
+    assert available_levels({"gzip": 1}) == {"gzip": 1}
+    with pytest.raises(ValueError):
+        available_levels({"lzma": 1})
+    with pytest.raises(ValueError):
+        available_levels({"gzip": 42})
+
+
+def test_large_responses_are_compressed():
+    """Test a one-message response, its length and validators."""
+    client = make_client()
+    response = client.get("/text", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert response.headers["ETag"] == 'W/"v1"'
+    assert int(response.headers["Content-Length"]) < len(BODY) / 10
+    assert response.text == BODY
+
+
+def test_small_and_incompressible_responses_are_left_alone():
+    """Test the size threshold, media types and refused encodings."""
+    client = make_client()
+    small = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in small.headers
+    assert small.headers["Vary"] == "Accept-Encoding"
+    image = client.get("/image", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in image.headers
+    identity = client.get("/text", headers={"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in identity.headers
+    assert identity.text == BODY
+
+
+def test_streaming_responses_are_compressed_chunk_by_chunk():
+    """Test that every chunk is sent as soon as it is compressed."""
+    async def app(scope, receive, send):
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [(b"content-type", b"application/x-ndjson")],
+        })
+        for _ in range(3):
+            await send({
+                "type": "http.response.body",
+                "body": BODY.encode(),
+                "more_body": True,
+            })
+        await send({"type": "http.response.body", "body": b""})
+
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    middleware = CompressionMiddleware(app, settings=get_test_settings())
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "headers": [(b"accept-encoding", b"gzip")],
+    }
+    asyncio.run(middleware(scope, None, send))
+
+    start, *bodies = messages
+    assert (b"content-encoding", b"gzip") in start["headers"]
+    assert len(bodies) == 4
+    decoder = zlib.decompressobj(31)
+    # The first chunk decodes before the stream has ended
+    assert decoder.decompress(bodies[0]["body"]).decode() == BODY
+    assert gzip.decompress(
+        b"".join(message["body"] for message in bodies)
+    ).decode() == BODY * 3
+
+
+def test_route_levels_override_the_defaults():
+    """Test per-route codecs, including disabling compression."""
+    client = make_client(COMPRESSION_ROUTE_LEVELS={
+        "/text": {},
+        "/stream": {"gzip": 1},
+    })
+    text = client.get("/text", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in text.headers
+    stream = client.get(
+        "/stream", headers={"Accept-Encoding": "zstd, br, gzip"}
+    )
+    assert stream.headers["Content-Encoding"] == "gzip"
+
+
+@pytest.mark.skipif("zstd" not in ENCODERS, reason="zstd not installed")
+def test_zstd_is_preferred_when_available():
+    """Test that zstd wins when the client accepts it."""
+    from rest_fastapi.middleware.compression import zstd
+
+    client = make_client()
+    with client.stream(
+        "GET", "/text", headers={"Accept-Encoding": "gzip, zstd"}
+    ) as response:
+        assert response.headers["Content-Encoding"] == "zstd"
+        raw = b"".join(response.iter_raw())
+    assert zstd.decompress(raw).decode() == BODY
@@ -0,0 +1,79 @@
+"""
+Unit tests for conditional GET support.
+"""
+from typing import Annotated
+
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from rest_fastapi.core.conditional import (
+    Validators,
+    cache_control,
+    conditional_get,
+    etag_matches,
+    make_etag,
+)
+from rest_fastapi.core.config import get_settings
+from tests.conftest import get_test_settings
+
+
+def test_etags_and_matching():
+    """Test tag formats and the weak comparison of If-None-Match."""
+    etag = make_etag(("2025-01-01", "json"))
+    assert etag.startswith('"') and etag == make_etag(("2025-01-01", "json"))
+    assert make_etag(("2025-01-02", "json")) != etag
+    assert make_etag(1, weak=True).startswith('W/"')
+
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", W/{etag}', etag)
+    assert etag_matches(etag, "W/" + etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('"other"', etag)
+
+    assert cache_control(0) == "private, no-cache"
+    assert cache_control(60, public=True) == "public, max-age=60"
+
+
+def test_matching_requests_skip_the_handler():
+    """Test that a current ETag is answered before the handler runs."""
+    state = {"version": 1, "calls": 0}
+    app = FastAPI()
+    app.dependency_overrides[get_settings] = get_test_settings
+
+    @app.get("/items")
+    async def items(
+        validators: Annotated[Validators, Depends(conditional_get(
+            lambda: state["version"], max_age=30
+        ))],
+    ):
+        state["calls"] += 1
+        return {"version": state["version"]}
+
+    client = TestClient(app)
+    response = client.get("/items")
+    etag = response.headers["etag"]
+    assert response.headers["cache-control"] == "private, max-age=30"
+    assert state["calls"] == 1
+
+    revalidated = client.get("/items", headers={"If-None-Match": etag})
+    assert revalidated.status_code == 304
+    assert revalidated.content == b""
+    assert revalidated.headers["etag"] == etag
+    assert state["calls"] == 1
+
+    state["version"] = 2
+    changed = client.get("/items", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.json() == {"version": 2}
+    assert changed.headers["etag"] != etag
+
+
+def test_public_route_is_cacheable(client: TestClient):
+    """Test the validators of a constant public route."""
+    response = client.get("/examples/public/unprotected")
+    assert response.headers["cache-control"] == "public, max-age=300"
+    revalidated = client.get(
+        "/examples/public/unprotected",
+        headers={"If-None-Match": response.headers["etag"]},
+    )
+    assert revalidated.status_code == 304
@@ -0,0 +1,167 @@
+"""
+Unit tests for the DB-API connection pool, using sqlite3 as the driver.
+"""
+import asyncio
+import sqlite3
+
+import pytest
+
+from rest_fastapi.db.pool import ConnectionPool, PoolClosed, PoolTimeout
+
+
+def make_pool(tmp_path, **overrides) -> ConnectionPool:
+    """Build a pool of sqlite3 connections to a temporary database."""
+    database = str(tmp_path / "test.db")
+
+    def connect():
+        return sqlite3.connect(database, check_same_thread=False)
+
+    options = dict(
+        min_size=1,
+        max_size=2,
+        acquire_timeout=1.0,
+        max_lifetime=60.0,
+        health_check_after=30.0,
+        maintenance_interval=60.0,
+    )
+    options.update(overrides)
+    return ConnectionPool(connect, **options)
+
+
+def test_pool_runs_queries_and_reuses_connections(tmp_path):
+    """Test that queries run and connections go back to the pool."""
+    pool = make_pool(tmp_path)
+
+    async def scenario():
+        await pool.open()
+        async with pool.acquire() as conn:
+            await conn.execute("CREATE TABLE t (x INTEGER)")
+            await conn.execute("INSERT INTO t VALUES (?)", (42,))
+        async with pool.acquire() as conn:
+            rows = await conn.fetchall("SELECT x FROM t")
+        stats = pool.stats()
+        await pool.close()
+        return rows, stats
+
+    rows, stats = asyncio.run(scenario())
+    assert rows == [(42,)]
+    assert stats["opened"] == 1
+    assert stats["acquired"] == 2
+    assert stats["idle"] == 1
+
+
+def test_pool_acquire_times_out_when_exhausted(tmp_path):
+    """Test that waiting beyond the acquire timeout raises PoolTimeout."""
+    pool = make_pool(tmp_path, max_size=1, acquire_timeout=0.05)
+
+    async def scenario():
+        await pool.open()
+        try:
+            async with pool.acquire():
+                with pytest.raises(PoolTimeout):
+                    async with pool.acquire():
+                        pass
+        finally:
+            await pool.close()
+
+    asyncio.run(scenario())
+    assert pool.stats()["timeouts"] == 1
+
+
+def test_pool_replaces_connections_past_max_lifetime(tmp_path):
+    """Test that old connections are recycled instead of reused."""
+    pool = make_pool(tmp_path, max_lifetime=0.0)
+
+    async def scenario():
+        await pool.open()
+        for _ in range(3):
+            async with pool.acquire() as conn:
+                await conn.fetchall("SELECT 1")
+        await pool.close()
+
+    asyncio.run(scenario())
+    assert pool.stats()["opened"] >= 3
+
+
+def test_pool_discards_unhealthy_idle_connections(tmp_path):
+    """Test that an idle connection failing its ping is replaced."""
+    pool = make_pool(tmp_path, health_check_after=0.0)
+
+    async def scenario():
+        await pool.open()
+        pool._idle[0].raw.close()  # Simulate a dropped server connection
+        async with pool.acquire() as conn:
+            rows = await conn.fetchall("SELECT 1")
+        await pool.close()
+        return rows
+
+    assert asyncio.run(scenario()) == [(1,)]
+    assert pool.stats()["opened"] == 2
+
+
+def test_pool_discards_connection_after_error(tmp_path):
+    """Test that a connection is not reused after a failed call."""
+    pool = make_pool(tmp_path)
+
+    async def scenario():
+        await pool.open()
+        with pytest.raises(sqlite3.OperationalError):
+            async with pool.acquire() as conn:
+                await conn.fetchall("SELECT * FROM missing_table")
+        stats = pool.stats()
+        await pool.close()
+        with pytest.raises(PoolClosed):
+            async with pool.acquire():
+                pass
+        return stats
+
+    stats = asyncio.run(scenario())
+    assert stats["closed"] == 1
+    assert stats["size"] == 0
+
+
+def test_pool_close_waits_for_checked_out_connections(tmp_path):
+    """Test that a connection released after close() is still closed."""
+    pool = make_pool(tmp_path)
+
+    async def scenario():
+        await pool.open()
+        async with pool.acquire() as conn:
+            await pool.close()
+            rows = await conn.fetchall("SELECT 1")
+            raw = conn._entry.raw
+        return rows, raw
+
+    rows, raw = asyncio.run(scenario())
+    assert rows == [(1,)]
+    with pytest.raises(sqlite3.ProgrammingError):
+        raw.execute("SELECT 1")  # Closed on release
+    assert pool.stats()["size"] == 0
+    assert pool._executor._shutdown
+
+
+def test_pool_maintenance_survives_concurrent_checkouts(tmp_path):
+    """Test recycling idle connections that a checkout takes meanwhile."""
+    pool = make_pool(tmp_path, min_size=2, max_lifetime=0.0)
+
+    async def scenario():
+        await pool.open()
+        discard = pool._discard
+
+        async def slow_discard(entry, reason):
+            # A checkout takes the other expired connection meanwhile
+            while pool._idle:
+                pool._idle.pop()
+                pool._idle_gauge.dec()
+                pool._size -= 1
+            await discard(entry, reason)
+
+        pool._discard = slow_discard
+        await pool._recycle()
+        pool._discard = discard
+        stats = pool.stats()
+        await pool.close()
+        return stats
+
+    stats = asyncio.run(scenario())
+    assert stats["idle"] == 0 and stats["closed"] == 1
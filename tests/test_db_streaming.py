@@ -0,0 +1,127 @@
+"""
+Unit tests for streaming query results, using sqlite3 as the driver.
+"""
+import asyncio
+import json
+import sqlite3
+import tracemalloc
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from rest_fastapi.core import config
+from rest_fastapi.db.pool import ConnectionPool
+from rest_fastapi.db.streaming import (
+    negotiate_format,
+    query_response,
+    stream_query,
+)
+from tests.conftest import get_test_settings
+
+
+def make_pool(tmp_path, rows: int) -> ConnectionPool:
+    """Build a pool over a sqlite3 database with `rows` rows."""
+    database = str(tmp_path / "stream.db")
+    with sqlite3.connect(database) as connection:
+        connection.execute("CREATE TABLE items (id INTEGER, name TEXT)")
+        connection.executemany(
+            "INSERT INTO items VALUES (?, ?)",
+            ((i, f"item-{i}") for i in range(rows)),
+        )
+
+    def connect():
+        return sqlite3.connect(database, check_same_thread=False)
+
+    return ConnectionPool(
+        connect,
+        min_size=0,
+        max_size=2,
+        acquire_timeout=1.0,
+        max_lifetime=60.0,
+        health_check_after=30.0,
+        maintenance_interval=60.0,
+    )
+
+
+def test_streaming_endpoint_formats(tmp_path):
+    """Test NDJSON and CSV output through a streaming endpoint."""
+    pool = make_pool(tmp_path, rows=5)
+    app = FastAPI()
+
+    @app.get("/items")
+    async def export(request: Request):
+        return query_response(
+            pool,
+            "SELECT id, name FROM items ORDER BY id",
+            fmt=negotiate_format(request),
+            batch_size=2,
+        )
+
+    with TestClient(app) as client:
+        ndjson = client.get("/items")
+        csv_response = client.get("/items", headers={"Accept": "text/csv"})
+        unsupported = client.get("/items?format=xml")
+
+    assert ndjson.headers["content-type"] == "application/x-ndjson"
+    lines = ndjson.text.splitlines()
+    assert len(lines) == 5
+    assert json.loads(lines[1]) == {"id": 1, "name": "item-1"}
+
+    assert csv_response.headers["content-type"].startswith("text/csv")
+    assert csv_response.text.splitlines()[:2] == ["id,name", "0,item-0"]
+    assert unsupported.status_code == 406
+
+
+def test_streaming_memory_stays_flat(tmp_path):
+    """Test that peak memory is bounded by the batch, not the result."""
+    pool = make_pool(tmp_path, rows=100_000)
+
+    async def consume() -> tuple[int, int]:
+        total = 0
+        tracemalloc.start()
+        try:
+            async for chunk in stream_query(
+                pool, "SELECT id, name FROM items", batch_size=500
+            ):
+                total += len(chunk)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return total, peak
+
+    total, peak = asyncio.run(consume())
+    assert total > 2_500_000
+    assert peak < total / 10
+
+
+def test_abandoned_stream_releases_connection(tmp_path):
+    """Test that a stream closed early cancels and frees its connection."""
+    pool = make_pool(tmp_path, rows=10_000)
+
+    async def abandon():
+        stream = stream_query(pool, "SELECT * FROM items", batch_size=10)
+        first = await stream.__anext__()
+        await stream.aclose()
+        return first
+
+    first = asyncio.run(abandon())
+    assert first.count(b"\n") == 10
+    stats = pool.stats()
+    assert stats["in_use"] == 0
+    assert stats["closed"] == 1  # Discarded rather than reused
+
+
+def test_streaming_batches_default_to_the_setting(tmp_path, monkeypatch):
+    """Test that the batch size comes from DB_STREAM_BATCH_SIZE."""
+    pool = make_pool(tmp_path, rows=5)
+    settings = get_test_settings().model_copy(
+        update={"DB_STREAM_BATCH_SIZE": 2}
+    )
+    monkeypatch.setattr(config, "current_settings", lambda: settings)
+
+    async def consume():
+        response = query_response(pool, "SELECT id FROM items ORDER BY id")
+        return [chunk async for chunk in response.body_iterator]
+
+    chunks = asyncio.run(consume())
+    assert [chunk.count(b"\n") for chunk in chunks] == [2, 2, 1]
@@ -0,0 +1,253 @@
+"""
+Unit tests for background jobs, with a fake clock and fake sources.
+"""
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from rest_fastapi.app import create_app
+from rest_fastapi.core.config import get_settings
+from rest_fastapi.jobs.runner import JobRunner
+from rest_fastapi.jobs.store import JobStore
+from rest_fastapi.security.api_keys import (
+    APIKey,
+    api_key_store,
+    hash_api_key,
+)
+from rest_fastapi.security.scopes import SCOPE_BITS
+from tests.conftest import get_test_settings
+
+RESULT = b"".join(b'{"id": %d}\n' % i for i in range(1000))
+
+
+class FakeClock:
+    """A clock moved by hand."""
+
+    def __init__(self):
+        self.now = 1_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def store(tmp_path):
+    """A job store on a fake clock."""
+    clock = FakeClock()
+    store = JobStore(str(tmp_path / "jobs.sqlite3"), clock=clock)
+    yield store, clock
+    store.close()
+
+
+def submit(store: JobStore, principal: str, max_pending: int = 10):
+    """Queue a table job for `principal`."""
+    return store.submit(principal, "table", "items", "ndjson", None,
+                        max_pending)
+
+
+def test_claims_respect_the_limit_per_principal(store):
+    """Test that a principal's second job waits for its first."""
+    store, clock = store
+    first = submit(store, "key:a")
+    clock.now += 1
+    second = submit(store, "key:a")
+    clock.now += 1
+    other = submit(store, "key:b")
+    assert submit(store, "key:a", max_pending=2) is None
+
+    assert store.claim("w1", 30, 1, 3).id == first.id
+    assert store.claim("w2", 30, 1, 3).id == other.id
+    assert store.claim("w2", 30, 1, 3) is None
+
+    assert store.finish(first.id, "w1", 42)
+    job = store.claim("w1", 30, 1, 3)
+    assert job.id == second.id and job.state == "running"
+    assert store.get(first.id).size == 42
+
+
+def test_expired_leases_are_retried_then_failed(store):
+    """Test recovery from dead workers, and the attempt limit."""
+    store, clock = store
+    job = submit(store, "key:a")
+    for attempt in range(1, 3):
+        claimed = store.claim(f"w{attempt}", 30, 1, 2)
+        assert claimed.id == job.id and claimed.attempts == attempt
+        assert store.claim("other", 30, 1, 2) is None
+        clock.now += 31  # The worker died
+
+    assert store.claim("w3", 30, 1, 2) is None
+    failed = store.get(job.id)
+    assert failed.state == "failed" and failed.error
+    # The dead worker cannot record a result any more
+    assert not store.finish(job.id, "w2", 1)
+
+
+def test_release_cancel_and_purge(store):
+    """Test shutdown release, cancellation and expiry of ended jobs."""
+    store, clock = store
+    job = submit(store, "key:a")
+    store.claim("w1", 30, 1, 3)
+    assert store.release("w1") == 1
+    requeued = store.get(job.id)
+    assert requeued.state == "queued" and requeued.attempts == 0
+
+    store.claim("w2", 30, 1, 3)
+    assert store.cancel(job.id, "key:b") is None
+    assert store.cancel(job.id, "key:a").state == "cancelled"
+    assert not store.renew(job.id, "w2", 30)
+
+    clock.now += 100
+    assert store.purge(200) == []
+    clock.now += 101
+    assert store.purge(200) == [(job.id, "ndjson")]
+    assert store.get(job.id) is None
+
+
+@pytest.fixture
+def jobs_client(tmp_path):
+    """A client running jobs whose table source serves `RESULT`."""
+    gate = threading.Event()
+    gate.set()
+
+    async def fake_source(job):
+        for start in range(0, len(RESULT), 4096):
+            while not gate.is_set():
+                await asyncio.sleep(0.01)
+            yield RESULT[start:start + 4096]
+
+    settings = get_test_settings().model_copy(update={
+        "BIGQUERY_EXPORT_TABLES": {"items": "project.dataset.items"},
+        "JOBS_MAX_PENDING": 2,
+    })
+    app = create_app()
+    app.dependency_overrides[get_settings] = lambda: settings
+    runner = JobRunner(
+        JobStore(str(tmp_path / "jobs.sqlite3")),
+        {"table": fake_source},
+        str(tmp_path / "spool"),
+        lease=0.3,
+        poll_interval=0.05,
+    )
+    with TestClient(app) as client:
+        client.portal.call(runner.start)
+        app.state.jobs = runner
+        client.headers["Authentication"] = "test-static-api-token"
+        try:
+            yield client, runner, gate
+        finally:
+            gate.set()
+            client.portal.call(runner.stop)
+
+
+def wait_for(client: TestClient, url: str, state: str) -> dict:
+    """Poll a job until it reaches `state`, for 5 seconds at most."""
+    deadline = time.monotonic() + 5
+    while True:
+        job = client.get(url).json()
+        if job["state"] == state or time.monotonic() > deadline:
+            return job
+        time.sleep(0.02)
+
+
+def test_job_result_is_spooled_and_served_in_ranges(jobs_client):
+    """Test submitting, polling and downloading a job's result."""
+    client, runner, _ = jobs_client
+    submitted = client.post(
+        "/jobs", json={"kind": "table", "name": "items", "format": "ndjson"}
+    )
+    assert submitted.status_code == 202
+    job = wait_for(client, submitted.headers["Location"], "succeeded")
+    assert job["state"] == "succeeded" and job["size"] == len(RESULT)
+
+    full = client.get(job["result_url"])
+    assert full.content == RESULT
+    assert full.headers["content-type"] == "application/x-ndjson"
+    assert "content-encoding" not in full.headers
+    part = client.get(job["result_url"], headers={"Range": "bytes=10-99"})
+    assert part.status_code == 206
+    assert part.content == RESULT[10:100]
+
+
+def test_job_requests_are_checked(jobs_client, tmp_path):
+    """Test the 404, 422, 429 and 403 responses."""
+    client, runner, gate = jobs_client
+    assert client.post(
+        "/jobs", json={"kind": "table", "name": "missing"}
+    ).status_code == 404
+    assert client.post(
+        "/jobs", json={"kind": "table", "name": "items", "format": "csv"}
+    ).status_code == 422
+    assert client.get("/jobs/" + "0" * 24).status_code == 404
+
+    gate.clear()  # Keep the jobs pending
+    body = {"kind": "table", "name": "items"}
+    urls = [client.post("/jobs", json=body).headers["Location"]
+            for _ in range(2)]
+    assert client.post("/jobs", json=body).status_code == 429
+    assert client.get(urls[0] + "/result").status_code == 409
+
+    api_key_store.replace_file_keys([
+        APIKey(name, hash_api_key(name), frozenset({scope}), {},
+               SCOPE_BITS[scope])
+        for name, scope in (("reader", "exports:read"), ("other", "jobs:run"))
+    ])
+    try:
+        assert client.post("/jobs", json=body, headers={
+            "Authentication": "reader"
+        }).status_code == 403
+        assert client.get(urls[0], headers={
+            "Authentication": "other"
+        }).status_code == 404
+    finally:
+        api_key_store.clear()
+
+
+def test_running_job_is_cancelled(jobs_client):
+    """Test that cancelling a running job stops its worker."""
+    client, runner, gate = jobs_client
+    gate.clear()
+    url = client.post(
+        "/jobs", json={"kind": "table", "name": "items"}
+    ).headers["Location"]
+    assert wait_for(client, url, "running")["state"] == "running"
+
+    assert client.delete(url).status_code == 204
+    assert client.get(url).json()["state"] == "cancelled"
+    deadline = time.monotonic() + 5
+    while os.listdir(runner.spool_dir) and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert not os.listdir(runner.spool_dir)
+
+
+def test_workers_survive_failed_claims(tmp_path):
+    """Test that a worker retries after the store fails to claim."""
+    store = JobStore(str(tmp_path / "jobs.sqlite3"))
+    claim = store.claim
+    calls = []
+
+    def flaky_claim(*args):
+        calls.append(args)
+        if len(calls) == 1:
+            raise sqlite3.OperationalError("database is locked")
+        return claim(*args)
+
+    store.claim = flaky_claim
+    runner = JobRunner(store, {}, str(tmp_path / "spool"), workers=1,
+                       poll_interval=0.01)
+
+    async def scenario():
+        await runner.start()
+        try:
+            deadline = time.monotonic() + 5
+            while len(calls) < 2 and time.monotonic() < deadline:
+                await asyncio.sleep(0.01)
+            return [task.done() for task in runner._tasks]
+        finally:
+            await runner.stop()
+
+    assert asyncio.run(scenario()) == [False, False]
@@ -0,0 +1,100 @@
+"""
+Unit tests for the verified-JWT cache.
+"""
+from fastapi.testclient import TestClient
+
+from rest_fastapi.security import auth
+from rest_fastapi.security.cache import TokenCache
+from rest_fastapi.security.schemas import TokenData
+from tests.conftest import get_test_settings
+
+
+class FakeClock:
+    """Manually advanced clock for deterministic expiry tests."""
+
+    def __init__(self, now: float = 1_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_cache_hit_and_miss_stats():
+    """Test that lookups are counted as hits and misses."""
+    cache = TokenCache(max_size=10, ttl=60, clock=FakeClock())
+    key = cache.make_key("token", "secret", "HS256")
+
+    assert cache.get(key) is None
+    cache.put(key, TokenData(username="testuser"))
+    assert cache.get(key).username == "testuser"
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_ratio"] == 0.5
+
+
+def test_cache_key_depends_on_secret():
+    """Test that a token verified under another key does not hit."""
+    key_a = TokenCache.make_key("token", "secret-a", "HS256")
+    key_b = TokenCache.make_key("token", "secret-b", "HS256")
+    assert key_a != key_b
+
+
+def test_cache_entry_never_outlives_token_exp():
+    """Test that entries expire at the token's exp, even within the TTL."""
+    clock = FakeClock()
+    cache = TokenCache(max_size=10, ttl=300, clock=clock)
+    key = cache.make_key("token", "secret", "HS256")
+    cache.put(key, TokenData(username="testuser"), exp=clock.now + 5)
+
+    clock.now += 4
+    assert cache.get(key) is not None
+    clock.now += 1
+    assert cache.get(key) is None
+
+
+def test_cache_entry_expires_after_ttl():
+    """Test that entries expire after the TTL, even if exp is later."""
+    clock = FakeClock()
+    cache = TokenCache(max_size=10, ttl=30, clock=clock)
+    key = cache.make_key("token", "secret", "HS256")
+    cache.put(key, TokenData(username="testuser"), exp=clock.now + 3600)
+
+    clock.now += 30
+    assert cache.get(key) is None
+
+
+def test_cache_evicts_least_recently_used():
+    """Test that the least recently used entry is evicted when full."""
+    cache = TokenCache(max_size=2, ttl=60, clock=FakeClock())
+    keys = [cache.make_key(f"token-{i}", "secret", "HS256") for i in range(3)]
+
+    cache.put(keys[0], TokenData(username="a"))
+    cache.put(keys[1], TokenData(username="b"))
+    cache.get(keys[0])  # Mark "a" as recently used
+    cache.put(keys[2], TokenData(username="c"))
+
+    assert cache.get(keys[0]) is not None
+    assert cache.get(keys[1]) is None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_auth_jwt_uses_cache_for_repeat_tokens(client: TestClient):
+    """Test that a repeated token is served from the cache."""
+    response = client.post(
+        "/login/token",
+        data={"username": "testuser", "password": "testpassword"},
+    )
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    cache = auth.get_jwt_cache(get_test_settings())
+    cache.clear()
+    for _ in range(3):
+        response = client.get("/examples/protected/jwt-only", headers=headers)
+        assert response.status_code == 200
+
+    stats = cache.stats()
+    # The rate limiter verifies the token first, then the route hits
+    assert stats["misses"] == 1
+    assert stats["hits"] == 5
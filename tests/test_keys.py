@@ -0,0 +1,191 @@
+"""
+Unit tests for the JWT key ring, the JWK Set and settings reloading.
+"""
+import os
+from datetime import timedelta
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from jose import jwt
+from pydantic import ValidationError
+
+from rest_fastapi.core import config
+from rest_fastapi.core.config import JWTKeyConfig, Settings, get_settings
+from rest_fastapi.security import auth
+from rest_fastapi.security.keys import EdDSAKey, derive_kid
+from tests.conftest import get_test_settings
+
+PRIVATE_KEYS = {
+    "RS256": lambda: rsa.generate_private_key(65537, 2048),
+    "ES256": lambda: ec.generate_private_key(ec.SECP256R1()),
+    "EdDSA": ed25519.Ed25519PrivateKey.generate,
+}
+
+
+def pem_pair(algorithm: str) -> tuple[str, str]:
+    """Generate a private and public PEM key for an algorithm."""
+    private = PRIVATE_KEYS[algorithm]()
+    private_pem = private.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    public_pem = private.public_key().public_bytes(
+        serialization.Encoding.PEM,
+        serialization.PublicFormat.SubjectPublicKeyInfo,
+    )
+    return private_pem.decode(), public_pem.decode()
+
+
+def settings_with_keys(keys: dict, active=None) -> Settings:
+    """Return test settings with extra JWT keys."""
+    return get_test_settings().model_copy(
+        update={"JWT_KEYS": keys, "JWT_ACTIVE_KID": active}
+    )
+
+
+def make_token(settings: Settings) -> str:
+    """Issue a short-lived token for the test user."""
+    return auth.create_access_token(
+        {"sub": "testuser"}, settings, expires_delta=timedelta(minutes=5)
+    )
+
+
+def test_tokens_carry_the_active_kid():
+    """Test that new tokens name the key that signed them."""
+    default = get_test_settings()
+    rotated = settings_with_keys({"2025-06": "new-secret"}, "2025-06")
+
+    assert jwt.get_unverified_header(make_token(default))["kid"] == (
+        derive_kid(default.SECRET_KEY)
+    )
+    assert jwt.get_unverified_header(make_token(rotated))["kid"] == "2025-06"
+
+
+def test_old_and_new_keys_verify_during_rotation():
+    """Test the add, activate and retire steps of a key rotation."""
+    before = settings_with_keys({"old": "old-secret"}, "old")
+    during = settings_with_keys(
+        {"old": "old-secret", "new": "new-secret"}, "new"
+    )
+    after = settings_with_keys({"new": "new-secret"}, "new")
+    old_token, new_token = make_token(before), make_token(during)
+
+    assert auth.verify_jwt(old_token, during).username == "testuser"
+    assert auth.verify_jwt(new_token, during).username == "testuser"
+    assert auth.verify_jwt(new_token, after).username == "testuser"
+    with pytest.raises(HTTPException) as exc_info:
+        auth.verify_jwt(old_token, after)  # Not even from the cache
+    assert exc_info.value.status_code == 401
+
+
+def test_tokens_without_kid_use_secret_key():
+    """Test that tokens issued before kids existed still verify."""
+    settings = settings_with_keys({"new": "new-secret"}, "new")
+    legacy = jwt.encode(
+        {"sub": "testuser"}, settings.SECRET_KEY, algorithm="HS256"
+    )
+    unknown = jwt.encode(
+        {"sub": "testuser"}, "new-secret", algorithm="HS256",
+        headers={"kid": "missing"},
+    )
+    assert auth.verify_jwt(legacy, settings).username == "testuser"
+    with pytest.raises(HTTPException):
+        auth.verify_jwt(unknown, settings)
+
+
+@pytest.mark.parametrize("algorithm", sorted(PRIVATE_KEYS))
+def test_asymmetric_keys_sign_and_verify(algorithm):
+    """Test signing with a private key and verifying with its public key."""
+    private_pem, public_pem = pem_pair(algorithm)
+    signer = settings_with_keys(
+        {"asym": JWTKeyConfig(algorithm=algorithm, key=private_pem)}, "asym"
+    )
+    verifier = settings_with_keys(
+        {"asym": JWTKeyConfig(algorithm=algorithm, key=public_pem)}
+    )
+    token = make_token(signer)
+
+    assert jwt.get_unverified_header(token)["alg"] == algorithm
+    assert auth.verify_jwt(token, signer).username == "testuser"
+    assert auth.verify_jwt(token, verifier).username == "testuser"
+    with pytest.raises(ValueError):  # A public key cannot be active
+        make_token(settings_with_keys(
+            {"asym": JWTKeyConfig(algorithm=algorithm, key=public_pem)},
+            "asym",
+        ))
+
+
+def test_jwks_publishes_public_keys_only(client: TestClient, tmp_path):
+    """Test that other services can verify tokens with the JWK Set."""
+    key_file = tmp_path / "ed25519.pem"
+    key_file.write_text(pem_pair("EdDSA")[0])
+    settings = settings_with_keys({
+        "ed": JWTKeyConfig(algorithm="EdDSA", key_file=str(key_file)),
+        "es": JWTKeyConfig(algorithm="ES256", key=pem_pair("ES256")[0]),
+        "hmac": "hmac-secret",
+    }, "ed")
+    client.app.dependency_overrides[get_settings] = lambda: settings
+    try:
+        response = client.get("/.well-known/jwks.json")
+        etag = response.headers["etag"]
+        revalidated = client.get(
+            "/.well-known/jwks.json", headers={"If-None-Match": etag}
+        )
+    finally:
+        client.app.dependency_overrides[get_settings] = get_test_settings
+
+    assert response.headers["cache-control"] == "public, max-age=300"
+    assert revalidated.status_code == 304
+    keys = {key["kid"]: key for key in response.json()["keys"]}
+    assert sorted(keys) == ["ed", "es"]
+    assert all("d" not in key for key in keys.values())
+
+    token = make_token(settings)
+    claims = jwt.decode(
+        token, EdDSAKey(keys["ed"], "EdDSA"), algorithms=["EdDSA"]
+    )
+    assert claims["sub"] == "testuser"
+
+
+def test_active_kid_must_be_configured():
+    """Test that settings naming an unknown active key are rejected."""
+    with pytest.raises(ValidationError):
+        Settings(**{
+            **get_test_settings().model_dump(), "JWT_ACTIVE_KID": "missing"
+        })
+
+
+def test_settings_reload_when_env_file_changes(tmp_path, monkeypatch):
+    """Test reloading, and keeping the old settings on invalid files."""
+    env_file = tmp_path / ".env"
+    monkeypatch.setattr(config, "ENV_FILE", str(env_file))
+    monkeypatch.setattr(config, "settings", config.settings)
+    monkeypatch.setattr(config, "_env_mtime", None)
+    # Environment variables, e.g. set by CI, would win over the file
+    monkeypatch.delenv("ACCESS_TOKEN_EXPIRE_SECONDS", raising=False)
+
+    def write(content: str, mtime: int) -> Settings:
+        env_file.write_text(content)
+        os.utime(env_file, (mtime, mtime))
+        monkeypatch.setattr(config, "_next_check", 0.0)
+        return config.current_settings()
+
+    first = write("ACCESS_TOKEN_EXPIRE_SECONDS=60\n", 1_000)
+    assert first.ACCESS_TOKEN_EXPIRE_SECONDS == 60
+    assert config.current_settings() is first  # Unchanged until next check
+
+    second = write(
+        'JWT_KEYS={"next": "next-secret"}\nJWT_ACTIVE_KID=next\n', 2_000
+    )
+    assert second.JWT_ACTIVE_KID == "next"
+    assert jwt.get_unverified_header(make_token(second))["kid"] == "next"
+
+    invalid = write("JWT_ACTIVE_KID=missing\n", 3_000)
+    assert invalid is second
+    # Fixed within the same second: the file is read again anyway
+    fixed = write("JWT_ACTIVE_KID=\n", 3_000)
+    assert fixed is not second and not fixed.JWT_ACTIVE_KID
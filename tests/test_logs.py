@@ -0,0 +1,115 @@
+"""
+Unit tests for structured logging and the access log.
+"""
+import io
+import json
+import threading
+import time
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from loguru import logger
+
+from rest_fastapi.core.logs import LOG_RECORDS_DROPPED, QueueSink, request_id
+from rest_fastapi.middleware.access_log import AccessLogMiddleware
+from tests.conftest import get_test_settings
+
+
+class StalledStream(io.StringIO):
+    """A stream whose writes wait until it is released."""
+
+    def __init__(self):
+        super().__init__()
+        self.released = threading.Event()
+
+    def write(self, text: str) -> int:
+        self.released.wait()
+        return super().write(text)
+
+
+def test_sink_writes_json_lines_with_the_request_id():
+    """Test the JSON records written by the sink."""
+    stream = io.StringIO()
+    sink = QueueSink(stream, serialize=True, max_size=100)
+    handler = logger.add(sink.write, format="{message}")
+    token = request_id.set("abc123")
+    try:
+        logger.info("exported {rows} rows", rows=3)
+    finally:
+        request_id.reset(token)
+        logger.remove(handler)
+    sink.close()
+    record = json.loads(stream.getvalue())
+    assert record["message"] == "exported 3 rows"
+    assert record["level"] == "INFO"
+    assert record["rows"] == 3
+    assert record["request_id"] == "abc123"
+    assert "pid" in record and "time" in record
+
+
+def test_sink_drops_records_instead_of_blocking():
+    """Test that a stalled stream never blocks the logging thread."""
+    stream = StalledStream()
+    sink = QueueSink(stream, serialize=True, max_size=2)
+    handler = logger.add(sink.write, format="{message}")
+    dropped = LOG_RECORDS_DROPPED._value.get()
+    try:
+        start = time.perf_counter()
+        for index in range(10):
+            logger.info("record {}", index)
+        assert time.perf_counter() - start < 1.0
+    finally:
+        logger.remove(handler)
+        stream.released.set()
+    sink.close()
+    # One record is held by the writer, two by the queue
+    assert LOG_RECORDS_DROPPED._value.get() - dropped >= 7
+    assert len(stream.getvalue().splitlines()) <= 3
+
+
+def test_access_log_samples_successes_but_not_errors():
+    """Test correlation ids and which requests are logged."""
+    settings = get_test_settings().model_copy(update={
+        "ACCESS_LOG_SAMPLE_RATE": 0.0,
+        "ACCESS_LOG_SLOW_SECONDS": 0.05,
+    })
+    app = FastAPI()
+    app.add_middleware(AccessLogMiddleware, settings=settings)
+
+    @app.get("/fast")
+    async def fast():
+        logger.info("handling")
+        return {}
+
+    @app.get("/slow")
+    async def slow():
+        time.sleep(0.06)
+        return {}
+
+    records = []
+    handler = logger.add(
+        lambda message: records.append(message.record),
+        format="{message}",
+        filter=lambda record: record["name"].startswith(
+            ("tests", "rest_fastapi")
+        ),
+    )
+    try:
+        client = TestClient(app)
+        response = client.get("/fast", headers={"X-Request-ID": "req-42"})
+        assert response.headers["X-Request-ID"] == "req-42"
+        generated = client.get("/fast", headers={"X-Request-ID": "bad id!"})
+        assert generated.headers["X-Request-ID"] != "bad id!"
+        client.get("/missing")
+        client.get("/slow")
+    finally:
+        logger.remove(handler)
+
+    # The handler's records carry the request id
+    assert records[0]["message"] == "handling"
+    assert records[0]["extra"]["request_id"] == "req-42"
+    access = [r for r in records if r["message"] != "handling"]
+    assert [r["extra"]["route"] for r in access] == [None, "/slow"]
+    assert access[0]["extra"]["status"] == 404
+    assert access[0]["level"].name == "WARNING"
+    assert access[1]["extra"]["duration_ms"] >= 50
@@ -0,0 +1,41 @@
+"""
+Unit tests for the Prometheus metrics middleware and endpoint.
+"""
+from fastapi.testclient import TestClient
+
+
+def test_metrics_endpoint_exposes_route_latency(client: TestClient):
+    """Test that requests are recorded under their route template."""
+    client.get("/examples/public/unprotected")
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert (
+        'http_request_duration_seconds_count{method="GET",'
+        'route="/examples/public/unprotected",status="200"}'
+    ) in response.text
+    assert "http_response_size_bytes_bucket" in response.text
+    assert 'http_requests_in_progress{method="GET"}' in response.text
+
+
+def test_metrics_count_auth_failures_by_scheme(client: TestClient):
+    """Test that JWT and API key failures are counted separately."""
+    client.get(
+        "/examples/protected/simple-token-only",
+        headers={"Authentication": "wrong-token"},
+    )
+    client.get(
+        "/examples/protected/jwt-only",
+        headers={"Authorization": "Bearer not-a-jwt"},
+    )
+    text = client.get("/metrics").text
+
+    assert (
+        'auth_failures_total{route="/examples/protected/simple-token-only",'
+        'scheme="api_key"}'
+    ) in text
+    assert (
+        'auth_failures_total{route="/examples/protected/jwt-only",'
+        'scheme="jwt"}'
+    ) in text
@@ -0,0 +1,176 @@
+"""
+Unit tests for keyset pagination, using sqlite3 as the driver.
+"""
+import sqlite3
+from datetime import date, datetime, time, timezone
+from decimal import Decimal
+from typing import Annotated
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from rest_fastapi.core.config import Settings, get_settings
+from rest_fastapi.db.pagination import (
+    Keyset,
+    PageRequest,
+    SortKey,
+    get_page_request,
+    read_cursor,
+    sign_cursor,
+)
+from rest_fastapi.db.pool import ConnectionPool
+from tests.conftest import get_test_settings
+
+ITEMS = Keyset(
+    "SELECT id, grp, name FROM items WHERE id <> ?",
+    [SortKey("grp", descending=True), "id"],
+    limit_clause="LIMIT ?",
+)
+
+
+def make_database(tmp_path, rows: int, name: str = "pages.db") -> str:
+    """Create a sqlite3 database of `rows` items in groups of 3."""
+    database = str(tmp_path / name)
+    with sqlite3.connect(database) as connection:
+        connection.execute(
+            "CREATE TABLE items (id INTEGER PRIMARY KEY, grp INTEGER, "
+            "name TEXT)"
+        )
+        connection.execute("CREATE INDEX items_grp ON items (grp, id)")
+        connection.executemany(
+            "INSERT INTO items VALUES (?, ?, ?)",
+            ((i, i // 3, f"item-{i}") for i in range(rows)),
+        )
+    return database
+
+
+def make_client(database: str) -> TestClient:
+    """Serve `ITEMS` at /items, skipping item 4."""
+    pool = ConnectionPool(
+        lambda: sqlite3.connect(database, check_same_thread=False),
+        min_size=0,
+        max_size=2,
+        acquire_timeout=1.0,
+        max_lifetime=60.0,
+        health_check_after=30.0,
+        maintenance_interval=60.0,
+    )
+    settings = get_test_settings().model_copy(update={
+        "PAGINATION_DEFAULT_LIMIT": 7, "DB_STREAM_BATCH_SIZE": 3,
+    })
+    app = FastAPI()
+    app.dependency_overrides[get_settings] = lambda: settings
+
+    @app.get("/items")
+    async def list_items(
+        page: Annotated[PageRequest, Depends(get_page_request)],
+        settings: Annotated[Settings, Depends(get_settings)],
+    ):
+        return ITEMS.response(pool, page, settings, params=(4,))
+
+    return TestClient(app)
+
+
+def test_cursors_are_signed_for_their_query():
+    """Test the round trip and the rejection of altered cursors."""
+    cursor = sign_cursor([7, "b"], "secret", b"items")
+    assert read_cursor(cursor, "secret", b"items") == [7, "b"]
+
+    tag = cursor.split(".")[1]
+    forged = sign_cursor([8, "b"], "secret", b"items").split(".")[0]
+    for bad in (
+        f"{forged}.{tag}",
+        cursor[:-2],
+        "not-a-cursor",
+    ):
+        with pytest.raises(ValueError):
+            read_cursor(bad, "secret", b"items")
+    with pytest.raises(ValueError):
+        read_cursor(cursor, "other-secret", b"items")
+    with pytest.raises(ValueError):
+        read_cursor(cursor, "secret", b"orders")
+
+
+def test_cursors_keep_the_type_of_key_values():
+    """Test that dates and decimals come back typed, not as strings."""
+    values = [
+        datetime(2024, 5, 1, 12, 30, 15, 123456),
+        datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc),
+        date(2024, 5, 1),
+        time(8, 15, 0, 500),
+        Decimal("10.50"),
+        "2024-05-01",
+        None,
+    ]
+    cursor = sign_cursor(values, "secret", b"items")
+    decoded = read_cursor(cursor, "secret", b"items")
+    assert decoded == values
+    assert [type(value) for value in decoded] == [
+        type(value) for value in values
+    ]
+
+    keyset = Keyset("SELECT created_at, id FROM items",
+                    [SortKey("created_at", descending=True), "id"])
+    _, params = keyset.page_query((), decoded[:1] + [3], 10)
+    assert isinstance(params[0], datetime)
+
+    for bad in ({"$datetime": "yesterday"}, {"$money": "1"}, {"a": 1}):
+        with pytest.raises(ValueError):
+            read_cursor(sign_cursor([bad], "secret", b"items"),
+                        "secret", b"items")
+
+
+def test_pages_cover_the_order_without_gaps(tmp_path):
+    """Test walking every page of a mixed-direction order with ties."""
+    client = make_client(make_database(tmp_path, rows=50))
+    expected = sorted(
+        (i for i in range(50) if i != 4), key=lambda i: (-(i // 3), i)
+    )
+
+    seen, cursor, pages = [], None, 0
+    while True:
+        params = {"cursor": cursor} if cursor else {}
+        body = client.get("/items", params=params).json()
+        assert len(body["items"]) <= 7
+        seen.extend(item["id"] for item in body["items"])
+        pages += 1
+        cursor = body["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == expected
+    assert pages == 7
+
+    limited = client.get("/items", params={"limit": 49}).json()
+    assert len(limited["items"]) == 49 and limited["next_cursor"] is None
+
+    empty = make_client(make_database(tmp_path, rows=0, name="empty.db"))
+    assert empty.get("/items").json() == {"items": [], "next_cursor": None}
+
+
+def test_invalid_cursor_is_rejected(tmp_path):
+    """Test that a tampered cursor gets 400 before any row is read."""
+    client = make_client(make_database(tmp_path, rows=10))
+    cursor = client.get("/items").json()["next_cursor"]
+    tampered = cursor[:-1] + ("B" if cursor.endswith("A") else "A")
+    response = client.get("/items", params={"cursor": tampered})
+    assert response.status_code == 400
+    other = sign_cursor([1, 1], get_test_settings().SECRET_KEY, b"other")
+    assert client.get(
+        "/items", params={"cursor": other}
+    ).status_code == 400
+
+
+def test_deep_pages_seek_the_index(tmp_path):
+    """Test that a page after a cursor is an index search, not a scan."""
+    connection = sqlite3.connect(make_database(tmp_path, rows=10))
+    sql, params = ITEMS.page_query((4,), [2, 6], 10)
+    plan = " ".join(
+        row[-1] for row in connection.execute(
+            f"EXPLAIN QUERY PLAN {sql}", params
+        )
+    )
+    assert "SEARCH items USING" in plan
+    assert "SCAN" not in plan
+    with pytest.raises(ValueError):
+        Keyset("SELECT 1", ["id; DROP TABLE items"])
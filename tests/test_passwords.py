@@ -0,0 +1,125 @@
+"""
+Unit tests for hashed password verification and the bounded hasher.
+"""
+import asyncio
+import io
+import time
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+from loguru import logger
+
+from rest_fastapi.core.config import get_settings
+from rest_fastapi.security.passwords import PasswordHasher, hash_password
+from tests.conftest import get_test_settings
+
+
+def make_hasher(**overrides) -> PasswordHasher:
+    """Build a fast hasher for tests."""
+    options = dict(rounds=4, workers=1, queue_limit=4, timeout=5.0)
+    options.update(overrides)
+    return PasswordHasher(**options)
+
+
+def test_verify_bcrypt_hash():
+    """Test that a matching bcrypt hash verifies and is current."""
+    hasher = make_hasher()
+    stored = hash_password("testpassword", 4)
+
+    assert asyncio.run(hasher.verify("testpassword", stored)) == (
+        True, False
+    )
+    assert asyncio.run(hasher.verify("wrong", stored)) == (False, False)
+    hasher.shutdown()
+
+
+def test_plaintext_is_flagged_as_outdated():
+    """Test that legacy plaintext entries are flagged on a match."""
+    hasher = make_hasher()
+    assert asyncio.run(hasher.verify("testpassword", "testpassword")) == (
+        True, True
+    )
+    assert asyncio.run(hasher.verify("wrong", "testpassword")) == (
+        False, False
+    )
+    hasher.shutdown()
+
+
+def test_hash_with_other_cost_is_flagged_as_outdated():
+    """Test that a hash with outdated cost parameters is flagged."""
+    hasher = make_hasher(rounds=5)
+    stored = hash_password("testpassword", 4)
+    assert asyncio.run(hasher.verify("testpassword", stored)) == (
+        True, True
+    )
+    hasher.shutdown()
+
+
+def test_hasher_rejects_work_beyond_queue_limit():
+    """Test that excess concurrent jobs are shed with a 503."""
+    hasher = make_hasher(workers=1, queue_limit=0)
+
+    async def storm():
+        return await asyncio.gather(
+            hasher._submit(time.sleep, 0.2),
+            hasher._submit(time.sleep, 0.2),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(storm())
+    assert results[0] is None
+    assert isinstance(results[1], HTTPException)
+    assert results[1].status_code == 503
+    hasher.shutdown()
+
+
+def test_hasher_times_out():
+    """Test that callers stop waiting after the configured timeout."""
+    hasher = make_hasher(timeout=0.05)
+    with pytest.raises(HTTPException) as exc_info:
+        asyncio.run(hasher._submit(time.sleep, 0.5))
+    assert exc_info.value.status_code == 503
+    hasher.shutdown()
+
+
+def test_login_with_hashed_password(client: TestClient):
+    """Test the login endpoint against a bcrypt-hashed user record."""
+    hashed_settings = get_test_settings()
+    hashed_settings.USER_LOGIN = {
+        "testuser": {"password": hash_password("testpassword", 4)}
+    }
+    client.app.dependency_overrides[get_settings] = lambda: hashed_settings
+
+    ok = client.post(
+        "/login/token",
+        data={"username": "testuser", "password": "testpassword"},
+    )
+    wrong = client.post(
+        "/login/token",
+        data={"username": "testuser", "password": "wrongpassword"},
+    )
+    client.app.dependency_overrides[get_settings] = get_test_settings
+
+    assert ok.status_code == 200
+    assert wrong.status_code == 401
+
+
+def test_login_logs_outdated_passwords(client: TestClient):
+    """Test that a plaintext login is logged and the settings unchanged."""
+    settings = get_test_settings()
+    client.app.dependency_overrides[get_settings] = lambda: settings
+    sink = io.StringIO()
+    handler = logger.add(sink.write, format="{message}")
+    try:
+        response = client.post(
+            "/login/token",
+            data={"username": "testuser", "password": "testpassword"},
+        )
+    finally:
+        logger.remove(handler)
+        client.app.dependency_overrides[get_settings] = get_test_settings
+
+    assert response.status_code == 200
+    assert "'testuser' is plaintext" in sink.getvalue()
+    assert settings.USER_LOGIN["testuser"]["password"] == "testpassword"
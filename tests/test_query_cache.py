@@ -0,0 +1,194 @@
+"""
+Unit tests for the query result cache.
+"""
+import asyncio
+import sqlite3
+
+import pytest
+
+from rest_fastapi.db.cache import QueryCache, cached_fetchall, normalize_sql
+from rest_fastapi.db.pool import ConnectionPool
+
+
+class FakeClock:
+    """A manually advanced clock."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_normalize_sql_keeps_literals():
+    """Test that only layout outside quoted text is normalized."""
+    assert normalize_sql(
+        "SELECT  a,\n  b -- columns\nFROM t /* x */ WHERE s = 'a  b';"
+    ) == "SELECT a, b FROM t WHERE s = 'a  b'"
+    assert QueryCache.make_key("SELECT 1 ") == QueryCache.make_key("SELECT\n1")
+    assert QueryCache.make_key("SELECT ?", (1,)) != QueryCache.make_key(
+        "SELECT ?", ("1",)
+    )
+
+
+def test_cache_expires_and_evicts_by_size():
+    """Test TTL expiry and least-recently-used eviction by bytes."""
+    clock = FakeClock()
+    cache = QueryCache(max_bytes=10, ttl=5.0, sizeof=len, clock=clock)
+
+    async def load(value):
+        return value
+
+    async def scenario():
+        await cache.get_or_load("a", lambda: load("aaaa"))
+        await cache.get_or_load("b", lambda: load("bbbb"))
+        await cache.get_or_load("a", lambda: load("unused"))  # a is recent
+        await cache.get_or_load("c", lambda: load("cccc"))  # evicts b
+        assert set(cache._entries) == {"a", "c"}
+        clock.now += 6
+        return await cache.get_or_load("a", lambda: load("fresh"))
+
+    assert asyncio.run(scenario()) == "fresh"
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 4
+    assert stats["evictions"] == 2  # b by size, a by age
+    assert stats["bytes"] == 9
+
+
+def test_concurrent_misses_run_one_query():
+    """Test that identical concurrent misses share one load."""
+    cache = QueryCache(max_bytes=1_000, ttl=60.0)
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return [(1, "one")]
+
+    async def scenario():
+        return await asyncio.gather(
+            *(cache.get_or_load("key", load) for _ in range(100))
+        )
+
+    results = asyncio.run(scenario())
+    assert calls == 1
+    assert all(result == [(1, "one")] for result in results)
+    assert cache.stats()["coalesced"] == 99
+
+
+def test_failed_load_is_shared_but_not_cached():
+    """Test that errors reach all waiters and the next call retries."""
+    cache = QueryCache(max_bytes=1_000, ttl=60.0)
+    calls = 0
+
+    async def load():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        if calls == 1:
+            raise RuntimeError("database down")
+        return "ok"
+
+    async def scenario():
+        results = await asyncio.gather(
+            cache.get_or_load("key", load),
+            cache.get_or_load("key", load),
+            return_exceptions=True,
+        )
+        return results, await cache.get_or_load("key", load)
+
+    results, retried = asyncio.run(scenario())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert retried == "ok"
+    assert calls == 2
+
+
+def test_cancelled_caller_does_not_cancel_the_load():
+    """Test that waiters still get the result if the first caller leaves."""
+    cache = QueryCache(max_bytes=1_000, ttl=60.0)
+
+    async def load():
+        await asyncio.sleep(0.05)
+        return "result"
+
+    async def scenario():
+        first = asyncio.ensure_future(cache.get_or_load("key", load))
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(cache.get_or_load("key", load))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(scenario()) == "result"
+    assert cache.stats()["entries"] == 1
+
+
+def test_discard_detaches_a_running_load():
+    """Test that a load started before a write does not store its result."""
+    cache = QueryCache(max_bytes=1_000, ttl=60.0)
+    data = ["before"]
+    started = []
+
+    async def load():
+        value = data[0]
+        started.append(value)
+        await asyncio.sleep(0.02)
+        return value
+
+    async def scenario():
+        stale = asyncio.ensure_future(cache.get_or_load("key", load))
+        while not started:
+            await asyncio.sleep(0)
+        data[0] = "after"  # A write, then its invalidation
+        cache.discard("key")
+        fresh = await cache.get_or_load("key", load)
+        return await stale, fresh, await cache.get_or_load("key", load)
+
+    assert asyncio.run(scenario()) == ("before", "after", "after")
+
+
+def test_cached_fetchall_hits_the_database_once(tmp_path):
+    """Test caching query results from a connection pool."""
+    database = str(tmp_path / "cache.db")
+    with sqlite3.connect(database) as connection:
+        connection.execute("CREATE TABLE t (x INTEGER)")
+        connection.execute("INSERT INTO t VALUES (7)")
+    pool = ConnectionPool(
+        lambda: sqlite3.connect(database, check_same_thread=False),
+        min_size=0,
+        max_size=2,
+        acquire_timeout=1.0,
+        max_lifetime=60.0,
+        health_check_after=30.0,
+        maintenance_interval=60.0,
+    )
+    cache = QueryCache(max_bytes=1_000, ttl=60.0)
+
+    async def scenario():
+        first = await cached_fetchall(cache, pool, "SELECT x FROM t")
+        second = await cached_fetchall(cache, pool, "SELECT  x  FROM t")
+        await pool.close()
+        return first, second
+
+    first, second = asyncio.run(scenario())
+    assert first == second == [(7,)]
+    assert pool.stats()["acquired"] == 1
+
+
+@pytest.mark.parametrize("max_bytes", [0])
+def test_zero_capacity_cache_stores_nothing(max_bytes):
+    """Test that a cache without capacity only coalesces."""
+    cache = QueryCache(max_bytes=max_bytes, ttl=60.0)
+
+    async def load():
+        return "value"
+
+    async def scenario():
+        await cache.get_or_load("key", load)
+        await cache.get_or_load("key", load)
+
+    asyncio.run(scenario())
+    assert cache.stats()["misses"] == 2
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,226 @@
+"""
+Unit tests for the shared token-bucket rate limiter.
+"""
+import asyncio
+import multiprocessing
+
+import httpx
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from pydantic import ValidationError
+from uvicorn.middleware.proxy_headers import ProxyHeadersMiddleware
+
+from rest_fastapi.core.config import Settings, get_settings
+from rest_fastapi.middleware.ratelimit import (
+    RateLimit,
+    RateLimitMiddleware,
+    SharedBucketStore,
+)
+from rest_fastapi.security import auth
+from tests.conftest import get_test_settings
+
+
+class FakeClock:
+    """A manually advanced clock."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.mark.parametrize("update", [
+    {"RATE_LIMIT_RATE": 0},
+    {"RATE_LIMIT_BURST": 0},
+    {"RATE_LIMIT_ROUTES": {"/login/token": [0, 5]}},
+    {"RATE_LIMIT_PRINCIPALS": {"ip:10.0.0.1": [1.0, 0]}},
+])
+def test_limits_that_never_refill_are_rejected(update):
+    """Test that a zero rate or burst fails when settings are loaded."""
+    with pytest.raises(ValidationError):
+        Settings(**{**get_test_settings().model_dump(), **update})
+
+
+def test_bucket_refills_over_time(tmp_path):
+    """Test burst, rejection with a retry delay, and refill."""
+    clock = FakeClock()
+    store = SharedBucketStore(str(tmp_path / "buckets"), 64, clock=clock)
+    limit = RateLimit(rate=2.0, burst=3)
+
+    assert [store.take("a", limit)[0] for _ in range(3)] == [True] * 3
+    allowed, retry_after = store.take("a", limit)
+    assert not allowed
+    assert retry_after == 0.5
+    assert store.take("b", limit)[0]  # Other keys are independent
+
+    clock.now += 0.5
+    assert store.take("a", limit)[0]
+    assert not store.take("a", limit)[0]
+
+
+def test_store_reuses_oldest_slot_when_full(tmp_path):
+    """Test that a full group recycles its least recently used bucket."""
+    clock = FakeClock()
+    store = SharedBucketStore(str(tmp_path / "buckets"), 8, clock=clock)
+    limit = RateLimit(rate=0.001, burst=1)
+
+    for i in range(8):
+        clock.now += 1
+        assert store.take(f"key-{i}", limit)[0]
+    clock.now += 1
+    assert store.take("key-8", limit)[0]  # Evicts key-0
+    assert not store.take("key-7", limit)[0]
+    assert store.take("key-0", limit)[0]
+
+
+def _drain(path: str, attempts: int, results) -> None:
+    store = SharedBucketStore(path, 64)
+    limit = RateLimit(rate=0.001, burst=50)
+    results.put(sum(store.take("shared", limit)[0] for _ in range(attempts)))
+
+
+def test_buckets_are_shared_between_processes(tmp_path):
+    """Test that the limit holds across worker processes."""
+    path = str(tmp_path / "buckets")
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    workers = [
+        context.Process(target=_drain, args=(path, 40, results))
+        for _ in range(4)
+    ]
+    for worker in workers:
+        worker.start()
+    allowed = sum(results.get(timeout=10) for _ in workers)
+    for worker in workers:
+        worker.join()
+    assert allowed == 50
+
+
+def test_middleware_limits_per_principal_and_route(tmp_path):
+    """Test 429 responses, route buckets and principal overrides."""
+    settings = get_test_settings().model_copy(update={
+        "RATE_LIMIT_ENABLED": True,
+        "RATE_LIMIT_RATE": 0.01,
+        "RATE_LIMIT_BURST": 2,
+        "RATE_LIMIT_ROUTES": {"/items/{item_id}": (0.01, 1)},
+        "RATE_LIMIT_PRINCIPALS": {"key:simple": (0.01, 5)},
+        "RATE_LIMIT_STATE_FILE": str(tmp_path / "buckets"),
+    })
+    app = FastAPI()
+
+    @app.get("/public")
+    async def public():
+        return {}
+
+    @app.get("/items/{item_id}")
+    async def item(item_id: int):
+        return {}
+
+    @app.get("/auth/verify")
+    async def verify():
+        return {}
+
+    app.add_middleware(RateLimitMiddleware, settings=settings)
+    key = {"Authentication": settings.SIMPLE_API_TOKEN}
+
+    with TestClient(app) as client:
+        anonymous = [client.get("/public").status_code for _ in range(3)]
+        route = [client.get(f"/items/{i}").status_code for i in range(2)]
+        with_key = [
+            client.get("/public", headers=key).status_code for _ in range(6)
+        ]
+        rejected = client.get("/public")
+        unlimited = [client.get("/auth/verify").status_code
+                     for _ in range(3)]
+
+    assert anonymous == [200, 200, 429]
+    assert unlimited == [200] * 3  # nginx auth subrequests
+    assert route == [200, 429]  # Own bucket, shared by all item ids
+    assert with_key == [200] * 5 + [429]
+    assert rejected.json() == {"detail": "Too many requests"}
+    assert int(rejected.headers["retry-after"]) >= 1
+
+
+def test_principal_skips_the_denylist(tmp_path, monkeypatch):
+    """Test that keying a JWT never queries the denylist inline."""
+    settings = get_test_settings().model_copy(update={
+        "RATE_LIMIT_STATE_FILE": str(tmp_path / "buckets"),
+    })
+    middleware = RateLimitMiddleware(FastAPI(), settings=settings)
+
+    def blocking_check(token_data, settings):
+        raise AssertionError("The denylist was queried on the event loop")
+
+    monkeypatch.setattr(auth, "check_revocation", blocking_check)
+    token = auth.create_access_token({"sub": "alice"}, settings)
+    scope = {
+        "type": "http",
+        "headers": [(b"authorization", f"Bearer {token}".encode())],
+        "client": ("10.0.0.1", 1234),
+    }
+    assert asyncio.run(middleware.principal(scope)) == "user:alice"
+
+
+def test_anonymous_clients_behind_the_proxy_are_apart(tmp_path):
+    """Test per-client ip: buckets through the trusted proxy headers."""
+    settings = get_test_settings().model_copy(update={
+        "RATE_LIMIT_ENABLED": True,
+        "RATE_LIMIT_RATE": 0.01,
+        "RATE_LIMIT_BURST": 1,
+        "RATE_LIMIT_STATE_FILE": str(tmp_path / "buckets"),
+    })
+    app = FastAPI()
+
+    @app.get("/login")
+    async def login(request: Request):
+        return {"client": request.client.host}
+
+    app.add_middleware(RateLimitMiddleware, settings=settings)
+    # What uvicorn does with gunicorn's forwarded_allow_ips
+    proxied = ProxyHeadersMiddleware(app, trusted_hosts="10.0.0.2")
+
+    async def get(peer: str, forwarded_for: str) -> int:
+        transport = httpx.ASGITransport(proxied, client=(peer, 4321))
+        async with httpx.AsyncClient(
+            transport=transport, base_url="http://api"
+        ) as client:
+            response = await client.get(
+                "/login", headers={"X-Forwarded-For": forwarded_for}
+            )
+        return response.status_code
+
+    async def scenario() -> list[int]:
+        return [
+            await get("10.0.0.2", "203.0.113.1"),
+            await get("10.0.0.2", "203.0.113.2"),  # Another client
+            await get("10.0.0.2", "203.0.113.1"),  # Its bucket is empty
+            # A direct caller cannot pick another client's address
+            await get("198.51.100.9", "203.0.113.2"),
+            await get("198.51.100.9", "203.0.113.3"),
+        ]
+
+    assert asyncio.run(scenario()) == [200, 200, 429, 200, 429]
+
+
+def test_app_limits_with_the_overridden_settings(client: TestClient):
+    """Test a 429 from the application, with its settings dependency."""
+    settings = get_test_settings().model_copy(update={
+        "RATE_LIMIT_RATE": 0.01,
+        "RATE_LIMIT_BURST": 2,
+    })
+    client.app.dependency_overrides[get_settings] = lambda: settings
+    try:
+        responses = [
+            client.post("/login/token", data={
+                "username": "testuser", "password": "wrongpassword"
+            })
+            for _ in range(3)
+        ]
+    finally:
+        client.app.dependency_overrides[get_settings] = get_test_settings
+
+    assert [r.status_code for r in responses] == [401, 401, 429]
+    assert responses[-1].json() == {"detail": "Too many requests"}
+    assert "retry-after" in responses[-1].headers
@@ -0,0 +1,109 @@
+"""
+Unit tests for refresh tokens, their rotation and reuse detection.
+"""
+import time
+
+from fastapi.testclient import TestClient
+from jose import jwt
+
+from rest_fastapi.core.config import get_settings
+from rest_fastapi.security.refresh import RefreshTokenStore
+from tests.conftest import get_test_settings
+
+
+class FakeClock:
+    """A manually advanced clock."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_rotation_and_reuse_detection(tmp_path):
+    """Test that a reused token ends its session, and only its session."""
+    store = RefreshTokenStore(
+        str(tmp_path / "refresh.sqlite3"), ttl=60, session_ttl=3600
+    )
+    first = store.issue("alice")
+    other = store.issue("alice")
+
+    second = store.rotate(first.token)
+    assert second.subject == "alice"
+    assert second.token != first.token
+
+    assert store.rotate(first.token) is None  # Reuse
+    assert store.rotate(second.token) is None  # Session revoked
+    assert store.rotate(other.token) is not None
+    assert store.rotate("unknown") is None
+
+
+def test_sessions_slide_up_to_their_maximum(tmp_path):
+    """Test idle expiry, renewal on refresh and the session cap."""
+    clock = FakeClock()
+    store = RefreshTokenStore(
+        str(tmp_path / "refresh.sqlite3"), ttl=60, session_ttl=150,
+        clock=clock,
+    )
+    grant = store.issue("alice")
+    for _ in range(2):
+        clock.now += 50
+        grant = store.rotate(grant.token)
+        assert grant is not None
+    assert grant.expires_at == 1000.0 + 150  # Capped by the session
+
+    idle = store.issue("bob")
+    clock.now += 60
+    assert store.rotate(idle.token) is None
+
+
+def test_revoke_ends_the_session(tmp_path):
+    """Test logging out with a refresh token."""
+    store = RefreshTokenStore(
+        str(tmp_path / "refresh.sqlite3"), ttl=60, session_ttl=3600
+    )
+    grant = store.rotate(store.issue("alice").token)
+    assert store.revoke(grant.token)
+    assert store.rotate(grant.token) is None
+    assert not store.revoke(grant.token)
+
+
+def test_refresh_endpoint(client: TestClient, tmp_path):
+    """Test login, refresh and reuse through the API."""
+    settings = get_test_settings().model_copy(update={
+        "REFRESH_TOKEN_DB_PATH": str(tmp_path / "refresh.sqlite3")
+    })
+    client.app.dependency_overrides[get_settings] = lambda: settings
+    try:
+        login = client.post(
+            "/login/token",
+            data={"username": "testuser", "password": "testpassword"},
+        ).json()
+        assert login["expires_in"] == 15 * 60
+        exp = jwt.get_unverified_claims(login["access_token"])["exp"]
+        assert abs(exp - time.time() - 15 * 60) < 5  # Seconds, not minutes
+
+        response = client.post(
+            "/login/refresh", data={"refresh_token": login["refresh_token"]}
+        )
+        assert response.status_code == 200
+        refreshed = response.json()
+        assert refreshed["refresh_token"] != login["refresh_token"]
+        assert client.get(
+            "/examples/protected/jwt-only",
+            headers={"Authorization": f"Bearer {refreshed['access_token']}"},
+        ).status_code == 200
+
+        reused = client.post(
+            "/login/refresh", data={"refresh_token": login["refresh_token"]}
+        )
+        assert reused.status_code == 401
+        assert reused.json()["detail"] == "Invalid refresh token"
+        revoked = client.post(
+            "/login/refresh",
+            data={"refresh_token": refreshed["refresh_token"]},
+        )
+        assert revoked.status_code == 401
+    finally:
+        client.app.dependency_overrides[get_settings] = get_test_settings
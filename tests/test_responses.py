@@ -0,0 +1,40 @@
+"""
+Unit tests for the fast JSON response helpers.
+"""
+import json
+from datetime import datetime, timezone
+
+from rest_fastapi.core.responses import (
+    FastJSONResponse,
+    PreEncodedJSON,
+    model_response,
+)
+from rest_fastapi.security.schemas import Token
+
+
+def test_fast_json_response_encodes_rich_types():
+    """Test that values jsonable_encoder would convert are accepted."""
+    response = FastJSONResponse(
+        {"at": datetime(2025, 1, 2, tzinfo=timezone.utc), "ids": {1}}
+    )
+    assert json.loads(response.body) == {
+        "at": "2025-01-02T00:00:00Z", "ids": [1]
+    }
+    assert response.headers["content-type"] == "application/json"
+
+
+def test_pre_encoded_json_reuses_its_body():
+    """Test that every response shares the bytes encoded up front."""
+    payload = PreEncodedJSON({"message": "hi"}, status_code=202)
+    first, second = payload.response(), payload.response()
+    assert first.body is second.body is payload.body
+    assert first.status_code == 202
+    assert first.headers["content-length"] == str(len(payload.body))
+
+
+def test_model_response_matches_model_dump():
+    """Test that the compiled serializer yields the model's JSON."""
+    token = Token(access_token="abc", token_type="bearer")
+    response = model_response(token)
+    assert json.loads(response.body) == token.model_dump()
+    assert response.media_type == "application/json"
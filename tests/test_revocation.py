@@ -0,0 +1,125 @@
+"""
+Unit tests for token revocation and the Bloom-filter-backed denylist.
+"""
+from datetime import timedelta
+
+from fastapi.testclient import TestClient
+from jose import jwt
+
+from rest_fastapi.core.config import get_settings
+from rest_fastapi.security import auth
+from rest_fastapi.security.revocation import (
+    BloomFilter,
+    Denylist,
+    RevocationStore,
+)
+from tests.conftest import get_test_settings
+
+
+class FakeClock:
+    """A manually advanced clock."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_denylist(path: str, clock: FakeClock) -> Denylist:
+    """Open a denylist on a store, as a worker process would."""
+    return Denylist(
+        RevocationStore(path),
+        capacity=1000,
+        error_rate=0.01,
+        sync_interval=1.0,
+        rebuild_interval=60.0,
+        clock=clock,
+    )
+
+
+def test_bloom_filter_has_no_false_negatives():
+    """Test membership, false positive rate and size of the filter."""
+    bloom = BloomFilter(10_000, 0.01)
+    for i in range(10_000):
+        bloom.add(f"revoked-{i}")
+
+    assert all(f"revoked-{i}" in bloom for i in range(10_000))
+    false_positives = sum(f"other-{i}" in bloom for i in range(10_000))
+    assert false_positives < 200
+    assert bloom.size_bytes < 2 * 10_000  # Under 2 bytes per entry
+
+
+def test_revocations_reach_other_workers(tmp_path):
+    """Test that a revocation is seen by another worker after a sync."""
+    clock = FakeClock()
+    path = str(tmp_path / "revoked.sqlite3")
+    first, second = make_denylist(path, clock), make_denylist(path, clock)
+    first.sync()
+    second.sync()
+
+    first.revoke("jti-1", expires_at=clock.now + 30)
+    assert first.is_revoked("jti-1")
+    assert not second.is_revoked("jti-1")  # Until its next sync
+
+    assert not second.sync_due()
+    clock.now += 1
+    second.sync()
+    assert second.is_revoked("jti-1")
+    assert not second.is_revoked("jti-2")
+
+
+def test_revocations_expire_with_the_token(tmp_path):
+    """Test that entries are dropped once the token has expired."""
+    clock = FakeClock()
+    path = str(tmp_path / "revoked.sqlite3")
+    denylist = make_denylist(path, clock)
+    denylist.sync()
+    denylist.revoke("short", expires_at=clock.now + 10)
+    denylist.revoke("long", expires_at=clock.now + 3600)
+    denylist.revoke("expired", expires_at=clock.now - 1)
+
+    clock.now += 61  # Past "short" and the rebuild interval
+    denylist.sync()
+    assert "short" not in denylist.filter
+    assert not denylist.is_revoked("short")
+    assert denylist.is_revoked("long")
+    assert [jti for _, jti in denylist.store.since(0, 0)] == ["long"]
+
+
+def test_tokens_have_unique_ids():
+    """Test that every access token gets its own jti."""
+    settings = get_test_settings()
+    ids = {
+        jwt.get_unverified_claims(auth.create_access_token(
+            {"sub": "testuser"}, settings, expires_delta=timedelta(minutes=5)
+        ))["jti"]
+        for _ in range(100)
+    }
+    assert len(ids) == 100
+
+
+def test_revoked_token_is_rejected(client: TestClient, tmp_path):
+    """Test revoking a token through the API, cached or not."""
+    settings = get_test_settings().model_copy(update={
+        "REVOCATION_DB_PATH": str(tmp_path / "revoked.sqlite3")
+    })
+    client.app.dependency_overrides[get_settings] = lambda: settings
+    try:
+        token = auth.create_access_token(
+            {"sub": "testuser"}, settings, expires_delta=timedelta(minutes=5)
+        )
+        headers = {"Authorization": f"Bearer {token}"}
+        route = "/examples/protected/jwt-only"
+        assert client.get(route, headers=headers).status_code == 200
+
+        response = client.post("/auth/revoke", data={"token": token})
+        assert response.status_code == 200
+        response = client.get(route, headers=headers)
+        assert response.status_code == 401
+        assert response.json()["detail"] == "Token has been revoked"
+        assert client.post(
+            "/auth/revoke", data={"token": "not-a-jwt"}
+        ).status_code == 200
+    finally:
+        client.app.dependency_overrides[get_settings] = get_test_settings
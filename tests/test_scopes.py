@@ -0,0 +1,80 @@
+"""
+Unit tests for scope bitsets and scope-protected routes.
+"""
+import pytest
+from fastapi.testclient import TestClient
+from jose import jwt
+
+from rest_fastapi.core.config import get_settings
+from rest_fastapi.security import auth
+from rest_fastapi.security.api_keys import parse_key_record
+from rest_fastapi.security.scopes import (
+    ALL_SCOPES,
+    SCOPE_BITS,
+    scope_mask,
+    scope_names,
+)
+from tests.conftest import get_test_settings
+
+
+def test_scope_mask_round_trip():
+    """Test compiling scopes to a bitset and back."""
+    mask = scope_mask(["exports:read"])
+    assert mask == SCOPE_BITS["exports:read"]
+    assert scope_names(mask) == ["exports:read"]
+    assert scope_mask(["*"]) == ALL_SCOPES
+    assert scope_mask(["retired:scope"], strict=False) == 0
+    with pytest.raises(ValueError):
+        scope_mask(["retired:scope"])
+    with pytest.raises(ValueError):
+        auth.auth_jwt_scopes("typo:scope")
+
+
+def test_api_key_scopes_are_compiled():
+    """Test that API key records get their mask at load time."""
+    key = parse_key_record(
+        {"id": "acme", "sha256": "00" * 32, "scopes": "exports:read other"}
+    )
+    assert key.mask == SCOPE_BITS["exports:read"]
+
+
+def test_scoped_route_checks_the_token_scopes(client: TestClient):
+    """Test that only tokens granting the scope reach the route."""
+    settings = get_test_settings().model_copy(update={"USER_LOGIN": {
+        "testuser": {"password": "testpassword"},
+        "admin": {"password": "adminpassword", "scopes": ["examples:admin"]},
+    }})
+    client.app.dependency_overrides[get_settings] = lambda: settings
+    try:
+        def login(username, password):
+            return client.post(
+                "/login/token",
+                data={"username": username, "password": password},
+            ).json()["access_token"]
+
+        admin_token = login("admin", "adminpassword")
+        claims = jwt.get_unverified_claims(admin_token)
+        assert claims["scp"] == SCOPE_BITS["examples:admin"]
+        response = client.get(
+            "/examples/protected/admin",
+            headers={"Authorization": f"Bearer {admin_token}"},
+        )
+        assert response.status_code == 200
+        assert response.json()["message"] == (
+            "Hello admin, you are an admin."
+        )
+
+        response = client.get(
+            "/examples/protected/admin",
+            headers={
+                "Authorization":
+                    f"Bearer {login('testuser', 'testpassword')}"
+            },
+        )
+        assert response.status_code == 403
+        assert 'error="insufficient_scope"' in (
+            response.headers["WWW-Authenticate"]
+        )
+        assert client.get("/examples/protected/admin").status_code == 401
+    finally:
+        client.app.dependency_overrides[get_settings] = get_test_settings
@@ -1,11 +1,13 @@
 """
 Unit tests for security logic, such as token expiration.
 """
+import inspect
 import time
 
 from fastapi.testclient import TestClient
 
 from rest_fastapi.core.config import get_settings, Settings
+from rest_fastapi.security import auth
 
 
 def test_token_expiration(client: TestClient):
@@ -19,9 +21,10 @@ def test_token_expiration(client: TestClient):
         return Settings(
             ENV_STATE="dev",
             SECRET_KEY="test-secret",
-            ACCESS_TOKEN_EXPIRE_SECONDS=1/60,  # 1 second
+            ACCESS_TOKEN_EXPIRE_SECONDS=1,
             SIMPLE_API_TOKEN="test-api-token",
-            USER_LOGIN={"testuser": {"password": "testpassword"}}
+            USER_LOGIN={"testuser": {"password": "testpassword"}},
+            PASSWORD_BCRYPT_ROUNDS=4,  # Minimum cost keeps tests fast
         )
 
     # Override the dependency just for this test's scope
@@ -55,3 +58,15 @@ def test_token_expiration(client: TestClient):
     # --- Part 4: Clean up the dependency override ---
     # This is important to not affect other tests
     client.app.dependency_overrides = {}
+
+
+def test_auth_dependencies_are_async():
+    """
+    Test that the auth dependencies run on the event loop.
+
+    Plain `def` dependencies are dispatched to the threadpool by FastAPI,
+    which is what these coroutines avoid.
+    """
+    assert inspect.iscoroutinefunction(get_settings)
+    assert inspect.iscoroutinefunction(auth.auth_jwt)
+    assert inspect.iscoroutinefunction(auth.auth_token)
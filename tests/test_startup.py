@@ -0,0 +1,60 @@
+"""
+Unit tests for lazy backend imports and preloading.
+"""
+import json
+import os
+import subprocess
+import sys
+
+from rest_fastapi.core.startup import HEAVY_BACKENDS, preload_backends
+from tests.conftest import get_test_settings
+
+LAZY_MODULES = [
+    module for modules in HEAVY_BACKENDS.values() for module in modules
+] + ["passlib", "uvicorn"]
+
+
+def test_importing_the_app_skips_heavy_modules():
+    """Test that building the app imports no optional backend."""
+    code = (
+        "import json, sys, rest_fastapi.main; "
+        f"print(json.dumps([m for m in {LAZY_MODULES!r} if m in sys.modules]))"
+    )
+    child = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True,
+        check=True,
+    )
+    assert json.loads(child.stdout.strip().splitlines()[-1]) == []
+
+
+def test_preload_imports_only_enabled_backends():
+    """Test that preloading follows the settings."""
+    settings = get_test_settings()
+    assert preload_backends(settings) == []
+
+    with_exports = settings.model_copy(
+        update={"BIGQUERY_EXPORT_TABLES": {"items": "p.d.items"}}
+    )
+    assert preload_backends(with_exports) == list(HEAVY_BACKENDS["bigquery"])
+    assert "pyarrow" in sys.modules
+
+
+def test_gunicorn_config_prepares_metrics_before_preload(tmp_path):
+    """Test that the app imports right after the config, as preloaded."""
+    metrics_dir = tmp_path / "multiproc"
+    config_file = os.path.join(
+        os.path.dirname(os.path.dirname(__file__)), "gunicorn.conf.py"
+    )
+    code = (
+        f"import runpy; runpy.run_path({config_file!r}); "
+        "import rest_fastapi.main"
+    )
+    for stale in (False, True):
+        if stale:
+            (metrics_dir / "counter_1.db").write_bytes(b"stale")
+        subprocess.run(
+            [sys.executable, "-c", code], check=True,
+            env={**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(metrics_dir)},
+        )
+        assert metrics_dir.is_dir()
+        assert not (metrics_dir / "counter_1.db").exists()
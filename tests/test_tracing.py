@@ -0,0 +1,140 @@
+"""
+Unit tests for request tracing and on-demand profiling.
+"""
+import time
+from typing import Annotated
+
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from rest_fastapi.core.config import get_settings
+from rest_fastapi.core.profiling import write_profile
+from rest_fastapi.core.tracing import (
+    Trace,
+    current_trace,
+    instrument_routes,
+    span,
+)
+from rest_fastapi.middleware.tracing import TracingMiddleware
+from rest_fastapi.security import auth
+from rest_fastapi.security.schemas import TokenData
+from rest_fastapi.security.scopes import SCOPE_BITS
+from tests.conftest import get_test_settings
+
+
+def make_client(**overrides) -> TestClient:
+    """Build an instrumented app behind the middleware."""
+    settings = get_test_settings().model_copy(update=overrides)
+    app = FastAPI()
+    app.dependency_overrides[get_settings] = lambda: settings
+    app.add_middleware(TracingMiddleware, settings=settings)
+
+    @app.get("/async")
+    async def async_route(
+        user: Annotated[TokenData, Depends(auth.auth_jwt)],
+    ):
+        return {"user": user.username}
+
+    @app.get("/sync")
+    def sync_route():
+        time.sleep(0.05)
+        return {"slept": True}
+
+    instrument_routes(app.routes)
+    return TestClient(app)
+
+
+def bearer(scopes: int = 0) -> dict[str, str]:
+    """Return an Authorization header for a test token."""
+    token = auth.create_access_token(
+        {"sub": "ops", "scp": scopes}, get_test_settings()
+    )
+    return {"Authorization": f"Bearer {token}"}
+
+
+def timings(response) -> dict[str, float]:
+    """Parse the Server-Timing header of a response."""
+    metrics = {}
+    for metric in response.headers["Server-Timing"].split(","):
+        name, duration = metric.strip().split(";dur=")
+        metrics[name] = float(duration)
+    return metrics
+
+
+def test_spans_are_only_recorded_in_a_trace():
+    """Test that spans are free outside a trace and added up inside."""
+    with span("auth"):
+        assert current_trace() is None
+
+    trace = Trace()
+    trace.add("auth", 1.0, 1.002)
+    trace.add("auth", 1.003, 1.004)
+    trace.add("deps", 0.5, 1.005)
+    assert list(trace.durations()) == ["deps", "auth"]
+    assert abs(trace.durations()["auth"] - 3.0) < 1e-6
+    assert trace.server_timing().startswith("deps;dur=505.000")
+
+
+def test_phases_are_reported_in_server_timing():
+    """Test the phases of async, sync and rejected requests."""
+    client = make_client(TRACING_ENABLED=True)
+    response = client.get("/async", headers=bearer())
+    assert response.json() == {"user": "ops"}
+    metrics = timings(response)
+    assert {"auth", "deps", "handler", "serialize", "app"} <= set(metrics)
+    assert metrics["deps"] >= metrics["auth"]
+
+    metrics = timings(client.get("/sync"))
+    assert {"deps", "queue", "handler", "serialize"} <= set(metrics)
+    assert metrics["handler"] >= 50
+
+    rejected = client.get("/async")
+    assert rejected.status_code == 401
+    assert "handler" not in timings(rejected)
+
+    untraced = make_client().get("/async", headers=bearer())
+    assert "Server-Timing" not in untraced.headers
+
+
+def test_profile_needs_the_debug_scope(tmp_path):
+    """Test that only authorized requests are profiled and stored."""
+    client = make_client(PROFILING_ENABLED=True, PROFILING_DIR=str(tmp_path))
+    headers = {"X-Profile": "1"}
+
+    refused = client.get("/sync", headers={**headers, **bearer()})
+    assert "X-Profile-Id" not in refused.headers
+    assert "Server-Timing" not in refused.headers
+
+    response = client.get(
+        "/sync",
+        headers={**headers, **bearer(SCOPE_BITS["debug:profile"])},
+    )
+    assert "Server-Timing" in response.headers
+    profile = tmp_path / f"{response.headers['X-Profile-Id']}.folded"
+    stacks = profile.read_text().splitlines()
+    assert any("sync_route" in line for line in stacks)
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in stacks)
+
+
+def test_profiles_are_served_to_the_debug_scope(client: TestClient, tmp_path):
+    """Test fetching a stored profile."""
+    settings = get_test_settings().model_copy(
+        update={"PROFILING_DIR": str(tmp_path)}
+    )
+    write_profile(str(tmp_path), "0123456789abcdef", "main;run 3\n")
+    client.app.dependency_overrides[get_settings] = lambda: settings
+    try:
+        url = "/debug/profiles/0123456789abcdef"
+        assert client.get(url, headers=bearer()).status_code == 403
+        response = client.get(
+            url, headers=bearer(SCOPE_BITS["debug:profile"])
+        )
+        assert response.status_code == 200
+        assert response.text == "main;run 3\n"
+        missing = client.get(
+            "/debug/profiles/ffffffffffffffff",
+            headers=bearer(SCOPE_BITS["debug:profile"]),
+        )
+        assert missing.status_code == 404
+    finally:
+        client.app.dependency_overrides[get_settings] = get_test_settings
@@ -0,0 +1,78 @@
+"""
+Unit tests for the nginx auth_request endpoint.
+"""
+from datetime import timedelta
+
+from fastapi.testclient import TestClient
+
+from rest_fastapi.security import auth
+from rest_fastapi.security.scopes import scope_mask
+from tests.conftest import get_test_settings
+
+
+def make_token(lifetime: timedelta) -> str:
+    """Issue a token for the test user."""
+    return auth.create_access_token(
+        {"sub": "testuser"}, get_test_settings(), expires_delta=lifetime
+    )
+
+
+def test_verify_jwt_sets_identity_and_cache_headers(client: TestClient):
+    """Test a JWT decision, cached for the configured time."""
+    token = make_token(timedelta(minutes=5))
+    response = client.get(
+        "/auth/verify", headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 200
+    assert response.content == b""
+    assert response.headers["x-auth-user"] == "testuser"
+    assert response.headers["x-auth-method"] == "jwt"
+    assert response.headers["x-accel-expires"] == "30"
+    assert response.headers["cache-control"] == "private, max-age=30"
+
+
+def test_verify_jwt_sends_its_scopes(client: TestClient):
+    """Test that a JWT decision carries the token's scopes."""
+    token = auth.create_access_token(
+        {"sub": "testuser", "scp": scope_mask(["jobs:run", "exports:read"])},
+        get_test_settings(),
+        expires_delta=timedelta(minutes=5),
+    )
+    response = client.get(
+        "/auth/verify", headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 200
+    assert sorted(response.headers["x-auth-scopes"].split()) == [
+        "exports:read", "jobs:run"
+    ]
+
+
+def test_verify_cache_never_outlives_the_token(client: TestClient):
+    """Test that a token about to expire is cached only until then."""
+    token = make_token(timedelta(seconds=10))
+    response = client.get(
+        "/auth/verify", headers={"Authorization": f"Bearer {token}"}
+    )
+    assert response.status_code == 200
+    assert 0 <= int(response.headers["x-accel-expires"]) <= 10
+
+
+def test_verify_api_token(client: TestClient):
+    """Test an API token decision."""
+    response = client.get(
+        "/auth/verify", headers={"Authentication": "test-static-api-token"}
+    )
+    assert response.status_code == 200
+    assert response.headers["x-auth-method"] == "api_key"
+
+
+def test_verify_rejects_bad_credentials(client: TestClient):
+    """Test that missing or invalid credentials are not cacheable."""
+    for headers in (
+        {},
+        {"Authorization": "Bearer not-a-jwt"},
+        {"Authentication": "wrong-token"},
+    ):
+        response = client.get("/auth/verify", headers=headers)
+        assert response.status_code == 401
+        assert "x-accel-expires" not in response.headers